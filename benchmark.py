@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for Coretax Extractor
+
+Usage:
+    python benchmark.py startup --runs 10
+    python benchmark.py startup --runs 10 --exe "dist/CoretaxExtractor/Coretax Extractor.exe"
+    python benchmark.py startup --runs 10 --budget-ms 4000
+    python benchmark.py memory --dir samples --files 10000 --max-growth-mb 50
+    python benchmark.py normalize --size-mb 20
+    python benchmark.py fuzz --cases 2000 --ceiling-ms 50
+    python benchmark.py reparse --dir samples
+    python benchmark.py schedule --dir samples --workers 4
+    python benchmark.py queue --dir samples --workers 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import startup_trace
+
+
+APP_SCRIPT = Path(__file__).resolve().parent / "coretax_extractor_flet.py"
+JOB_QUEUE_SCRIPT = Path(__file__).resolve().parent / "job_queue.py"
+USABLE_PHASE = "password_screen_shown"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def print_percentile_table(samples: Dict[str, List[float]], unit: str = "ms"):
+    """Print p50/p90/p95/max for each named sample series."""
+    width = max(len(name) for name in samples)
+    print(f"{'phase'.ljust(width)}  {'n':>3}  {'p50':>9}  {'p90':>9}  {'p95':>9}  {'max':>9}  ({unit})")
+    for name, values in samples.items():
+        print(
+            f"{name.ljust(width)}  {len(values):>3}  "
+            f"{percentile(values, 50):>9.1f}  {percentile(values, 90):>9.1f}  "
+            f"{percentile(values, 95):>9.1f}  {max(values):>9.1f}"
+        )
+
+
+def run_startup(args) -> int:
+    """Launch the app N times and report start-up phase percentiles."""
+    command = [args.exe] if args.exe else [sys.executable, str(APP_SCRIPT)]
+    phases: Dict[str, List[float]] = {}
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for run in range(1, args.runs + 1):
+            trace_file = os.path.join(temp_dir, f"trace_{run}.json")
+            env = dict(os.environ)
+            env[startup_trace.TRACE_ENV] = trace_file
+            env[startup_trace.EXIT_ENV] = "1"
+            env[startup_trace.LAUNCH_TIME_ENV] = repr(time.time())
+
+            start = time.perf_counter()
+            try:
+                subprocess.run(command, env=env, timeout=args.timeout, check=False,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except subprocess.TimeoutExpired:
+                print(f"Run {run}: timed out after {args.timeout}s")
+                failures += 1
+                continue
+            wall_ms = (time.perf_counter() - start) * 1000
+
+            try:
+                with open(trace_file, encoding="utf-8") as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                print(f"Run {run}: no startup trace written")
+                failures += 1
+                continue
+
+            for entry in report["phases"]:
+                phases.setdefault(entry["phase"], []).append(entry["ms"])
+            phases.setdefault("process_exit", []).append(wall_ms)
+            print(f"Run {run}: usable after {report['phases'][-1]['ms']:.0f} ms")
+
+    if not phases:
+        print("No successful runs")
+        return 1
+
+    print()
+    print_percentile_table(phases)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(phases, f, indent=2)
+
+    if args.budget_ms and USABLE_PHASE in phases:
+        p90 = percentile(phases[USABLE_PHASE], 90)
+        if p90 > args.budget_ms:
+            print(f"\nREGRESSION: p90 {USABLE_PHASE} {p90:.0f} ms exceeds budget {args.budget_ms} ms")
+            return 1
+
+    return 1 if failures else 0
+
+
+def run_memory(args) -> int:
+    """Extract a long batch in-process, then on a worker process, and check that RSS stays flat in both."""
+    import multiprocessing
+    from extraction_pipeline import ExtractionPipeline, process_rss_mb
+
+    sources = sorted(Path(args.dir).glob("*.pdf"))
+    if not sources:
+        print(f"No PDF files found in {args.dir}")
+        return 1
+    if process_rss_mb() is None:
+        print("RSS cannot be read on this platform")
+        return 1
+
+    def worker_rss_mb() -> Optional[float]:
+        sizes = [process_rss_mb(child.pid) for child in multiprocessing.active_children()]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+
+    # Without budgets a single-worker batch runs in this process; with them, on one worker process
+    runs = {
+        "in-process": ({"file_timeout": None, "file_memory_mb": None}, process_rss_mb),
+        "worker process": ({}, worker_rss_mb),
+    }
+    # Cycle the sample PDFs to build a batch of the requested size
+    paths = [sources[i % len(sources)] for i in range(args.files)]
+    failed = False
+
+    for label, (budgets, read_rss) in runs.items():
+        samples: List[tuple] = []
+        extracted = 0
+
+        start = time.perf_counter()
+        pipeline = ExtractionPipeline(paths, workers=1, **budgets)
+        for count, parsed in enumerate(pipeline, 1):
+            if parsed.fields:
+                extracted += 1
+            if count % args.sample_every == 0 or count == len(paths):
+                rss = read_rss()
+                if rss is not None:
+                    samples.append((count, rss))
+        elapsed = time.perf_counter() - start
+
+        print(f"{label}\n{'files':>8}  {'rss (MB)':>9}")
+        for count, rss in samples:
+            print(f"{count:>8}  {rss:>9.1f}")
+
+        baseline = samples[0][1]
+        peak = max(rss for _, rss in samples)
+        growth = samples[-1][1] - baseline
+        print(f"\nExtracted {extracted}/{len(paths)} files in {elapsed:.1f}s")
+        print(f"RSS after first sample {baseline:.1f} MB, peak {peak:.1f} MB, growth {growth:+.1f} MB\n")
+
+        if args.max_growth_mb is not None and growth > args.max_growth_mb:
+            print(f"REGRESSION: {label} RSS grew {growth:.1f} MB, budget {args.max_growth_mb} MB\n")
+            failed = True
+    return 1 if failed else 0
+
+
+def run_reparse(args) -> int:
+    """Extract a folder with an empty text cache, then again from the cache, and compare."""
+    from extraction_pipeline import ExtractionPipeline
+    from text_cache import TextCache
+
+    paths = sorted(Path(args.dir).glob("*.pdf"))
+    if not paths:
+        print(f"No PDF files found in {args.dir}")
+        return 1
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TextCache(os.path.join(temp_dir, "text_cache.db"))
+        passes = {}
+        for label in ("pdf", "cached"):
+            start = time.perf_counter()
+            pipeline = ExtractionPipeline(paths, workers=args.workers, text_cache=cache)
+            records = [parsed.fields for parsed in pipeline]
+            passes[label] = (time.perf_counter() - start, records)
+        stats = cache.get_stats()
+
+    print(f"{'pass':<8} {'files':>6} {'seconds':>9} {'files/s':>9}")
+    for label, (elapsed, records) in passes.items():
+        print(f"{label:<8} {len(records):>6} {elapsed:>9.2f} {len(records) / max(elapsed, 1e-9):>9.0f}")
+    print(f"\nCache: {stats['entries']} entries, {stats['text_bytes'] / 1024:.0f} KB text "
+          f"stored in {stats['stored_bytes'] / 1024:.0f} KB")
+
+    mismatches = sum(1 for a, b in zip(passes["pdf"][1], passes["cached"][1]) if a != b)
+    if mismatches:
+        print(f"\nREGRESSION: {mismatches} files parsed differently from cached text")
+        return 1
+    return 0
+
+
+def run_schedule(args) -> int:
+    """Batch wall time with files dispatched in input order versus longest predicted job first."""
+    from extraction_pipeline import ExtractionPipeline
+    from extraction_history import ExtractionHistory
+
+    paths = sorted(Path(args.dir).glob("*.pdf"))
+    if not paths:
+        print(f"No PDF files found in {args.dir}")
+        return 1
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        history = ExtractionHistory(os.path.join(temp_dir, "history.db"))
+        runs = [("input order", False), ("by size", True), ("by measured cost", True)]
+        print(f"{'dispatch':<18} {'files':>6} {'seconds':>9}")
+        outputs = []
+        for label, schedule in runs:
+            start = time.perf_counter()
+            pipeline = ExtractionPipeline(paths, workers=args.workers, history=history, schedule=schedule)
+            outputs.append([(parsed.source, parsed.fields) for parsed in pipeline])
+            print(f"{label:<18} {len(outputs[-1]):>6} {time.perf_counter() - start:>9.2f}")
+
+    if any(output != outputs[0] for output in outputs[1:]):
+        print("\nREGRESSION: results differ between dispatch orders")
+        return 1
+    return 0
+
+
+def run_queue(args) -> int:
+    """Extract a folder through a temporary job queue with local queue workers, and compare with one pipeline."""
+    import re
+    import job_queue
+    from extraction_pipeline import ExtractionPipeline
+
+    paths = sorted(Path(args.dir).glob("*.pdf"))
+    if not paths:
+        print(f"No PDF files found in {args.dir}")
+        return 1
+
+    def outputs(pipeline) -> list:
+        return [(parsed.source, parsed.error, parsed.quarantined, parsed.fields) for parsed in pipeline]
+
+    start = time.perf_counter()
+    expected = outputs(ExtractionPipeline(paths, workers=args.processes))
+    pipeline_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue_path = os.path.join(temp_dir, "queue.db")
+        queue = job_queue.JobQueue(queue_path)
+        command = [sys.executable, str(JOB_QUEUE_SCRIPT), "work", "--queue", queue_path,
+                   "--idle-exit", str(args.idle_exit)]
+        if args.processes:
+            command += ["--workers", str(args.processes)]
+
+        logs = [os.path.join(temp_dir, f"worker_{index}.log") for index in range(args.workers)]
+        workers = []
+        for log in logs:
+            with open(log, "w") as f:
+                workers.append(subprocess.Popen(command, stdout=f, stderr=subprocess.STDOUT))
+
+        start = time.perf_counter()
+        merged = outputs(job_queue.DistributedPipeline(paths, queue, workers=args.processes))
+        queue_seconds = time.perf_counter() - start
+
+        worker_files = []
+        for worker, log in zip(workers, logs):
+            try:
+                worker.wait(timeout=args.idle_exit + 120)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+            with open(log, encoding="utf-8", errors="replace") as f:
+                match = re.search(r"stopping after (\d+) files", f.read())
+            worker_files.append(int(match.group(1)) if match else None)
+
+    print(f"{'run':<24} {'files':>6} {'seconds':>9}")
+    print(f"{'single pipeline':<24} {len(expected):>6} {pipeline_seconds:>9.2f}")
+    print(f"{f'queue, {args.workers} workers':<24} {len(merged):>6} {queue_seconds:>9.2f}")
+    print("\nFiles extracted by the coordinator: "
+          f"{len(paths) - sum(count or 0 for count in worker_files)}")
+    for index, count in enumerate(worker_files, 1):
+        print(f"Files extracted by worker {index}: {count if count is not None else 'unknown (no exit line)'}")
+
+    if merged != expected:
+        print("\nREGRESSION: results through the job queue differ from a single pipeline run")
+        return 1
+    return 0
+
+
+def legacy_normalize(text: str) -> str:
+    """The previous multi-pass normalization followed by .upper(), kept as the baseline."""
+    import re
+    import pdf_extractor
+
+    cleaned = re.sub(r'\s+', ' ', text.strip())
+    for pattern, replacement in pdf_extractor.KEYWORD_JOINS.items():
+        cleaned = re.sub(pattern, replacement, cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r'(\d)\s+([.,])\s*(\d)', r'\1\2\3', cleaned)
+    return cleaned.strip().upper()
+
+
+def normalize_sample_text(size_mb: float) -> str:
+    """Build a large text of bupot-like lines with split keywords and spaced numbers."""
+    import random
+
+    rng = random.Random(42)
+    fragments = [
+        "Kementerian\nKeuangan", "BUKTI PEMOTONGANDAN", "pemungutan  pph", "MASA\tPAJAK 06-2025",
+        "TIDAKFINAL", "B.5 DPP : 12 . 500 . 000", "B.7 PPh : 250 ,000", "Bukit\n\nAsam Tbk",
+        "RSM Indonesia Konsultan", "A.1 NPWP / NIK : 0015659428012000", "Jakarta, 10 Juni 2025",
+    ]
+    target = int(size_mb * 1024 * 1024)
+    parts = []
+    length = 0
+    while length < target:
+        fragment = rng.choice(fragments) + rng.choice(["\n", " ", "   ", "\r\n"])
+        parts.append(fragment)
+        length += len(fragment)
+    return "".join(parts)
+
+
+def run_normalize(args) -> int:
+    """Compare the single-pass normalization engine with the legacy passes."""
+    import pdf_extractor
+
+    text = normalize_sample_text(args.size_mb)
+    timings: Dict[str, List[float]] = {"legacy": [], "engine": []}
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        expected = legacy_normalize(text)
+        timings["legacy"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        actual = pdf_extractor.normalize_text(text, upper=True)
+        timings["engine"].append((time.perf_counter() - start) * 1000)
+
+        if actual != expected:
+            print("MISMATCH: engine output differs from the legacy normalization")
+            return 1
+
+    print(f"Normalizing {len(text) / (1024 * 1024):.1f} MB of text, {args.repeat} runs\n")
+    print_percentile_table(timings)
+    speedup = percentile(timings["legacy"], 50) / percentile(timings["engine"], 50)
+    print(f"\nMedian speed-up: {speedup:.2f}x")
+    return 0
+
+
+SAMPLE_BPPU_TEXT = """KEMENTERIAN KEUANGAN
+DIREKTORAT JENDERAL PAJAK
+BUKTI PEMOTONGAN DAN/ATAU PEMUNGUTAN
+PPh UNIFIKASI
+BPPU
+NOMOR MASA PAJAK SIFAT PEMOTONGAN DAN/ATAU PEMUNGUTAN PPh STATUS BUKTI PEMOTONGAN / PEMUNGUTAN
+2506ABCDE 06-2025 TIDAK FINAL NORMAL
+A. IDENTITAS WAJIB PAJAK YANG DIPOTONG DAN/ATAU DIPUNGUT PPh ATAU PENERIMA PENGHASILAN
+A.1 NPWP / NIK : 0015659428012000
+A.2 NAMA : RSM INDONESIA KONSULTAN
+A.3 NOMOR IDENTITAS TEMPAT KEGIATAN USAHA (NITKU) : 0015659428012000000000
+B. PAJAK PENGHASILAN YANG DIPOTONG DAN/ATAU DIPUNGUT
+B.1 Jenis Fasilitas : Tanpa Fasilitas
+B.2 Kode Objek Pajak : 24-104-14
+B.3 B.4 B.5 B.6 B.7
+KODE OBJEK PAJAK OBJEK PAJAK DPP (Rp) TARIF (%) PAJAK PENGHASILAN (Rp)
+24-104-14 Jasa konsultan 12.500.000 2 250.000
+B.8 Dokumen Dasar Bukti Pemotongan
+Jenis Dokumen : Faktur Pajak
+Tanggal : 05 Juni 2025
+B.9 Nomor Dokumen : INV/2025/06/001
+B.10 Pemotongan ...
+C. IDENTITAS PEMOTONG DAN/ATAU PEMUNGUT PPh
+C.1 NPWP / NIK : 0010000000091000
+C.2 NITKU : 0010000000091000000000
+C.3 NAMA PEMOTONG DAN/ATAU PEMUNGUT PPh : PT BUKIT ASAM TBK
+C.4 TANGGAL : 10 JUNI 2025
+C.5 NAMA PENANDATANGAN : BUDI
+"""
+FUZZ_ANCHORS = ("A. IDENTITAS", "A.3", "B.8", "B.9", "B.10", "C.4", "TANGGAL", "Dokumen")
+FUZZ_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .:-/\n"
+
+
+def fuzz_case(rng, text: str) -> str:
+    """Apply one to three random mutations (truncate, drop anchors, repeat, garble, splice) to a bupot text."""
+    for _ in range(rng.randint(1, 3)):
+        mutation = rng.choice(("truncate", "drop_anchor", "repeat", "garble", "splice"))
+        if mutation == "truncate":
+            text = text[:rng.randint(0, len(text))]
+        elif mutation == "drop_anchor":
+            text = text.replace(rng.choice(FUZZ_ANCHORS), "")
+        elif mutation == "repeat" and text:
+            start = rng.randint(0, len(text) - 1)
+            section = text[start:start + rng.randint(20, 400)]
+            text = text[:start] + section * rng.randint(2, 50) + text[start:]
+        elif mutation == "garble" and text:
+            chars = list(text)
+            for _ in range(rng.randint(1, max(1, len(chars) // 10))):
+                chars[rng.randrange(len(chars))] = rng.choice(FUZZ_ALPHABET)
+            text = "".join(chars)
+        elif mutation == "splice":
+            position = rng.randint(0, len(text))
+            text = text[:position] + SAMPLE_BPPU_TEXT[:rng.randint(0, len(SAMPLE_BPPU_TEXT))] + text[position:]
+    return text
+
+
+def run_fuzz(args) -> int:
+    """
+    Run both BPPU parser paths on truncated and garbled bupot texts.
+
+    Fails if any document takes longer than the ceiling, or if the fast path
+    accepts a document and returns a different record than the generic chain.
+    """
+    import random
+    import pdf_extractor
+
+    parsers = {
+        "fast path": pdf_extractor._parse_standard_bppu,
+        "generic": pdf_extractor._parse_generic,
+    }
+    rng = random.Random(args.seed)
+    timings: Dict[str, List[float]] = {name: [] for name in parsers}
+    slowest = (0.0, "", "")
+    accepted = 0
+    mismatches: List[Tuple[str, List[str]]] = []
+
+    for _ in range(args.cases):
+        text = fuzz_case(rng, SAMPLE_BPPU_TEXT)
+        clean_text = pdf_extractor.normalize_text(text, upper=True)
+        # Both paths run on every case, whether or not the layout check would pick the fast path
+        records = {}
+        for name, parse in parsers.items():
+            start = time.perf_counter()
+            records[name] = parse(clean_text)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            timings[name].append(elapsed_ms)
+            if elapsed_ms > slowest[0]:
+                slowest = (elapsed_ms, name, text)
+
+        fast, generic = records["fast path"], records["generic"]
+        if fast is not None:
+            accepted += 1
+            fields = [field for field in generic if fast[field] != generic[field]]
+            if fields:
+                mismatches.append((text, fields))
+
+    print(f"Parsed {args.cases} mutated documents (seed {args.seed})\n")
+    print_percentile_table(timings)
+    print(f"\nFast path accepted {accepted} documents, {len(mismatches)} differ from the generic chain")
+
+    failed = False
+    if mismatches:
+        print("\nMISMATCH: fields the fast path got wrong")
+        for field, count in Counter(field for _, fields in mismatches for field in fields).most_common():
+            print(f"  {field}: {count}")
+        failed = True
+    if slowest[0] > args.ceiling_ms:
+        print(f"\nREGRESSION: slowest document took {slowest[0]:.1f} ms ({slowest[1]}), ceiling {args.ceiling_ms} ms")
+        failed = True
+
+    if failed and args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            f.write(mismatches[0][0] if mismatches else slowest[2])
+        print(f"{'First mismatching' if mismatches else 'Slowest'} input written to {args.dump}")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Coretax Extractor benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup = subparsers.add_parser("startup", help="Cold-start phase timings")
+    startup.add_argument("--runs", type=int, default=10, help="Number of launches")
+    startup.add_argument("--exe", help="Frozen executable to launch instead of the script")
+    startup.add_argument("--timeout", type=float, default=120, help="Seconds to wait per launch")
+    startup.add_argument("--budget-ms", type=float, help=f"Fail if p90 {USABLE_PHASE} exceeds this")
+    startup.add_argument("--json", help="Write raw phase samples to this file")
+    startup.set_defaults(handler=run_startup)
+
+    memory = subparsers.add_parser("memory", help="RSS across a long extraction batch, in-process and on a worker")
+    memory.add_argument("--dir", required=True, help="Directory of sample PDFs (cycled to fill the batch)")
+    memory.add_argument("--files", type=int, default=10000, help="Number of files to extract")
+    memory.add_argument("--sample-every", type=int, default=500, help="Record RSS every N files")
+    memory.add_argument("--max-growth-mb", type=float, help="Fail if RSS grows more than this after the first sample")
+    memory.set_defaults(handler=run_memory)
+
+    normalize = subparsers.add_parser("normalize", help="Text normalization engine vs legacy passes")
+    normalize.add_argument("--size-mb", type=float, default=20, help="Size of the generated text")
+    normalize.add_argument("--repeat", type=int, default=5, help="Number of timed runs")
+    normalize.set_defaults(handler=run_normalize)
+
+    fuzz = subparsers.add_parser("fuzz", help="Parse time of truncated and garbled bupot text, on both parser paths")
+    fuzz.add_argument("--cases", type=int, default=2000, help="Number of mutated documents")
+    fuzz.add_argument("--seed", type=int, default=1, help="Random seed, for reproducible runs")
+    fuzz.add_argument("--ceiling-ms", type=float, default=50, help="Fail if any document takes longer than this")
+    fuzz.add_argument("--dump", help="Write the first mismatching input, or else the slowest, to this file on failure")
+    fuzz.set_defaults(handler=run_fuzz)
+
+    reparse = subparsers.add_parser("reparse", help="Extraction from PDFs versus from the raw text cache")
+    reparse.add_argument("--dir", required=True, help="Directory of sample PDFs")
+    reparse.add_argument("--workers", type=int, help="Worker processes (default: automatic)")
+    reparse.set_defaults(handler=run_reparse)
+
+    schedule = subparsers.add_parser("schedule", help="Batch wall time by dispatch order")
+    schedule.add_argument("--dir", required=True, help="Directory of sample PDFs, ideally of mixed sizes")
+    schedule.add_argument("--workers", type=int, help="Worker processes (default: automatic)")
+    schedule.set_defaults(handler=run_schedule)
+
+    queue = subparsers.add_parser("queue", help="Distributed extraction with local queue workers")
+    queue.add_argument("--dir", required=True, help="Directory of sample PDFs")
+    queue.add_argument("--workers", type=int, default=2, help="Queue workers to start next to the coordinator")
+    queue.add_argument("--processes", type=int, help="Extraction processes per worker (default: automatic)")
+    queue.add_argument("--idle-exit", type=float, default=5, help="Seconds an idle queue worker waits before exiting")
+    queue.set_defaults(handler=run_queue)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
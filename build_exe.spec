@@ -8,6 +8,19 @@ a = Analysis(
     binaries=[],
     datas=[
         ('db_manager.py', '.'),
+        ('credentials.py', '.'),
+        ('startup_trace.py', '.'),
+        ('pdf_extractor.py', '.'),
+        ('extraction_history.py', '.'),
+        ('pdf_io.py', '.'),
+        ('pdf_ocr.py', '.'),
+        ('extraction_pipeline.py', '.'),
+        ('structured_import.py', '.'),
+        ('npwp.py', '.'),
+        ('text_cache.py', '.'),
+        ('bupot_record.py', '.'),
+        ('job_scheduler.py', '.'),
+        ('job_queue.py', '.'),
         ('update_ui_helper.py', '.'),
         ('version.json', '.'),
         ('rsm.svg', '.'),
@@ -19,6 +32,8 @@ a = Analysis(
         'flet.core',
         'flet.utils',
         'fitz',
+        'pytesseract',
+        'PIL.Image',
         'pandas',
         'openpyxl',
         'sqlite3',
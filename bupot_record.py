@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bupot Record Type for Coretax Extractor
+Compact, typed storage for one extracted bukti potong
+
+A record keeps its fields in __slots__ instead of a per-record dict, with
+DPP and Pajak Penghasilan as int and Tanggal as date. Values that repeat
+across a batch (pemungut name and NPWP, Masa Pajak, Jenis Dokumen, status)
+are interned, so 100k records share one copy of each instead of holding
+their own. Records keep the dict-style access (record['DPP'], get, in,
+items) used throughout the extractor, and exporters read them column by
+column through record_columns().
+"""
+
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Record key -> slot name: the extracted fields, then those set by the extraction run
+FIELD_SLOTS = {
+    'Nomor Bukti Potong': 'nomor_bukti_potong',
+    'Masa Pajak': 'masa_pajak',
+    'NPWP_NIK_Yang_Dipungut': 'npwp_nik_dipungut',
+    'Nama_Yang_Dipungut': 'nama_dipungut',
+    'DPP': 'dpp',
+    'Pajak_Penghasilan': 'pajak_penghasilan',
+    'NPWP_NIK_Pemungut': 'npwp_nik_pemungut',
+    'Nama_Pemungut': 'nama_pemungut',
+    'Tanggal': 'tanggal',
+    'Jenis_Dokumen': 'jenis_dokumen',
+    'Nomor_Dokumen': 'nomor_dokumen',
+    'source_file': 'source_file',
+    'content_hash': 'content_hash',
+    'document_type': 'document_type',
+    'extraction_status': 'extraction_status',
+    'duplicate_of': 'duplicate_of',
+}
+
+# Fields whose values repeat across a batch
+INTERNED_FIELDS = frozenset({
+    'Masa Pajak', 'NPWP_NIK_Yang_Dipungut', 'Nama_Yang_Dipungut',
+    'NPWP_NIK_Pemungut', 'Nama_Pemungut', 'Jenis_Dokumen',
+    'document_type', 'extraction_status',
+})
+
+
+class BupotRecord:
+    """
+    One extracted bukti potong, accessed like a dict keyed by record field.
+
+    A field is present once it has been assigned; the extracted fields are
+    all assigned by pdf_extractor.empty_record(). Assigning a key that is
+    not a record field raises KeyError.
+    """
+
+    __slots__ = tuple(FIELD_SLOTS.values())
+
+    def __init__(self, values: Optional[Dict[str, object]] = None):
+        if values:
+            for key, value in values.items():
+                self[key] = value
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, FIELD_SLOTS[key])
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        if key in INTERNED_FIELDS and type(value) is str:
+            value = sys.intern(value)
+        setattr(self, FIELD_SLOTS[key], value)
+
+    def __contains__(self, key) -> bool:
+        slot = FIELD_SLOTS.get(key)
+        return slot is not None and hasattr(self, slot)
+
+    def get(self, key: str, default=None):
+        """Value of a field, or default when it is not set."""
+        slot = FIELD_SLOTS.get(key)
+        return getattr(self, slot, default) if slot else default
+
+    def keys(self) -> List[str]:
+        """Keys of the fields that are set, in record order."""
+        return [key for key, slot in FIELD_SLOTS.items() if hasattr(self, slot)]
+
+    def items(self) -> List[Tuple[str, object]]:
+        """(key, value) pairs of the fields that are set, in record order."""
+        return [(key, getattr(self, slot)) for key, slot in FIELD_SLOTS.items() if hasattr(self, slot)]
+
+    def to_dict(self) -> Dict[str, object]:
+        """Plain dict copy of the record."""
+        return dict(self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BupotRecord):
+            return self.items() == other.items()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"BupotRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Rebuilt through __setitem__, so values sent back from worker processes are interned again
+        return BupotRecord, (self.to_dict(),)
+
+
+def record_columns(records: List, keys: Iterable[str]) -> Dict[str, list]:
+    """
+    Read records column by column for export.
+
+    Returns {key: values} in the given key order, leaving out keys that no
+    record has set. Works on BupotRecords and plain dicts alike.
+    """
+    columns = {}
+    for key in keys:
+        if any(key in record for record in records):
+            columns[key] = [record.get(key) for record in records]
+    return columns
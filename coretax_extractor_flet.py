@@ -6,21 +6,36 @@ Clean, responsive, and user-friendly interface with company-based authentication
 """
 
 import os
-import re
 import time
 import logging
+import multiprocessing
+import importlib
+import itertools
 import threading
+import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 
+import startup_trace
 import flet as ft
-import fitz  # PyMuPDF
-import pandas as pd
 
+# pdf_extractor (PyMuPDF) and pandas/openpyxl are only needed after login;
+# they are imported on first use and preloaded in the background at start-up
 from db_manager import get_db
+from extraction_history import (
+    DUPLICATE_POLICIES,
+    DUPLICATE_STATUS,
+    INDONESIAN_MONTHS,
+    DuplicateDetector,
+    get_history,
+)
 from update_ui_helper import create_update_button
 
+startup_trace.mark("imports_done")
+
+STATUS_UPDATE_INTERVAL = 0.1  # seconds between progress updates while processing files
+
 def create_logo_image(width: int = 150, height: int = 50):
     """Create RSM logo image."""
     import os
@@ -60,9 +75,10 @@ def create_logo_image(width: int = 150, height: int = 50):
 class AdminPanel:
     """Admin panel for managing companies."""
     
-    def __init__(self, page: ft.Page, on_back):
+    def __init__(self, page: ft.Page, on_back, session_token: str):
         self.page = page
         self.on_back = on_back
+        self.session_token = session_token
         
         # RSM Colors
         self.RSM_GREY = "#5A6670"
@@ -254,7 +270,7 @@ class AdminPanel:
                 ft.OutlinedButton(
                     "Back to Login",
                     icon=ft.Icons.ARROW_BACK,
-                    on_click=lambda e: self.on_back(),
+                    on_click=lambda e: self.close_session(),
                     style=ft.ButtonStyle(
                         color=self.RSM_GREY,
                     ),
@@ -319,8 +335,25 @@ class AdminPanel:
         
         self.page.update()
     
+    def has_valid_session(self) -> bool:
+        """Check the admin session in memory; return to login if it has expired."""
+        if self.db.validate_session(self.session_token, "admin"):
+            return True
+        
+        self.show_error("Admin session expired. Please log in again.")
+        self.on_back()
+        return False
+    
+    def close_session(self):
+        """End the admin session and return to login."""
+        self.db.logout(self.session_token)
+        self.on_back()
+    
     def add_company(self, e):
         """Add a new company."""
+        if not self.has_valid_session():
+            return
+        
         company_name = self.new_company_name.value.strip()
         npwp = self.new_company_npwp.value.strip()
         
@@ -339,6 +372,9 @@ class AdminPanel:
     
     def edit_company(self, company_name: str, company_npwp: str):
         """Edit a company."""
+        if not self.has_valid_session():
+            return
+        
         # Create edit fields
         edit_name_field = ft.TextField(
             label="Company Name",
@@ -360,6 +396,9 @@ class AdminPanel:
         )
         
         def save_edit(e):
+            if not self.has_valid_session():
+                return
+            
             new_name = edit_name_field.value.strip()
             new_npwp = edit_npwp_field.value.strip()
             
@@ -415,7 +454,13 @@ class AdminPanel:
     
     def delete_company(self, company_name: str):
         """Delete a company."""
+        if not self.has_valid_session():
+            return
+        
         def confirm_delete(e):
+            if not self.has_valid_session():
+                return
+            
             dialog.open = False
             self.page.update()
             
@@ -468,6 +513,9 @@ class AdminPanel:
     
     def change_username(self, e):
         """Change admin username."""
+        if not self.has_valid_session():
+            return
+        
         # Get current username
         current_username = self.db.get_admin_username()
         
@@ -487,6 +535,9 @@ class AdminPanel:
         )
         
         def save_username(e):
+            if not self.has_valid_session():
+                return
+            
             new_username = username_field.value.strip()
             
             if not new_username:
@@ -541,6 +592,9 @@ class AdminPanel:
     
     def change_password(self, e):
         """Change admin password."""
+        if not self.has_valid_session():
+            return
+        
         current_password_field = ft.TextField(
             label="Current Password",
             password=True,
@@ -572,6 +626,9 @@ class AdminPanel:
         )
         
         def save_password(e):
+            if not self.has_valid_session():
+                return
+            
             current_password = current_password_field.value
             new_password = new_password_field.value
             confirm_password = confirm_password_field.value
@@ -645,6 +702,9 @@ class AdminPanel:
     
     def change_app_password(self, e):
         """Change application password."""
+        if not self.has_valid_session():
+            return
+        
         current_password_field = ft.TextField(
             label="Current App Password",
             password=True,
@@ -676,6 +736,9 @@ class AdminPanel:
         )
         
         def save_app_password(e):
+            if not self.has_valid_session():
+                return
+            
             current_password = current_password_field.value
             new_password = new_password_field.value
             confirm_password = confirm_password_field.value
@@ -886,6 +949,9 @@ class LoginPage:
             )
         )
         self.page.update()
+        
+        startup_trace.mark("login_page_shown")
+        startup_trace.write()
     
     def on_company_selected(self, e):
         """Handle company selection."""
@@ -937,10 +1003,11 @@ class LoginPage:
                 return
             
             db = get_db()
-            if db.verify_admin_password(password):
+            session_token = db.login_admin(password)
+            if session_token:
                 dialog.open = False
                 self.page.update()
-                self.show_admin_panel()
+                self.show_admin_panel(session_token)
             else:
                 error_text.value = "Incorrect password"
                 error_text.visible = True
@@ -981,14 +1048,14 @@ class LoginPage:
         dialog.open = True
         self.page.update()
     
-    def show_admin_panel(self):
+    def show_admin_panel(self, session_token: str):
         """Show admin panel."""
         def back_to_login():
             self.page.controls.clear()
             self.page.update()
             LoginPage(self.page, self.on_login_success)
         
-        AdminPanel(self.page, back_to_login)
+        AdminPanel(self.page, back_to_login, session_token)
 
 
 class CoretaxExtractorApp:
@@ -1010,6 +1077,9 @@ class CoretaxExtractorApp:
         self.pdf_files = []
         self.output_dir = ""
         self.is_processing = False
+        self.duplicate_files = []
+        self.quarantined_files = []
+        self.template_counts = {}
         
         # Setup logging
         self._setup_logging()
@@ -1377,9 +1447,9 @@ class CoretaxExtractorApp:
         self.page.update()
         
         file_picker.pick_files(
-            allowed_extensions=["pdf"],
+            allowed_extensions=["pdf", "zip", "xml", "xlsx", "xlsm", "csv"],
             allow_multiple=True,
-            dialog_title="Select Coretax PDF files"
+            dialog_title="Select Coretax PDF files, ZIP bundles or structured exports"
         )
     
     def on_pdf_files_selected(self, e: ft.FilePickerResultEvent):
@@ -1542,18 +1612,43 @@ class CoretaxExtractorApp:
             logger.info("="*50)
             
             start_time = time.time()
+            started_at = datetime.now()
+            run_id = uuid.uuid4().hex
+            
+            # Structured exports (XML/Excel/CSV) are imported directly, without any PDF parsing
+            import structured_import
+            export_files = [path for path in self.pdf_files if structured_import.is_structured_export(path)]
+            pdf_files = [path for path in self.pdf_files if not structured_import.is_structured_export(path)]
+            imported = []
+            if export_files:
+                self.update_status("Importing structured exports...")
+                imported = structured_import.import_exports(export_files)
+            
+            # ZIP bundles are expanded to the PDFs inside them, which are read in memory
+            import pdf_io
+            if any(pdf_io.is_zip_name(path) for path in pdf_files):
+                self.update_status("Reading ZIP archives...")
+                pdf_files = pdf_io.expand_archives(pdf_files)
             
             # Process all PDFs
-            results, failed_files = self.process_pdf_files(self.pdf_files)
+            results, failed_files = self.process_pdf_files(pdf_files, imported)
             
-            total_files = len(self.pdf_files)
+            total_files = len(pdf_files) + len(imported)
             successful_files = len([r for r in results if r.get('extraction_status') == 'Success'])
             incomplete_files = len([r for r in results if r.get('extraction_status') == 'Incomplete'])
             completely_failed = len(failed_files) - incomplete_files
-            skipped_files = total_files - len(results) - completely_failed
+            duplicate_count = len(self.duplicate_files)
+            quarantined_count = len(self.quarantined_files)
+            dropped_duplicates = duplicate_count - len([r for r in results if r.get('extraction_status') == DUPLICATE_STATUS])
+            skipped_files = total_files - len(results) - completely_failed - dropped_duplicates
             
             if not results:
                 logger.warning("No data extracted from any PDF files")
+                self._audit_extraction_run(
+                    "EXTRACTION_FAILED",
+                    f"Company: {self.company_name}; files: {total_files}; "
+                    f"failed: {completely_failed}; skipped: {skipped_files}; no data extracted"
+                )
                 
                 # Check if all files were skipped due to NPWP mismatch
                 if skipped_files == total_files:
@@ -1576,6 +1671,7 @@ class CoretaxExtractorApp:
             
             # Save results
             output_file = self.save_extraction_results(results, self.output_dir)
+            self._save_extraction_history(run_id, results, started_at, total_files, output_file)
             
             # Statistics
             total_time = time.time() - start_time
@@ -1586,12 +1682,29 @@ class CoretaxExtractorApp:
             logger.info(f"Incomplete extraction: {incomplete_files}")
             logger.info(f"Failed: {completely_failed}")
             logger.info(f"Skipped (NPWP mismatch): {skipped_files}")
+            logger.info(f"Duplicates: {duplicate_count} ({dropped_duplicates} dropped)")
+            logger.info(f"Quarantined: {quarantined_count}")
             logger.info(f"Total time: {total_time:.2f} seconds")
             
+            # Layout templates: how many PDFs the fast parsers handled vs the generic fallback
+            parsed_files = sum(self.template_counts.values())
+            for template, count in sorted(self.template_counts.items(), key=lambda item: -item[1]):
+                logger.info(f"Layout {template}: {count}/{parsed_files} ({count / parsed_files * 100:.1f}%)")
+            template_stats = ", ".join(f"{template}={count}" for template, count in sorted(self.template_counts.items()))
+            
+            self._audit_extraction_run(
+                "EXTRACTION_RUN",
+                f"Company: {self.company_name}; files: {total_files}; success: {successful_files}; "
+                f"incomplete: {incomplete_files}; failed: {completely_failed}; skipped: {skipped_files}; "
+                f"duplicates: {duplicate_count}; quarantined: {quarantined_count}; "
+                f"templates: {template_stats}; time: {total_time:.2f}s; "
+                f"output: {Path(output_file).name}"
+            )
+            
             # Show extraction statistics
             key_fields = ['Nomor Bukti Potong', 'DPP', 'Pajak_Penghasilan', 'NPWP_NIK_Yang_Dipungut', 'Nama_Yang_Dipungut']
             for field in key_fields:
-                success = sum(1 for item in results if item.get(field))
+                success = sum(1 for item in results if item.get(field) not in (None, ''))
                 logger.info(f"{field}: {success}/{len(results)} extracted ({(success/len(results)*100):.1f}%)")
             
             logger.info(f"Results saved to: {output_file}")
@@ -1621,6 +1734,13 @@ class CoretaxExtractorApp:
             if skipped_files > 0:
                 summary_msg += f"⊘ Skipped (NPWP Mismatch): {skipped_files}\n"
             
+            if duplicate_count > 0:
+                action = "dropped" if dropped_duplicates else "flagged"
+                summary_msg += f"⧉ Duplicate Bukti Potong ({action}): {duplicate_count}\n"
+            
+            if quarantined_count > 0:
+                summary_msg += f"⏱ Quarantined (too slow/large, see log): {quarantined_count}\n"
+            
             summary_msg += f"\nResults saved to:\n{output_file}\n"
             
             # Show detailed failed files if any
@@ -1651,11 +1771,34 @@ class CoretaxExtractorApp:
             
         except Exception as e:
             logger.error(f"Extraction failed: {str(e)}")
+            self._audit_extraction_run("EXTRACTION_FAILED", f"Company: {self.company_name}; error: {str(e)}")
             self.show_dialog("Extraction Error", f"An error occurred:\n\n{str(e)}", "error")
             self.update_status("Extraction failed.")
         finally:
             self.set_processing(False)
     
+    def _save_extraction_history(self, run_id: str, results: List[Dict], started_at: datetime,
+                                 total_files: int, output_file: str):
+        """Persist extracted records to the history store without failing the run."""
+        logger = logging.getLogger(__name__)
+        try:
+            stored = get_history().save_run(
+                run_id,
+                self.company_name,
+                self.company_npwp,
+                results,
+                started_at=started_at,
+                total_files=total_files,
+                output_file=output_file,
+            )
+            logger.info(f"Saved {stored} records to extraction history (run {run_id})")
+        except Exception as e:
+            logger.warning(f"Failed to save extraction history: {str(e)}")
+    
+    def _audit_extraction_run(self, action: str, details: str):
+        """Record an extraction run in the audit log."""
+        get_db().log_action(action, details)
+    
     def show_dialog(self, title: str, message: str, dialog_type: str = "info"):
         """Show dialog message."""
         icons = {
@@ -1692,341 +1835,226 @@ class CoretaxExtractorApp:
         self.page.update()
     
     # ========================================================================
-    # PDF Extraction Functions (from coretax_extractor_ui.py)
+    # PDF Extraction Functions (see pdf_extractor.py)
     # ========================================================================
     
-    def extract_text_from_pdf(self, pdf_path: Path) -> str:
+    def extract_text_from_pdf(self, pdf_path: Path, data=None) -> str:
         """Extract raw text directly from PDF using PyMuPDF."""
-        logger = logging.getLogger(__name__)
-        
-        try:
-            logger.info(f"Extracting text from: {pdf_path.name}")
-            
-            pdf_document = fitz.open(str(pdf_path))
-            full_text = ""
-            page_count = pdf_document.page_count
-            
-            for page_num in range(page_count):
-                page = pdf_document[page_num]
-                page_text = page.get_text()
-                full_text += page_text + "\n"
-            
-            pdf_document.close()
-            
-            logger.info(f"Extracted {len(full_text)} characters from {page_count} pages")
-            return full_text.strip()
-            
-        except Exception as e:
-            logger.error(f"Failed to extract text from {pdf_path.name}: {str(e)}")
-            return ""
+        import pdf_extractor
+        return pdf_extractor.extract_text_from_pdf(pdf_path, data)
     
     def clean_and_normalize_pdf_text(self, text: str) -> str:
         """Clean and normalize text extracted directly from PDF."""
-        if not text:
-            return ""
-        
-        # First normalize all whitespace to single space
-        cleaned = re.sub(r'\s+', ' ', text.strip())
-        
-        # Apply specific replacements
-        replacements = {
-            r'KEMENTERIAN\s*KEUANGAN': 'KEMENTERIAN KEUANGAN',
-            r'BUKTI\s*PEMOTONGAN\s*DAN': 'BUKTI PEMOTONGAN DAN',
-            r'PEMUNGUTAN\s*PPH': 'PEMUNGUTAN PPH',
-            r'MASA\s*PAJAK': 'MASA PAJAK',
-            r'TIDAK\s*FINAL': 'TIDAK FINAL',
-            r'RSM\s*INDONESIA': 'RSM INDONESIA',
-            r'BUKIT\s*ASAM': 'BUKIT ASAM',
-            # Fix decimal/thousand separators in numbers
-            r'(\d)\s+([.,])\s*(\d)': r'\1\2\3',
-        }
-        
-        for pattern, replacement in replacements.items():
-            cleaned = re.sub(pattern, replacement, cleaned, flags=re.IGNORECASE)
-        
-        return cleaned.strip()
-
+        import pdf_extractor
+        return pdf_extractor.clean_and_normalize_pdf_text(text)
+    
     def extract_bukti_potong_fields_from_pdf(self, text: str, filename: str) -> Dict[str, str]:
         """Extract structured fields from PDF text."""
+        import pdf_extractor
+        return pdf_extractor.extract_bukti_potong_fields_from_pdf(text, filename)
+    
+    def process_pdf_files(self, pdf_files: List[str], imported: Optional[list] = None) -> tuple:
+        """
+        Process multiple PDF files and extract structured data.
         
-        data = {
-            'Nomor Bukti Potong': '',
-            'Masa Pajak': '',
-            'NPWP_NIK_Yang_Dipungut': '',
-            'Nama_Yang_Dipungut': '',
-            'DPP': '',
-            'Pajak_Penghasilan': '',
-            'NPWP_NIK_Pemungut': '',
-            'Nama_Pemungut': '',
-            'Tanggal': '',
-            'Jenis_Dokumen': '',
-            'Nomor_Dokumen': '',
-        }
-        
-        clean_text = self.clean_and_normalize_pdf_text(text).upper()
-        
-        # 1. Extract Nomor Bukti Potong
-        # Karena ini output sistem dengan format konsisten, gunakan pendekatan berbasis konteks
-        # Nomor Bukti Potong selalu ada setelah header "NOMOR" dan "MASA PAJAK", sebelum "A. IDENTITAS"
-        bupot_patterns = [
-            # Pattern 1: Antara "MASA PAJAK" dan "A. IDENTITAS" (paling robust)
-            # Format: MASA PAJAK ... [NOMOR] [MM-YYYY] ... A. IDENTITAS
-            r'MASA\s+PAJAK.*?([A-Z0-9]{8,10})\s+(\d{2}-\d{4}).*?A\.\s+IDENTITAS',
-            
-            # Pattern 2: Setelah "PEMUNGUTAN" (high confidence)
-            r'PEMUNGUTAN\s+([A-Z0-9]{8,10})\s+\d{2}-\d{4}',
-            
-            # Pattern 3: Antara "NOMOR" dan "MASA PAJAK" dengan konteks
-            r'NOMOR\s+MASA\s+PAJAK.*?([A-Z0-9]{8,10})\s+\d{2}-\d{4}',
-            
-            # Pattern 4: Di area header setelah "BPPU"
-            r'BPPU.*?([A-Z0-9]{8,10})\s+\d{2}-\d{4}',
-        ]
-        
-        for pattern in bupot_patterns:
-            match = re.search(pattern, clean_text, re.DOTALL)
-            if match:
-                result = match.group(1)
-                
-                data['Nomor Bukti Potong'] = result
-                break
-        
-        # 2. Extract Masa Pajak
-        masa_patterns = [
-            r'(\d{2}-\d{4})\s*TIDAK\s*FINAL',
-            r'(\d{2}-\d{4})\s*NORMAL',
-            r'MASA\s*PAJAK.*?(\d{2}-\d{4})',
-            r'(\d{2}-\d{4})'
-        ]
-        
-        for pattern in masa_patterns:
-            match = re.search(pattern, clean_text)
-            if match:
-                masa = match.group(1)
-                # Convert MM-YYYY to "Bulan YYYY" format
-                if re.match(r'\d{2}-\d{4}', masa):
-                    month_num, year = masa.split('-')
-                    month_names = ['', 'Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
-                                  'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
-                    try:
-                        masa = f"{month_names[int(month_num)]} {year}"
-                    except:
-                        pass  # Keep original format if conversion fails
-                data['Masa Pajak'] = masa
-                break
-        
-        # 3. Extract NPWP numbers
-        a1_match = re.search(r'A\.1\s*NPWP\s*/\s*NIK\s*:\s*(\d{15,16})', clean_text)
-        if a1_match:
-            data['NPWP_NIK_Yang_Dipungut'] = a1_match.group(1)
-        
-        c1_match = re.search(r'C\.1\s*NPWP\s*/\s*NIK\s*:\s*(\d{15,16})', clean_text)
-        if c1_match:
-            data['NPWP_NIK_Pemungut'] = c1_match.group(1)
-        
-        # 4. Extract A2 - Nama yang dipungut
-        a2_match = re.search(r'A\.2\s*NAMA\s*:\s*(.*?)(?=A\.3)', clean_text, re.DOTALL)
-        if a2_match:
-            nama = a2_match.group(1).strip()
-            nama = re.sub(r'\s+', ' ', nama)
-            data['Nama_Yang_Dipungut'] = nama
-        
-        # 5 & 6. Extract DPP (B.5) and Pajak Penghasilan (B.7)
-        # Support both inline and table formats
-        
-        # Try inline format first (with colon)
-        b5_inline = re.search(r'B\.5\s*[^:]*:\s*(\d{1,3}(?:\.\d{3})*)', clean_text, re.IGNORECASE)
-        if b5_inline:
-            dpp_str = b5_inline.group(1)
-            dpp_value = int(dpp_str.replace('.', ''))
-            data['DPP'] = f"{dpp_value:,}"
-        
-        b7_inline = re.search(r'B\.7\s*[^:]*:\s*(\d{1,3}(?:\.\d{3})*)', clean_text, re.IGNORECASE)
-        if b7_inline:
-            tax_str = b7_inline.group(1)
-            tax_value = int(tax_str.replace('.', ''))
-            data['Pajak_Penghasilan'] = f"{tax_value:,}"
-        
-        # If not found, try table format
-        # Table format: B.3 B.4 B.5 B.6 B.7 header, then data row with amounts
-        if not data['DPP'] or not data['Pajak_Penghasilan']:
-            table_match = re.search(r'B\.3\s+B\.4\s+B\.5\s+B\.6\s+B\.7(.*?)B\.8', clean_text, re.DOTALL | re.IGNORECASE)
-            if table_match:
-                table_content = table_match.group(1)
-                # Find all numbers with thousand separators in table
-                table_numbers = re.findall(r'\d{1,3}(?:\.\d{3})+', table_content)
-                
-                if len(table_numbers) >= 2:
-                    # First large number is DPP, last number is Tax
-                    if not data['DPP']:
-                        dpp_value = int(table_numbers[0].replace('.', ''))
-                        data['DPP'] = f"{dpp_value:,}"
-                    
-                    if not data['Pajak_Penghasilan']:
-                        tax_value = int(table_numbers[-1].replace('.', ''))
-                        data['Pajak_Penghasilan'] = f"{tax_value:,}"
-        
-        # 7. Extract C3 - Nama pemungut
-        c3_patterns = [
-            r'C\.3\s*NAMA\s*PEMOTONG\s*DAN/ATAU\s*PEMUNGUT\s*PPh\s*:\s*(.*?)(?=C\.4)',
-            r'C\.3\s*NAMA\s*:\s*(.*?)(?=C\.4)',
-        ]
-        
-        for pattern in c3_patterns:
-            c3_match = re.search(pattern, clean_text, re.DOTALL | re.IGNORECASE)
-            if c3_match:
-                pemungut = c3_match.group(1).strip()
-                pemungut = re.sub(r'\s+', ' ', pemungut)
-                data['Nama_Pemungut'] = pemungut
-                break
-        
-        # 8. Extract C4 - Tanggal
-        date_patterns = [
-            r'C\.4\s*TANGGAL\s*:\s*(\d{1,2})\s+(JANUARI|FEBRUARI|MARET|APRIL|MEI|JUNI|JULI|AGUSTUS|SEPTEMBER|OKTOBER|NOVEMBER|DESEMBER)\s+(\d{4})',
-            r'TANGGAL\s*:\s*(\d{1,2})\s+(JANUARI|FEBRUARI|MARET|APRIL|MEI|JUNI|JULI|AGUSTUS|SEPTEMBER|OKTOBER|NOVEMBER|DESEMBER)\s+(\d{4})',
-            r':\s*(\d{1,2})\s+(MEI|APRIL|JANUARI|FEBRUARI|MARET|JUNI|JULI|AGUSTUS|SEPTEMBER|OKTOBER|NOVEMBER|DESEMBER)\s+(\d{4})',
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, clean_text)
-            if match:
-                day, month, year = match.groups()
-                month_map = {
-                    'JANUARI': 'Januari', 'FEBRUARI': 'Februari', 'MARET': 'Maret',
-                    'APRIL': 'April', 'MEI': 'Mei', 'JUNI': 'Juni',
-                    'JULI': 'Juli', 'AGUSTUS': 'Agustus', 'SEPTEMBER': 'September',
-                    'OKTOBER': 'Oktober', 'NOVEMBER': 'November', 'DESEMBER': 'Desember'
-                }
-                formatted_month = month_map.get(month.upper(), month.title())
-                data['Tanggal'] = f"{day} {formatted_month} {year}"
-                break
-        
-        # 9. Extract B8 - Jenis Dokumen
-        b8_patterns = [
-            r'B\.8.*?JENIS\s*DOKUMEN\s*:\s*([^\n]+?)(?=\s*TANGGAL|B\.9|$)',
-            r'JENIS\s*DOKUMEN\s*:\s*([^\n]+?)(?=\s*TANGGAL|B\.9|$)',
-        ]
-        
-        for pattern in b8_patterns:
-            match = re.search(pattern, clean_text, re.DOTALL)
-            if match:
-                jenis_dok = match.group(1).strip()
-                jenis_dok = re.sub(r'\s+', ' ', jenis_dok)
-                data['Jenis_Dokumen'] = jenis_dok
-                break
-        
-        # 10. Extract B9 - Nomor Dokumen
-        # Support multiple formats:
-        # Format 1 (inline): B.9 NOMOR DOKUMEN : 250331/25
-        # Format 2 (multiline): B.9\nNomor Dokumen\n:\n250331/25
-        b9_patterns = [
-            # Format 1: Inline with space support (stops at B.10)
-            r'B\.9\s*NOMOR\s*DOKUMEN\s*:\s*(.+?)(?=\s*B\.10)',
-            # Format 2: Multiline format
-            r'B\.9\s*\n?\s*Nomor\s*Dokumen\s*\n?\s*:\s*\n?\s*(.+?)(?=\s*B\.10)',
-            # Fallback: Just NOMOR DOKUMEN (stops at B.10)
-            r'NOMOR\s*DOKUMEN\s*:\s*(.+?)(?=\s*B\.10)',
-        ]
-        
-        for pattern in b9_patterns:
-            match = re.search(pattern, clean_text, re.DOTALL | re.IGNORECASE)
-            if match:
-                nomor_dok = match.group(1).strip()
-                nomor_dok = re.sub(r'\s+', ' ', nomor_dok)
-                data['Nomor_Dokumen'] = nomor_dok
-                break
-        
-        return data
-    
-    def process_pdf_files(self, pdf_files: List[str]) -> tuple:
-        """Process multiple PDF files and extract structured data."""
+        Records already imported from structured exports (ParsedPdf results from
+        structured_import) go through the same filtering and checks, ahead of the PDFs.
+        """
         logger = logging.getLogger(__name__)
+        imported = imported or []
+        total_inputs = len(imported) + len(pdf_files)
         results = []
         failed_files = []
         skipped_files = []
+        self.duplicate_files = []
+        self.quarantined_files = []
+        self.template_counts = {}
+        
+        duplicate_policy = get_db().get_setting('duplicate_policy', 'flag')
+        if duplicate_policy not in DUPLICATE_POLICIES:
+            logger.warning(f"Unknown duplicate policy '{duplicate_policy}', flagging duplicates instead")
+            duplicate_policy = 'flag'
+        
+        import extraction_pipeline
+        import pdf_extractor
+        from npwp import canonical_npwp
+        from text_cache import get_text_cache
+        workers = int(self._numeric_setting('extraction_workers', 0))
+        file_timeout = self._numeric_setting('file_timeout_seconds', extraction_pipeline.DEFAULT_FILE_TIMEOUT)
+        file_memory_mb = self._numeric_setting('file_memory_limit_mb', extraction_pipeline.DEFAULT_FILE_MEMORY_MB)
         
         logger.info(f"Found {len(pdf_files)} PDF files to process")
+        if imported:
+            logger.info(f"Plus {len(imported)} records from structured exports")
         logger.info(f"Filtering for company: {self.company_name} (NPWP: {self.company_npwp})")
         logger.info(f"Only PDFs matching NPWP {self.company_npwp} will be processed")
         
-        for i, pdf_file in enumerate(pdf_files, 1):
-            try:
-                pdf_path = Path(pdf_file)
-                logger.info(f"Processing ({i}/{len(pdf_files)}): {pdf_path.name}")
+        # Canonical keys are computed once: 15/16-digit, zero-padded and NITKU forms of an NPWP all match
+        company_npwp_key = canonical_npwp(self.company_npwp)
+        company_index = get_db().get_company_index()
+        
+        # Files are read ahead on an I/O thread and parsed in watchdog-supervised worker
+        # processes, longest predicted jobs first; results arrive in input order so
+        # filtering and duplicate checks stay sequential
+        pipeline_options = dict(
+            workers=workers or None,
+            file_timeout=file_timeout,
+            file_memory_mb=file_memory_mb,
+            text_cache=get_text_cache(),
+            history=get_history(),
+        )
+        distributed_queue = get_db().get_setting('distributed_queue')
+        if not pdf_files:
+            pipeline = []
+        elif distributed_queue:
+            # Workers on other PCs (python job_queue.py work --queue ...) claim jobs from the
+            # shared queue; this machine extracts too, so the batch finishes without them
+            import job_queue
+            logger.info(f"Sharing extraction through the job queue at {distributed_queue}")
+            pipeline = job_queue.DistributedPipeline(pdf_files, job_queue.JobQueue(distributed_queue), **pipeline_options)
+        else:
+            pipeline = extraction_pipeline.ExtractionPipeline(pdf_files, **pipeline_options)
+        
+        # Export rows are logged once per export file, and the status bar (a UI round trip)
+        # is refreshed at most every STATUS_UPDATE_INTERVAL, so large imports are not
+        # slowed down by per-row logging and page updates
+        export_row_counts = {}
+        for parsed in imported:
+            export_row_counts[parsed.path] = export_row_counts.get(parsed.path, 0) + 1
+        last_status_update = 0.0
+        
+        with DuplicateDetector(get_history()) as duplicate_detector:
+            for i, parsed in enumerate(itertools.chain(imported, pipeline), 1):
+                source_file = parsed.source
+                is_export_row = i <= len(imported)
+                try:
+                    if not is_export_row:
+                        logger.info(f"Processing ({i}/{total_inputs}): {source_file}")
+                    elif parsed.path in export_row_counts:
+                        logger.info(f"Processing {export_row_counts.pop(parsed.path)} records from {Path(parsed.path).name}")
                 
-                progress = (i / len(pdf_files)) * 100
-                self.update_status(f"Processing... {progress:.1f}%")
+                    now = time.monotonic()
+                    if i == total_inputs or now - last_status_update >= STATUS_UPDATE_INTERVAL:
+                        progress = (i / total_inputs) * 100
+                        self.update_status(f"Processing... {progress:.1f}%")
+                        last_status_update = now
                 
-                extracted_text = self.extract_text_from_pdf(pdf_path)
+                    if parsed.quarantined:
+                        self.quarantined_files.append({
+                            'filename': source_file,
+                            'reason': parsed.error
+                        })
+                        failed_files.append({
+                            'filename': source_file,
+                            'error': f"Quarantined: {parsed.error}"
+                        })
+                        continue
                 
-                if not extracted_text:
-                    error_msg = "No text extracted from PDF"
-                    logger.warning(f"{error_msg}: {pdf_path.name}")
-                    failed_files.append({
-                        'filename': pdf_path.name,
-                        'error': error_msg
-                    })
-                    continue
+                    if parsed.error:
+                        logger.warning(f"{parsed.error}: {source_file}")
+                        failed_files.append({
+                            'filename': source_file,
+                            'error': parsed.error
+                        })
+                        continue
+                
+                    if not parsed.fields and parsed.document_type:
+                        # Classified from page 1 as a document type that is not extracted
+                        document_type = pdf_extractor.DOCUMENT_TYPES.get(parsed.document_type)
+                        if document_type:
+                            error_msg = f"Not a bukti potong: {document_type.label} document"
+                        else:
+                            error_msg = "Unrecognized document type (not a Coretax bukti potong)"
+                        logger.warning(f"{error_msg}: {source_file}")
+                        failed_files.append({
+                            'filename': source_file,
+                            'error': error_msg
+                        })
+                        continue
+                
+                    if not parsed.fields:
+                        error_msg = "No text extracted from PDF"
+                        logger.warning(f"{error_msg}: {source_file}")
+                        failed_files.append({
+                            'filename': source_file,
+                            'error': error_msg
+                        })
+                        continue
                 
-                structured_data = self.extract_bukti_potong_fields_from_pdf(extracted_text, pdf_path.name)
-                structured_data['source_file'] = pdf_path.name
+                    structured_data = parsed.fields
+                    self.template_counts[parsed.template] = self.template_counts.get(parsed.template, 0) + 1
+                    structured_data['source_file'] = source_file
+                    structured_data['content_hash'] = parsed.content_hash
+                    structured_data['document_type'] = parsed.document_type or pdf_extractor.DEFAULT_DOCUMENT_TYPE
                 
-                # Check if this PDF belongs to the logged-in company (using NPWP ONLY)
-                npwp_dipungut = structured_data.get('NPWP_NIK_Yang_Dipungut', '').strip()
-                nama_dipungut = structured_data.get('Nama_Yang_Dipungut', '').strip()
+                    # Check if this PDF belongs to the logged-in company (using NPWP ONLY)
+                    npwp_dipungut = structured_data.get('NPWP_NIK_Yang_Dipungut', '').strip()
+                    nama_dipungut = structured_data.get('Nama_Yang_Dipungut', '').strip()
+                    pdf_npwp_key = canonical_npwp(npwp_dipungut)
                 
-                # Clean NPWP for comparison (remove dots, dashes, spaces)
-                def clean_npwp(npwp: str) -> str:
-                    return ''.join(c for c in npwp if c.isalnum())
+                    # Compare NPWP ONLY (if both exist and not empty)
+                    if company_npwp_key and pdf_npwp_key:
+                        if company_npwp_key != pdf_npwp_key:
+                            # This PDF doesn't belong to the logged-in company (based on NPWP)
+                            # Display both name and NPWP for clarity in logging
+                            display_info = f"{nama_dipungut} (NPWP: {npwp_dipungut})" if nama_dipungut else f"NPWP: {npwp_dipungut}"
+                            logger.warning(f"Skipping {source_file}: Belongs to {display_info}")
+                            logger.warning(f"  Expected NPWP: {self.company_npwp} ({self.company_name})")
+                            logger.warning(f"  Found NPWP: {npwp_dipungut}")
+                            registered_company = company_index.company_for(pdf_npwp_key)
+                            skipped_files.append({
+                                'filename': source_file,
+                                'company_name': nama_dipungut,
+                                'company_npwp': npwp_dipungut,
+                                'registered_company': registered_company,
+                                'reason': f"NPWP mismatch"
+                            })
+                            continue
+                    else:
+                        # If NPWP not found, log warning but continue processing
+                        logger.warning(f"{source_file}: NPWP not found in PDF or company data, processing anyway")
                 
-                company_npwp_clean = clean_npwp(self.company_npwp)
-                pdf_npwp_clean = clean_npwp(npwp_dipungut)
+                    critical_fields = ['Nomor Bukti Potong', 'DPP', 'Pajak_Penghasilan']
+                    missing_fields = [field for field in critical_fields if structured_data.get(field) in (None, '')]
                 
-                # Compare NPWP ONLY (if both exist and not empty)
-                if company_npwp_clean and pdf_npwp_clean:
-                    if company_npwp_clean != pdf_npwp_clean:
-                        # This PDF doesn't belong to the logged-in company (based on NPWP)
-                        # Display both name and NPWP for clarity in logging
-                        display_info = f"{nama_dipungut} (NPWP: {npwp_dipungut})" if nama_dipungut else f"NPWP: {npwp_dipungut}"
-                        logger.warning(f"Skipping {pdf_path.name}: Belongs to {display_info}")
-                        logger.warning(f"  Expected NPWP: {self.company_npwp} ({self.company_name})")
-                        logger.warning(f"  Found NPWP: {npwp_dipungut}")
-                        skipped_files.append({
-                            'filename': pdf_path.name,
-                            'company_name': nama_dipungut,
-                            'company_npwp': npwp_dipungut,
-                            'reason': f"NPWP mismatch"
+                    if missing_fields:
+                        error_msg = f"Missing critical fields: {', '.join(missing_fields)}"
+                        logger.warning(f"{source_file}: {error_msg}")
+                        failed_files.append({
+                            'filename': source_file,
+                            'error': error_msg
                         })
-                        continue
-                else:
-                    # If NPWP not found, log warning but continue processing
-                    logger.warning(f"{pdf_path.name}: NPWP not found in PDF or company data, processing anyway")
+                        structured_data['extraction_status'] = 'Incomplete'
+                    else:
+                        structured_data['extraction_status'] = 'Success'
+                        
+                        duplicate_of = duplicate_detector.check(structured_data)
+                        if duplicate_of:
+                            bupot = structured_data.get('Nomor Bukti Potong')
+                            self.duplicate_files.append({
+                                'filename': source_file,
+                                'bupot': bupot,
+                                'duplicate_of': duplicate_of,
+                            })
+                            if duplicate_policy == 'drop':
+                                logger.warning(f"Dropping duplicate {source_file}: Bupot {bupot} already in {duplicate_of}")
+                                continue
+                            logger.warning(f"Duplicate {source_file}: Bupot {bupot} already in {duplicate_of}")
+                            structured_data['extraction_status'] = DUPLICATE_STATUS
+                            structured_data['duplicate_of'] = duplicate_of
+                
+                    results.append(structured_data)
                 
-                critical_fields = ['Nomor Bukti Potong', 'DPP', 'Pajak_Penghasilan']
-                missing_fields = [field for field in critical_fields if not structured_data.get(field)]
+                    if not is_export_row:
+                        logger.info(f"Processed: {source_file} - Bupot={structured_data.get('Nomor Bukti Potong', 'N/A')}, DPP={structured_data.get('DPP', 'N/A')}")
                 
-                if missing_fields:
-                    error_msg = f"Missing critical fields: {', '.join(missing_fields)}"
-                    logger.warning(f"{pdf_path.name}: {error_msg}")
+                except Exception as e:
+                    error_msg = str(e)
+                    logger.error(f"Failed to process {parsed.path}: {error_msg}")
                     failed_files.append({
-                        'filename': pdf_path.name,
+                        'filename': source_file,
                         'error': error_msg
                     })
-                    structured_data['extraction_status'] = 'Incomplete'
-                else:
-                    structured_data['extraction_status'] = 'Success'
-                
-                results.append(structured_data)
-                
-                logger.info(f"Processed: {pdf_path.name} - Bupot={structured_data.get('Nomor Bukti Potong', 'N/A')}, DPP={structured_data.get('DPP', 'N/A')}")
-                
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Failed to process {pdf_file}: {error_msg}")
-                failed_files.append({
-                    'filename': Path(pdf_file).name,
-                    'error': error_msg
-                })
         
         # Log skipped files summary
         if skipped_files:
@@ -2034,13 +2062,35 @@ class CoretaxExtractorApp:
             logger.info(f"SKIPPED FILES (NPWP mismatch with {self.company_name} - NPWP: {self.company_npwp}):")
             for skipped in skipped_files:
                 company_info = f"{skipped['company_name']} (NPWP: {skipped['company_npwp']})" if skipped['company_name'] else f"NPWP: {skipped['company_npwp']}"
+                if skipped['registered_company']:
+                    company_info += f", registered as {skipped['registered_company']}"
                 logger.info(f"  - {skipped['filename']}: Belongs to {company_info}")
             logger.info("="*50)
         
+        if self.quarantined_files:
+            logger.warning("="*50)
+            logger.warning("QUARANTINED FILES (over the per-file time/memory budget or crashed the parser):")
+            for quarantined in self.quarantined_files:
+                logger.warning(f"  - {quarantined['filename']}: {quarantined['reason']}")
+            logger.warning("="*50)
+        
         return results, failed_files
     
-    def save_extraction_results(self, data: List[Dict[str, str]], output_dir: str) -> str:
-        """Save extracted data to Excel file with proper data types."""
+    def _numeric_setting(self, key: str, default: float) -> float:
+        """Read a numeric app setting, falling back to the default if it is missing or invalid."""
+        value = get_db().get_setting(key)
+        try:
+            return float(value) if value is not None else default
+        except ValueError:
+            logging.getLogger(__name__).warning(f"Invalid value '{value}' for setting '{key}', using {default}")
+            return default
+    
+    def save_extraction_results(self, data: List[Dict], output_dir: str) -> str:
+        """Save extracted data to Excel file with proper data types, one sheet per document type."""
+        import pandas as pd
+        import pdf_extractor
+        from bupot_record import record_columns
+        
         logger = logging.getLogger(__name__)
         
         try:
@@ -2057,26 +2107,28 @@ class CoretaxExtractorApp:
                 'Jenis_Dokumen': 'Jenis Dokumen',
                 'Nomor_Dokumen': 'Nomor Dokumen',
                 'extraction_status': 'Status',
+                'duplicate_of': 'Duplicate Of',
                 'source_file': 'Source File'
             }
             
-            df = pd.DataFrame(data)
+            # Records are read column by column, straight into the frame
+            df = pd.DataFrame(record_columns(data, [*column_mapping, 'document_type']), index=range(len(data)))
+            if 'document_type' in df.columns:
+                document_types = df.pop('document_type').fillna(pdf_extractor.DEFAULT_DOCUMENT_TYPE)
+            else:
+                document_types = pd.Series(pdf_extractor.DEFAULT_DOCUMENT_TYPE, index=df.index)
             df = df.rename(columns=column_mapping)
             
-            # Convert data types
+            # Convert data types on whole columns at once. Extracted records are
+            # already typed; formatted strings from other sources are parsed here.
             logger.info("Converting data types...")
             
-            # Convert DPP to integer (remove commas and convert)
-            if 'DPP' in df.columns:
-                df['DPP'] = df['DPP'].apply(self._convert_to_integer)
-            
-            # Convert Pajak Penghasilan to integer
-            if 'Pajak Penghasilan' in df.columns:
-                df['Pajak Penghasilan'] = df['Pajak Penghasilan'].apply(self._convert_to_integer)
+            for col in ('DPP', 'Pajak Penghasilan'):
+                if col in df.columns:
+                    df[col] = self._convert_amount_column(df[col])
             
-            # Convert Tanggal to datetime
             if 'Tanggal' in df.columns:
-                df['Tanggal'] = df['Tanggal'].apply(self._convert_to_date)
+                df['Tanggal'] = self._convert_date_column(df['Tanggal'])
             
             # Ensure string types for text fields
             string_columns = [
@@ -2084,12 +2136,12 @@ class CoretaxExtractorApp:
                 'NPWP/NIK yang Dipungut', 'Nama yang Dipungut',
                 'NPWP/NIK Pemungut', 'Nama Pemungut',
                 'Jenis Dokumen', 'Nomor Dokumen',
-                'Status', 'Source File'
+                'Status', 'Duplicate Of', 'Source File'
             ]
             
             for col in string_columns:
                 if col in df.columns:
-                    df[col] = df[col].astype(str).replace('nan', '')
+                    df[col] = df[col].fillna('').astype(str)
             
             # Create filename with company name and timestamp
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -2100,52 +2152,18 @@ class CoretaxExtractorApp:
             
             output_file = os.path.join(output_dir, f"coretax_{safe_company_name}_{timestamp}.xlsx")
             
+            # One sheet per document type, in registry order so BPPU records stay on the first sheet
+            type_order = list(pdf_extractor.DOCUMENT_TYPES)
+            sheet_names = {name: document_type.sheet_name for name, document_type in pdf_extractor.DOCUMENT_TYPES.items()}
+            sheets = sorted(
+                df.groupby(document_types, sort=False),
+                key=lambda group: type_order.index(group[0]) if group[0] in type_order else len(type_order)
+            )
             with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Coretax_Extraction', index=False)
-                
-                workbook = writer.book
-                worksheet = writer.sheets['Coretax_Extraction']
-                
-                # Auto-adjust column widths
-                for column in worksheet.columns:
-                    max_length = 0
-                    column = [cell for cell in column]
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-                
-                # Format columns
-                from openpyxl.styles import numbers
-                
-                for col_idx, col in enumerate(df.columns, 1):
-                    # Format NPWP columns as TEXT to preserve leading zeros
-                    if 'NPWP' in col or 'NIK' in col:
-                        for row_idx in range(2, len(df) + 2):  # Start from row 2 (after header)
-                            cell = worksheet.cell(row=row_idx, column=col_idx)
-                            if cell.value:
-                                # Force text format
-                                cell.number_format = '@'
-                                # Ensure value is string
-                                cell.value = str(cell.value)
-                    
-                    # Format number columns
-                    elif col in ['DPP', 'Pajak Penghasilan']:
-                        for row_idx in range(2, len(df) + 2):  # Start from row 2 (after header)
-                            cell = worksheet.cell(row=row_idx, column=col_idx)
-                            if cell.value and isinstance(cell.value, (int, float)):
-                                cell.number_format = '#,##0'  # Thousand separator format
-                    
-                    # Format date column
-                    elif col == 'Tanggal':
-                        for row_idx in range(2, len(df) + 2):
-                            cell = worksheet.cell(row=row_idx, column=col_idx)
-                            if cell.value:
-                                cell.number_format = 'DD MMM YYYY'  # Date format
+                for document_type, sheet_df in sheets:
+                    sheet_name = sheet_names.get(document_type, str(document_type))[:31]
+                    sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                    self._format_results_sheet(writer.sheets[sheet_name], sheet_df)
             
             logger.info(f"Results saved to: {output_file}")
             logger.info(f"Data types applied: NPWP (text), DPP (integer), Pajak (integer), Tanggal (date)")
@@ -2155,40 +2173,77 @@ class CoretaxExtractorApp:
             logger.error(f"Failed to save results: {str(e)}")
             raise
     
-    def _convert_to_integer(self, value: str) -> int:
-        """Convert string with commas to integer."""
-        if not value or value == '' or value == 'nan':
-            return None
-        try:
-            # Remove commas and convert to int
-            cleaned = str(value).replace(',', '').replace('.', '').strip()
-            return int(cleaned) if cleaned else None
-        except (ValueError, AttributeError):
-            return None
+    @staticmethod
+    def _format_results_sheet(worksheet, df):
+        """Set column widths and the NPWP text, amount and date formats of a results sheet."""
+        # Auto-adjust column widths
+        for column in worksheet.columns:
+            max_length = 0
+            column = [cell for cell in column]
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(str(cell.value))
+                except:
+                    pass
+            adjusted_width = min(max_length + 2, 50)
+            worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+        
+        # Format columns
+        from openpyxl.styles import numbers
+        
+        for col_idx, col in enumerate(df.columns, 1):
+            # Format NPWP columns as TEXT to preserve leading zeros
+            if 'NPWP' in col or 'NIK' in col:
+                for row_idx in range(2, len(df) + 2):  # Start from row 2 (after header)
+                    cell = worksheet.cell(row=row_idx, column=col_idx)
+                    if cell.value:
+                        # Force text format
+                        cell.number_format = '@'
+                        # Ensure value is string
+                        cell.value = str(cell.value)
+        
+            # Format number columns
+            elif col in ['DPP', 'Pajak Penghasilan']:
+                for row_idx in range(2, len(df) + 2):  # Start from row 2 (after header)
+                    cell = worksheet.cell(row=row_idx, column=col_idx)
+                    if cell.value and isinstance(cell.value, (int, float)):
+                        cell.number_format = '#,##0'  # Thousand separator format
+        
+            # Format date column
+            elif col == 'Tanggal':
+                for row_idx in range(2, len(df) + 2):
+                    cell = worksheet.cell(row=row_idx, column=col_idx)
+                    if cell.value:
+                        cell.number_format = 'DD MMM YYYY'  # Date format
     
-    def _convert_to_date(self, value: str):
-        """Convert Indonesian date string to datetime."""
-        if not value or value == '' or value == 'nan':
-            return None
-        
-        try:
-            # Parse Indonesian date format: "5 Juni 2025"
-            month_map = {
-                'Januari': 1, 'Februari': 2, 'Maret': 3, 'April': 4,
-                'Mei': 5, 'Juni': 6, 'Juli': 7, 'Agustus': 8,
-                'September': 9, 'Oktober': 10, 'November': 11, 'Desember': 12
-            }
-            
-            parts = str(value).strip().split()
-            if len(parts) == 3:
-                day = int(parts[0])
-                month = month_map.get(parts[1], 1)
-                year = int(parts[2])
-                return datetime(year, month, day)
-            
-            return None
-        except (ValueError, AttributeError, IndexError):
-            return None
+    @staticmethod
+    def _convert_amount_column(values):
+        """Convert a column of amounts (ints or strings like '1,250,000') to nullable integers."""
+        import pandas as pd
+        
+        if pd.api.types.is_numeric_dtype(values):
+            return values.round().astype('Int64')
+        digits = values.astype('string').str.replace(r'[.,\s]', '', regex=True)
+        return pd.to_numeric(digits, errors='coerce').astype('Int64')
+    
+    @staticmethod
+    def _convert_date_column(values):
+        """Convert a column of dates or Indonesian date strings ('5 Juni 2025') to datetimes."""
+        import pandas as pd
+        
+        parts = values.astype('string').str.strip().str.extract(r'^(\d{1,2})\s+(\S+)\s+(\d{4})$')
+        from_text = pd.to_datetime(
+            pd.DataFrame({
+                'year': parts[2].astype('float64'),
+                'month': parts[1].str.lower().map(INDONESIAN_MONTHS).astype('float64'),
+                'day': parts[0].astype('float64'),
+            }),
+            errors='coerce',
+        )
+        # Remaining rows hold date objects (typed records) or ISO strings
+        others = pd.to_datetime(values.where(from_text.isna()), errors='coerce', format='ISO8601')
+        return from_text.fillna(others)
 
 
 class UILogHandler(logging.Handler):
@@ -2218,6 +2273,47 @@ def show_login_page(page: ft.Page):
     LoginPage(page, on_login_success)
 
 
+PRELOAD_MODULES = ("pdf_extractor", "extraction_pipeline", "pandas", "openpyxl")
+
+
+def warm_up():
+    """
+    Prepare what the password and login screens need.
+    
+    Opens the database (schema check and audit retention) and loads the
+    company directory into memory.
+    """
+    logger = logging.getLogger(__name__)
+    start_time = time.perf_counter()
+    
+    try:
+        db = get_db()
+        startup_trace.mark("database_ready")
+        db.get_all_companies()
+        startup_trace.mark("companies_loaded")
+    except Exception as e:
+        # Screens open the database again and surface any real error there
+        logger.warning(f"Warm-up failed: {str(e)}")
+    
+    logger.info(f"Warm-up finished in {time.perf_counter() - start_time:.2f} seconds")
+
+
+def preload_heavy_modules():
+    """
+    Import the PDF/Excel stack in the background.
+    
+    These modules are only needed after login, so this runs while the user
+    types passwords. Importing pdf_extractor also compiles the extraction
+    patterns.
+    """
+    logger = logging.getLogger(__name__)
+    for module_name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"Preloading {module_name} failed: {str(e)}")
+
+
 def show_splash_screen(page: ft.Page):
     """Show splash screen with logo."""
     # RSM Colors
@@ -2269,16 +2365,22 @@ def show_splash_screen(page: ft.Page):
     page.controls.clear()
     page.add(splash_content)
     page.update()
+    startup_trace.mark("splash_shown")
+    
+    # Do the real start-up work in the background while the splash is visible;
+    # heavy modules keep loading after the splash has closed
+    warm_up_thread = threading.Thread(target=warm_up, daemon=True)
+    warm_up_thread.start()
+    threading.Thread(target=preload_heavy_modules, daemon=True).start()
     
     # Animate loading text and progress
-    import time
-    time.sleep(0.3)
     loading_text.opacity = 1
     progress.opacity = 1
     page.update()
     
-    # Simulate loading (initialize database, etc.)
-    time.sleep(1.5)
+    # Leave the splash as soon as warm-up has finished
+    warm_up_thread.join()
+    startup_trace.mark("splash_done")
     
     # Transition to password screen
     show_password_screen(page)
@@ -2397,10 +2499,16 @@ def show_password_screen(page: ft.Page):
     page.controls.clear()
     page.add(password_screen)
     page.update()
+    
+    startup_trace.mark("password_screen_shown")
+    startup_trace.write()
+    if startup_trace.exit_when_ready():
+        page.window.destroy()
 
 
 def main(page: ft.Page):
     """Main entry point for Flet app."""
+    startup_trace.mark("flet_client_ready")
     page.title = "Coretax PDF Extractor"
     page.theme_mode = ft.ThemeMode.LIGHT
     page.padding = 15
@@ -2419,4 +2527,6 @@ def main(page: ft.Page):
 
 
 if __name__ == "__main__":
+    # Required for extraction worker processes in the frozen executable
+    multiprocessing.freeze_support()
     ft.app(target=main)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Credential Subsystem for Coretax Extractor
+Salted PBKDF2 password hashing with legacy SHA-256 migration and in-memory sessions
+"""
+
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+HASH_SCHEME = "pbkdf2_sha256"
+DEFAULT_KDF_ITERATIONS = 200_000
+MIN_KDF_ITERATIONS = 10_000
+SALT_BYTES = 16
+DEFAULT_SESSION_TTL = 30 * 60  # seconds
+
+
+def hash_password(password: str, iterations: int = DEFAULT_KDF_ITERATIONS) -> str:
+    """
+    Hash a password with a random salt.
+
+    Returns:
+        Encoded hash in the form 'pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>'
+    """
+    salt = secrets.token_bytes(SALT_BYTES)
+    derived = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${derived.hex()}"
+
+
+def is_legacy_hash(stored_hash: str) -> bool:
+    """Check whether a stored hash is an old unsalted SHA-256 hex digest."""
+    return "$" not in stored_hash and len(stored_hash) == 64
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """Verify a password against a PBKDF2 or legacy SHA-256 hash in constant time."""
+    if not stored_hash:
+        return False
+
+    if is_legacy_hash(stored_hash):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, stored_hash)
+
+    try:
+        scheme, iterations, salt_hex, hash_hex = stored_hash.split("$")
+        if scheme != HASH_SCHEME:
+            return False
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt_hex), int(iterations))
+    except ValueError:
+        return False
+
+    return hmac.compare_digest(derived.hex(), hash_hex)
+
+
+def needs_rehash(stored_hash: str, iterations: int = DEFAULT_KDF_ITERATIONS) -> bool:
+    """Check whether a stored hash should be upgraded to the current scheme and cost."""
+    if is_legacy_hash(stored_hash):
+        return True
+
+    try:
+        scheme, stored_iterations, _, _ = stored_hash.split("$")
+        return scheme != HASH_SCHEME or int(stored_iterations) != iterations
+    except ValueError:
+        return True
+
+
+def calibrate_iterations(target_ms: float = 250.0) -> int:
+    """
+    Estimate the PBKDF2 iteration count that takes about target_ms on this machine.
+
+    Useful for choosing the 'kdf_iterations' setting on slower laptops.
+    """
+    sample_iterations = 20_000
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"calibration", b"0" * SALT_BYTES, sample_iterations)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    estimate = int(sample_iterations * target_ms / max(elapsed_ms, 0.001))
+    return max(MIN_KDF_ITERATIONS, round(estimate, -3))
+
+
+@dataclass
+class Session:
+    """Authenticated session held in memory."""
+    role: str
+    expires_at: float
+
+
+class SessionManager:
+    """
+    Issue and validate opaque session tokens after a successful login.
+
+    Tokens are random and only live in this process, so checking one is a
+    dictionary lookup instead of a database query plus password hash.
+    """
+
+    def __init__(self, ttl_seconds: int = DEFAULT_SESSION_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def create(self, role: str) -> str:
+        """Create a session for a role and return its token."""
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = Session(role, time.monotonic() + self.ttl_seconds)
+        return token
+
+    def validate(self, token: Optional[str], role: str) -> bool:
+        """Check that a token is live and belongs to the role; extends its expiry."""
+        if not token:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return False
+            if session.expires_at <= now:
+                del self._sessions[token]
+                return False
+            if session.role != role:
+                return False
+            session.expires_at = now + self.ttl_seconds
+            return True
+
+    def revoke(self, token: Optional[str]):
+        """End a session."""
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+# Singleton instance
+_session_manager = None
+
+def get_session_manager() -> SessionManager:
+    """Get session manager singleton instance."""
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager()
+    return _session_manager
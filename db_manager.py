@@ -6,23 +6,92 @@ Handles SQLite database operations for companies and admin
 """
 
 import sqlite3
-import hashlib
-from typing import Dict, List, Optional, Tuple
+import gzip
+import json
+import logging
+import itertools
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from pathlib import Path
 
+from credentials import (
+    DEFAULT_KDF_ITERATIONS,
+    MIN_KDF_ITERATIONS,
+    get_session_manager,
+    hash_password,
+    needs_rehash,
+    verify_password,
+)
+from npwp import NpwpIndex
+
+
+# Audit log retention defaults (overridable via app_settings)
+DEFAULT_AUDIT_RETENTION_DAYS = 365
+AUDIT_ARCHIVE_DIR = "audit_archive"
+AUDIT_ARCHIVE_BATCH_SIZE = 5000
+
+# Keyset pagination cursor: (timestamp, id) of the last row on a page
+AuditCursor = Tuple[str, int]
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: List[Callable]) -> int:
+    """
+    Apply pending schema migrations in order.
+    
+    PRAGMA user_version stores how many migrations have been applied, so an
+    up-to-date database costs a single pragma read. Pending migrations run
+    in one write transaction; the version is re-checked after taking the
+    lock in case another process migrated first.
+    
+    Args:
+        conn: Open connection to the database
+        migrations: Ordered callables taking a cursor; append new ones, never reorder
+    
+    Returns:
+        Schema version after migrating
+    """
+    target_version = len(migrations)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= target_version:
+        return version
+    
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for migration in migrations[version:]:
+            migration(cursor)
+        cursor.execute(f"PRAGMA user_version = {max(version, target_version)}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return max(version, target_version)
+
 
 class DatabaseManager:
     """Manage SQLite database for companies and admin."""
     
     def __init__(self, db_path: str = "coretax.db"):
         self.db_path = db_path
+        self._companies_cache: Optional[Dict[str, str]] = None
+        self._company_index: Optional[NpwpIndex] = None
         self._init_database()
     
     def _init_database(self):
-        """Initialize database with tables and default data."""
+        """Bring the database schema up to date (a single pragma read when current)."""
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        try:
+            apply_migrations(conn, [
+                self._migrate_base_schema,
+                self._migrate_audit_log_indexes,
+            ])
+        finally:
+            conn.close()
+    
+    def _migrate_base_schema(self, cursor):
+        """Migration 1: core tables and default data."""
         # Create companies table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS companies (
@@ -68,7 +137,7 @@ class DatabaseManager:
         # Check if admin exists, if not create default
         cursor.execute("SELECT COUNT(*) FROM admin")
         if cursor.fetchone()[0] == 0:
-            default_password_hash = hashlib.sha256("admin".encode()).hexdigest()
+            default_password_hash = hash_password("admin")
             cursor.execute(
                 "INSERT INTO admin (username, password_hash) VALUES (?, ?)",
                 ("admin", default_password_hash)
@@ -78,7 +147,7 @@ class DatabaseManager:
         # Check if app password exists, if not create default
         cursor.execute("SELECT COUNT(*) FROM app_settings WHERE setting_key = 'app_password'")
         if cursor.fetchone()[0] == 0:
-            default_app_password_hash = hashlib.sha256("indonesia123".encode()).hexdigest()
+            default_app_password_hash = hash_password("indonesia123")
             cursor.execute(
                 "INSERT INTO app_settings (setting_key, setting_value) VALUES (?, ?)",
                 ("app_password", default_app_password_hash)
@@ -106,9 +175,15 @@ class DatabaseManager:
                 default_companies
             )
             self._log_action(cursor, "COMPANIES_INITIALIZED", f"Added {len(default_companies)} default companies")
-        
-        conn.commit()
-        conn.close()
+    
+    def _migrate_audit_log_indexes(self, cursor):
+        """Migration 2: audit log indexes for time-ordered paging and action filtering."""
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log (timestamp, id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log (action, timestamp, id)"
+        )
     
     def _log_action(self, cursor, action: str, details: str = ""):
         """Log action to audit log."""
@@ -118,15 +193,22 @@ class DatabaseManager:
         )
     
     def get_all_companies(self) -> Dict[str, str]:
-        """Get all companies as dict {name: npwp}."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name, npwp FROM companies ORDER BY name")
-        companies = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        conn.close()
-        return companies
+        """Get all companies as dict {name: npwp}, served from memory after the first load."""
+        if self._companies_cache is None:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT name, npwp FROM companies ORDER BY name")
+            self._companies_cache = {row[0]: row[1] for row in cursor.fetchall()}
+            
+            conn.close()
+        return dict(self._companies_cache)
+    
+    def get_company_index(self) -> NpwpIndex:
+        """Get all companies indexed by canonical NPWP, rebuilt only after the company list changes."""
+        if self._company_index is None:
+            self._company_index = NpwpIndex(self.get_all_companies())
+        return self._company_index
     
     def get_company_by_name(self, name: str) -> Optional[Tuple[str, str]]:
         """Get company by name."""
@@ -171,6 +253,8 @@ class DatabaseManager:
             
             conn.commit()
             conn.close()
+            self._companies_cache = None
+            self._company_index = None
             
             return True, f"Perusahaan '{name}' berhasil ditambahkan"
             
@@ -199,6 +283,8 @@ class DatabaseManager:
             
             conn.commit()
             conn.close()
+            self._companies_cache = None
+            self._company_index = None
             
             return True, f"Perusahaan '{name}' berhasil dihapus"
             
@@ -235,6 +321,8 @@ class DatabaseManager:
             
             conn.commit()
             conn.close()
+            self._companies_cache = None
+            self._company_index = None
             
             return True, f"Perusahaan berhasil diupdate"
             
@@ -244,27 +332,79 @@ class DatabaseManager:
             return False, f"Error: {str(e)}"
     
     def verify_admin_password(self, password: str) -> bool:
-        """Verify admin password."""
+        """Verify admin password, upgrading its stored hash if outdated."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("SELECT password_hash FROM admin WHERE username = ?", ("admin",))
+            cursor.execute("SELECT password_hash FROM admin LIMIT 1")
             result = cursor.fetchone()
             
-            conn.close()
+            verified = bool(result) and verify_password(password, result[0])
+            if verified:
+                self._upgrade_password_hash(
+                    cursor, result[0], password,
+                    "UPDATE admin SET password_hash = ?",
+                    "Admin password hash upgraded"
+                )
             
-            if result:
-                stored_hash = result[0]
-                password_hash = hashlib.sha256(password.encode()).hexdigest()
-                return password_hash == stored_hash
+            conn.commit()
+            conn.close()
             
-            return False
+            return verified
             
         except Exception as e:
             print(f"Error verifying password: {e}")
             return False
     
+    def login_admin(self, password: str) -> Optional[str]:
+        """Verify admin password and start an admin session. Returns session token or None."""
+        if not self.verify_admin_password(password):
+            return None
+        return get_session_manager().create("admin")
+    
+    def validate_session(self, token: Optional[str], role: str = "admin") -> bool:
+        """Check an in-memory session token without touching the database."""
+        return get_session_manager().validate(token, role)
+    
+    def logout(self, token: Optional[str]):
+        """End a session."""
+        get_session_manager().revoke(token)
+    
+    def get_kdf_iterations(self) -> int:
+        """Get the configured PBKDF2 iteration count for new password hashes."""
+        return self._parse_kdf_iterations(self.get_setting("kdf_iterations"))
+    
+    @staticmethod
+    def _parse_kdf_iterations(value: Optional[str]) -> int:
+        """Parse a stored iteration count, falling back to the default."""
+        try:
+            return max(MIN_KDF_ITERATIONS, int(value)) if value else DEFAULT_KDF_ITERATIONS
+        except ValueError:
+            return DEFAULT_KDF_ITERATIONS
+    
+    def set_kdf_iterations(self, iterations: int) -> Tuple[bool, str]:
+        """
+        Set the PBKDF2 iteration count. Returns (success, message).
+        
+        Existing hashes are re-hashed with the new cost on their next successful login.
+        """
+        if iterations < MIN_KDF_ITERATIONS:
+            return False, f"Iterasi KDF minimal {MIN_KDF_ITERATIONS}"
+        return self.set_setting("kdf_iterations", str(iterations))
+    
+    def _upgrade_password_hash(self, cursor, stored_hash: str, password: str, update_sql: str, log_details: str):
+        """Re-hash a verified password when it uses a legacy scheme or outdated cost."""
+        cursor.execute(
+            "SELECT setting_value FROM app_settings WHERE setting_key = 'kdf_iterations'"
+        )
+        result = cursor.fetchone()
+        iterations = self._parse_kdf_iterations(result[0] if result else None)
+        
+        if needs_rehash(stored_hash, iterations):
+            cursor.execute(update_sql, (hash_password(password, iterations),))
+            self._log_action(cursor, "PASSWORD_HASH_UPGRADED", log_details)
+    
     def get_admin_username(self) -> str:
         """Get current admin username."""
         try:
@@ -323,7 +463,7 @@ class DatabaseManager:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            password_hash = hashlib.sha256(new_password.encode()).hexdigest()
+            password_hash = hash_password(new_password, self.get_kdf_iterations())
             
             cursor.execute(
                 "UPDATE admin SET password_hash = ?, updated_at = CURRENT_TIMESTAMP",
@@ -341,22 +481,241 @@ class DatabaseManager:
         except Exception as e:
             return False, f"Error: {str(e)}"
     
-    def get_audit_log(self, limit: int = 100) -> List[Tuple]:
-        """Get audit log entries."""
+    def log_action(self, action: str, details: str = ""):
+        """Write a single entry to the audit log."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            self._log_action(cursor, action, details)
+            
+            conn.commit()
+            conn.close()
+            
+        except Exception as e:
+            print(f"Error writing audit log: {e}")
+    
+    def get_audit_log(
+        self,
+        limit: int = 100,
+        action: Optional[str] = None,
+        start: Optional[Union[str, datetime]] = None,
+        end: Optional[Union[str, datetime]] = None,
+    ) -> List[Tuple]:
+        """Get the newest audit log entries as (action, details, timestamp)."""
+        rows, _ = self.get_audit_log_page(limit=limit, action=action, start=start, end=end)
+        return [(row[1], row[2], row[3]) for row in rows]
+    
+    def get_audit_log_page(
+        self,
+        limit: int = 100,
+        action: Optional[str] = None,
+        start: Optional[Union[str, datetime]] = None,
+        end: Optional[Union[str, datetime]] = None,
+        cursor: Optional[AuditCursor] = None,
+    ) -> Tuple[List[Tuple], Optional[AuditCursor]]:
+        """
+        Get one page of audit log entries, newest first.
+        
+        Uses keyset pagination on (timestamp, id) so every page is an index
+        range scan regardless of how deep the caller pages.
+        
+        Args:
+            limit: Maximum rows per page
+            action: Only return entries with this action
+            start: Inclusive lower bound on timestamp
+            end: Exclusive upper bound on timestamp
+            cursor: Cursor returned by the previous page
+        
+        Returns:
+            Tuple of (rows as (id, action, details, timestamp), next cursor or None)
+        """
+        conditions = []
+        params = []
+        
+        if action:
+            conditions.append("action = ?")
+            params.append(action)
+        
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(self._to_sql_timestamp(start))
+        
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(self._to_sql_timestamp(end))
+        
+        if cursor is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+        
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        db_cursor = conn.cursor()
         
-        cursor.execute(
-            "SELECT action, details, timestamp FROM audit_log ORDER BY timestamp DESC LIMIT ?",
-            (limit,)
+        db_cursor.execute(
+            f"SELECT id, action, details, timestamp FROM audit_log {where_clause} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*params, limit)
         )
-        logs = cursor.fetchall()
+        rows = db_cursor.fetchall()
+        
+        conn.close()
+        
+        next_cursor = (rows[-1][3], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_cursor
+    
+    def apply_audit_retention(
+        self,
+        retention_days: Optional[int] = None,
+        archive: Optional[bool] = None,
+    ) -> int:
+        """
+        Remove audit log entries older than the retention window.
+        
+        Expired rows are first written to a gzip-compressed JSON Lines file in
+        the audit archive folder (unless archiving is disabled), then deleted.
+        
+        Args:
+            retention_days: Days to keep; defaults to the 'audit_retention_days'
+                setting. Zero or less disables retention.
+            archive: Archive rows before deleting; defaults to the
+                'audit_archive' setting.
+        
+        Returns:
+            Number of rows removed from the audit log
+        """
+        if retention_days is None:
+            retention_days = int(self.get_setting("audit_retention_days", str(DEFAULT_AUDIT_RETENTION_DAYS)))
+        if archive is None:
+            archive = self.get_setting("audit_archive", "1") == "1"
+        
+        if retention_days <= 0:
+            return 0
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT datetime('now', ?)", (f"-{retention_days} days",))
+        cutoff = cursor.fetchone()[0]
+        
+        # Cheap index probe first so the common case opens no archive file
+        cursor.execute("SELECT 1 FROM audit_log WHERE timestamp < ? LIMIT 1", (cutoff,))
+        if cursor.fetchone() is None:
+            conn.close()
+            return 0
+        
+        removed = 0
+        archive_path = None
+        try:
+            if archive:
+                archive_path, archive_file = self._create_audit_archive()
+                with archive_file:
+                    for batch in self._iter_expired_audit_rows(cursor, cutoff):
+                        for row_id, action, details, timestamp in batch:
+                            archive_file.write(json.dumps({
+                                "id": row_id,
+                                "action": action,
+                                "details": details,
+                                "timestamp": timestamp,
+                            }, ensure_ascii=False) + "\n")
+            
+            cursor.execute("DELETE FROM audit_log WHERE timestamp < ?", (cutoff,))
+            removed = cursor.rowcount
+            
+            details = f"Removed {removed} entries older than {retention_days} days"
+            if archive_path:
+                details += f", archived to {archive_path.name}"
+            self._log_action(cursor, "AUDIT_LOG_PURGED", details)
+            
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return removed
+    
+    def _iter_expired_audit_rows(self, cursor, cutoff: str):
+        """Yield expired audit rows in id-ordered batches to bound memory use."""
+        last_id = 0
+        while True:
+            cursor.execute(
+                "SELECT id, action, details, timestamp FROM audit_log "
+                "WHERE timestamp < ? AND id > ? ORDER BY id LIMIT ?",
+                (cutoff, last_id, AUDIT_ARCHIVE_BATCH_SIZE)
+            )
+            batch = cursor.fetchall()
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+    
+    def _create_audit_archive(self):
+        """
+        Create a new timestamped archive file next to the database.
+        
+        The file is created exclusively, so an existing archive (from a run in
+        the same microsecond, or another process) is never overwritten; a
+        counter is appended to the name instead.
+        
+        Returns:
+            (path, open gzip text file)
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        archive_dir = Path(self.db_path).resolve().parent / AUDIT_ARCHIVE_DIR
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        for attempt in itertools.count():
+            suffix = f"_{attempt}" if attempt else ""
+            archive_path = archive_dir / f"audit_log_{timestamp}{suffix}.jsonl.gz"
+            try:
+                return archive_path, gzip.open(archive_path, "xt", encoding="utf-8")
+            except FileExistsError:
+                continue
+    
+    @staticmethod
+    def _to_sql_timestamp(value: Union[str, datetime]) -> str:
+        """Convert a datetime to SQLite's CURRENT_TIMESTAMP text format."""
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return str(value)
+    
+    def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Get an application setting value."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?", (key,))
+        result = cursor.fetchone()
         
         conn.close()
-        return logs
+        return result[0] if result else default
+    
+    def set_setting(self, key: str, value: str) -> Tuple[bool, str]:
+        """Create or update an application setting. Returns (success, message)."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "INSERT INTO app_settings (setting_key, setting_value) VALUES (?, ?) "
+                "ON CONFLICT(setting_key) DO UPDATE SET "
+                "setting_value = excluded.setting_value, updated_at = CURRENT_TIMESTAMP",
+                (key, str(value))
+            )
+            
+            # Log action
+            self._log_action(cursor, "SETTING_CHANGED", f"Setting '{key}' updated")
+            
+            conn.commit()
+            conn.close()
+            
+            return True, "Pengaturan berhasil diupdate"
+            
+        except Exception as e:
+            return False, f"Error: {str(e)}"
     
     def verify_app_password(self, password: str) -> bool:
-        """Verify application password."""
+        """Verify application password, upgrading its stored hash if outdated."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -364,14 +723,18 @@ class DatabaseManager:
             cursor.execute("SELECT setting_value FROM app_settings WHERE setting_key = 'app_password'")
             result = cursor.fetchone()
             
-            conn.close()
+            verified = bool(result) and verify_password(password, result[0])
+            if verified:
+                self._upgrade_password_hash(
+                    cursor, result[0], password,
+                    "UPDATE app_settings SET setting_value = ? WHERE setting_key = 'app_password'",
+                    "Application password hash upgraded"
+                )
             
-            if result:
-                stored_hash = result[0]
-                password_hash = hashlib.sha256(password.encode()).hexdigest()
-                return password_hash == stored_hash
+            conn.commit()
+            conn.close()
             
-            return False
+            return verified
             
         except Exception as e:
             print(f"Error verifying app password: {e}")
@@ -386,7 +749,7 @@ class DatabaseManager:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            password_hash = hashlib.sha256(new_password.encode()).hexdigest()
+            password_hash = hash_password(new_password, self.get_kdf_iterations())
             
             cursor.execute(
                 "UPDATE app_settings SET setting_value = ?, updated_at = CURRENT_TIMESTAMP WHERE setting_key = 'app_password'",
@@ -436,4 +799,9 @@ def get_db() -> DatabaseManager:
     global _db_instance
     if _db_instance is None:
         _db_instance = DatabaseManager()
+        # Enforce audit log retention once per process
+        try:
+            _db_instance.apply_audit_retention()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error applying audit log retention: {e}")
     return _db_instance
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extraction History Store for Coretax Extractor
+Persists every extracted bupot record to an indexed SQLite database
+"""
+
+import re
+import sqlite3
+import hashlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from db_manager import apply_migrations
+from npwp import canonical_npwp
+
+
+INDONESIAN_MONTHS = {
+    'januari': 1, 'februari': 2, 'maret': 3, 'april': 4,
+    'mei': 5, 'juni': 6, 'juli': 7, 'agustus': 8,
+    'september': 9, 'oktober': 10, 'november': 11, 'desember': 12,
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+DUPLICATE_POLICIES = ('flag', 'drop')
+DUPLICATE_STATUS = 'Duplicate'
+
+# Extracted record key -> extraction_records column
+RECORD_COLUMNS = {
+    'source_file': 'source_file',
+    'content_hash': 'content_hash',
+    'Nomor Bukti Potong': 'nomor_bukti_potong',
+    'Masa Pajak': 'masa_pajak',
+    'NPWP_NIK_Yang_Dipungut': 'npwp_nik_dipungut',
+    'Nama_Yang_Dipungut': 'nama_dipungut',
+    'NPWP_NIK_Pemungut': 'npwp_nik_pemungut',
+    'Nama_Pemungut': 'nama_pemungut',
+    'Jenis_Dokumen': 'jenis_dokumen',
+    'Nomor_Dokumen': 'nomor_dokumen',
+    'extraction_status': 'extraction_status',
+}
+
+
+def hash_file(file_path: Union[str, Path]) -> str:
+    """Compute the SHA-256 content hash of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data) -> str:
+    """Compute the SHA-256 content hash of an in-memory file (same value as hash_file)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_amount(value) -> Optional[int]:
+    """Convert a formatted amount such as '1,250,000' to an integer."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    cleaned = str(value).replace(',', '').replace('.', '').strip()
+    return int(cleaned) if cleaned.isdigit() else None
+
+
+def parse_indonesian_date(value) -> Optional[date]:
+    """Convert an Indonesian date string such as '5 Juni 2025' to a date."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    parts = str(value).strip().split()
+    if len(parts) != 3:
+        return None
+
+    month = INDONESIAN_MONTHS.get(parts[1].lower())
+    try:
+        return date(int(parts[2]), month, int(parts[0])) if month else None
+    except ValueError:
+        return None
+
+
+def bupot_key(record: Dict) -> Optional[Tuple[str, str]]:
+    """Build the duplicate-detection key (Nomor Bukti Potong, pemungut NPWP) for a record."""
+    nomor = str(record.get('Nomor Bukti Potong') or '').strip().upper()
+    if not nomor:
+        return None
+    return nomor, canonical_npwp(record.get('NPWP_NIK_Pemungut'))
+
+
+def masa_pajak_period(value: Optional[str]) -> Optional[str]:
+    """
+    Normalize a Masa Pajak value to a sortable 'YYYY-MM' period key.
+
+    Accepts 'Juni 2025', '06-2025' and '2025-06'.
+    """
+    if not value:
+        return None
+
+    text = str(value).strip()
+
+    match = re.fullmatch(r'(\d{4})-(\d{2})', text)
+    if match:
+        return text
+
+    match = re.fullmatch(r'(\d{2})-(\d{4})', text)
+    if match:
+        return f"{match.group(2)}-{match.group(1)}"
+
+    parts = text.split()
+    if len(parts) == 2 and parts[1].isdigit():
+        month = INDONESIAN_MONTHS.get(parts[0].lower())
+        if month:
+            return f"{parts[1]}-{month:02d}"
+
+    return None
+
+
+class ExtractionHistory:
+    """Indexed SQLite store for extraction runs and their records."""
+
+    def __init__(self, db_path: str = "coretax_data.db"):
+        self.db_path = db_path
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with WAL journaling for concurrent readers."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_database(self):
+        """Bring the history schema up to date (a single pragma read when current)."""
+        conn = self._connect()
+        try:
+            apply_migrations(conn, [
+                self._migrate_history_tables,
+                self._migrate_bupot_index,
+                self._migrate_file_costs,
+                self._migrate_canonical_npwp,
+            ])
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate_history_tables(cursor):
+        """Migration 1: run and record tables with their query indexes."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_runs (
+                run_id TEXT PRIMARY KEY,
+                company_name TEXT NOT NULL,
+                company_npwp TEXT,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                total_files INTEGER DEFAULT 0,
+                record_count INTEGER DEFAULT 0,
+                output_file TEXT
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL REFERENCES extraction_runs (run_id),
+                company_name TEXT NOT NULL,
+                source_file TEXT,
+                content_hash TEXT,
+                nomor_bukti_potong TEXT,
+                masa_pajak TEXT,
+                masa_pajak_period TEXT,
+                npwp_nik_dipungut TEXT,
+                nama_dipungut TEXT,
+                dpp INTEGER,
+                pajak_penghasilan INTEGER,
+                npwp_nik_pemungut TEXT,
+                nama_pemungut TEXT,
+                tanggal DATE,
+                jenis_dokumen TEXT,
+                nomor_dokumen TEXT,
+                extraction_status TEXT,
+                extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        indexes = {
+            'idx_records_masa_pajak': '(masa_pajak_period)',
+            'idx_records_bupot': '(nomor_bukti_potong)',
+            'idx_records_pemungut': '(npwp_nik_pemungut, tanggal)',
+            'idx_records_tanggal': '(tanggal)',
+            'idx_records_run': '(run_id)',
+            'idx_records_hash': '(content_hash)',
+            'idx_records_company': '(company_name, masa_pajak_period)',
+        }
+        for index_name, columns in indexes.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON extraction_records {columns}")
+
+    @staticmethod
+    def _migrate_bupot_index(cursor):
+        """Migration 2: bupot identity table for duplicate detection."""
+        # Bupot identity index for cross-run duplicate detection; the primary
+        # key lookup keeps each probe constant-cost as history grows
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bupot_index (
+                nomor_bukti_potong TEXT NOT NULL,
+                npwp_nik_pemungut TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                source_file TEXT,
+                content_hash TEXT,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (nomor_bukti_potong, npwp_nik_pemungut)
+            ) WITHOUT ROWID
+        """)
+
+    @staticmethod
+    def _migrate_file_costs(cursor):
+        """Migration 3: measured extraction time per file, for scheduling later runs."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS file_costs (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                page_count INTEGER,
+                seconds REAL NOT NULL,
+                measured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        """)
+
+    @staticmethod
+    def _migrate_canonical_npwp(cursor):
+        """Migration 4: store pemungut NPWPs in their canonical 16-digit form."""
+        cursor.connection.create_function('canonical_npwp', 1, canonical_npwp, deterministic=True)
+        cursor.execute(
+            "UPDATE extraction_records SET npwp_nik_pemungut = NULLIF(canonical_npwp(npwp_nik_pemungut), '') "
+            "WHERE npwp_nik_pemungut IS NOT NULL"
+        )
+        # Index keys were bare digits; where two of them share a canonical form,
+        # the row already holding it is kept and the other dropped
+        cursor.execute("UPDATE OR IGNORE bupot_index SET npwp_nik_pemungut = canonical_npwp(npwp_nik_pemungut)")
+        cursor.execute("DELETE FROM bupot_index WHERE npwp_nik_pemungut != canonical_npwp(npwp_nik_pemungut)")
+
+    def get_file_costs(self) -> Dict[str, Tuple[int, Optional[int], float]]:
+        """Get the last measured extraction cost of every file as {path: (size, page count, seconds)}."""
+        conn = self._connect()
+        try:
+            return {path: (size, page_count, seconds) for path, size, page_count, seconds in conn.execute(
+                "SELECT path, size, page_count, seconds FROM file_costs"
+            )}
+        finally:
+            conn.close()
+
+    def save_file_costs(self, costs: List[Tuple[str, int, Optional[int], float]]):
+        """Store (path, size, page count, seconds) measurements, replacing earlier ones for the same paths."""
+        if not costs:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO file_costs (path, size, page_count, seconds) VALUES (?, ?, ?, ?)",
+                    costs
+                )
+        finally:
+            conn.close()
+
+    def save_run(
+        self,
+        run_id: str,
+        company_name: str,
+        company_npwp: str,
+        records: List[Dict],
+        started_at: Optional[datetime] = None,
+        total_files: int = 0,
+        output_file: str = "",
+    ) -> int:
+        """
+        Persist one extraction run and all of its records in a single transaction.
+
+        Returns:
+            Number of records stored
+        """
+        rows = [self._record_to_row(run_id, company_name, record) for record in records]
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extraction_runs "
+                    "(run_id, company_name, company_npwp, started_at, total_files, record_count, output_file) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id, company_name, company_npwp,
+                        started_at.strftime('%Y-%m-%d %H:%M:%S') if started_at else None,
+                        total_files, len(rows), output_file,
+                    )
+                )
+                if rows:
+                    columns = list(rows[0])
+                    conn.executemany(
+                        f"INSERT INTO extraction_records ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' for _ in columns)})",
+                        [tuple(row.values()) for row in rows]
+                    )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO bupot_index "
+                    "(nomor_bukti_potong, npwp_nik_pemungut, run_id, source_file, content_hash) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    self._index_entries(run_id, records)
+                )
+        finally:
+            conn.close()
+
+        return len(rows)
+
+    @staticmethod
+    def _index_entries(run_id: str, records: List[Dict]) -> List[Tuple]:
+        """Build bupot_index rows for the non-duplicate records of a run."""
+        entries = []
+        for record in records:
+            key = bupot_key(record)
+            if key and record.get('extraction_status') != DUPLICATE_STATUS:
+                entries.append((*key, run_id, record.get('source_file'), record.get('content_hash')))
+        return entries
+
+    @staticmethod
+    def _record_to_row(run_id: str, company_name: str, record: Dict) -> Dict:
+        """Map an extracted record onto extraction_records columns."""
+        row = {'run_id': run_id, 'company_name': company_name}
+        for record_key, column in RECORD_COLUMNS.items():
+            value = record.get(record_key)
+            row[column] = str(value) if value not in (None, '') else None
+
+        tanggal = parse_indonesian_date(record.get('Tanggal'))
+        row['npwp_nik_pemungut'] = canonical_npwp(record.get('NPWP_NIK_Pemungut')) or None
+        row['masa_pajak_period'] = masa_pajak_period(record.get('Masa Pajak'))
+        row['dpp'] = parse_amount(record.get('DPP'))
+        row['pajak_penghasilan'] = parse_amount(record.get('Pajak_Penghasilan'))
+        row['tanggal'] = tanggal.isoformat() if tanggal else None
+        return row
+
+    def query_records(
+        self,
+        masa_pajak: Optional[str] = None,
+        nomor_bukti_potong: Optional[str] = None,
+        npwp_pemungut: Optional[str] = None,
+        date_from: Optional[Union[str, date]] = None,
+        date_to: Optional[Union[str, date]] = None,
+        company_name: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Query stored records. All filters are optional and combined with AND.
+
+        Args:
+            masa_pajak: Tax period as 'Juni 2025', '06-2025' or '2025-06'
+            nomor_bukti_potong: Exact Nomor Bukti Potong
+            npwp_pemungut: NPWP/NIK/NITKU of the pemungut, in any written form
+            date_from: Inclusive lower bound on Tanggal (date or 'YYYY-MM-DD')
+            date_to: Inclusive upper bound on Tanggal (date or 'YYYY-MM-DD')
+            company_name: Company the run was made for
+            limit: Maximum number of rows
+
+        Returns:
+            List of record dicts keyed by column name, ordered by Tanggal
+        """
+        conditions = []
+        params = []
+
+        if masa_pajak:
+            period = masa_pajak_period(masa_pajak)
+            if period is None:
+                raise ValueError(f"Unrecognized Masa Pajak: {masa_pajak}")
+            conditions.append("masa_pajak_period = ?")
+            params.append(period)
+
+        if nomor_bukti_potong:
+            conditions.append("nomor_bukti_potong = ?")
+            params.append(nomor_bukti_potong.strip().upper())
+
+        if npwp_pemungut:
+            conditions.append("npwp_nik_pemungut = ?")
+            params.append(canonical_npwp(npwp_pemungut))
+
+        if date_from:
+            conditions.append("tanggal >= ?")
+            params.append(str(date_from))
+
+        if date_to:
+            conditions.append("tanggal <= ?")
+            params.append(str(date_to))
+
+        if company_name:
+            conditions.append("company_name = ?")
+            params.append(company_name)
+
+        query = "SELECT * FROM extraction_records"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        query += " ORDER BY tanggal, id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(query, params)]
+        finally:
+            conn.close()
+
+    def get_runs(self, limit: int = 50) -> List[Dict]:
+        """Get the most recent extraction runs."""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                "SELECT * FROM extraction_runs ORDER BY finished_at DESC LIMIT ?",
+                (limit,)
+            )
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+
+class DuplicateDetector:
+    """
+    Detect repeated bukti potong within a run and against previous runs.
+
+    Keys already seen in the current run are held in memory; earlier runs are
+    checked with a primary-key probe on bupot_index over one connection.
+    """
+
+    def __init__(self, history: ExtractionHistory):
+        self._seen: Dict[Tuple[str, str], str] = {}
+        self._conn = history._connect()
+
+    def check(self, record: Dict) -> Optional[str]:
+        """
+        Check a record and remember it when it is new.
+
+        Returns:
+            Description of the earlier occurrence, or None if the record is new
+        """
+        key = bupot_key(record)
+        if key is None:
+            return None
+
+        if key in self._seen:
+            return f"{self._seen[key]} (this run)"
+
+        previous = self._conn.execute(
+            "SELECT source_file, run_id, first_seen FROM bupot_index "
+            "WHERE nomor_bukti_potong = ? AND npwp_nik_pemungut = ?",
+            key
+        ).fetchone()
+
+        self._seen[key] = record.get('source_file', '')
+        if previous:
+            source_file, run_id, first_seen = previous
+            return f"{source_file} (run {run_id[:8]}, {first_seen})"
+        return None
+
+    def close(self):
+        """Release the index connection."""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Singleton instance
+_history_instance = None
+
+def get_history() -> ExtractionHistory:
+    """Get extraction history store singleton instance."""
+    global _history_instance
+    if _history_instance is None:
+        _history_instance = ExtractionHistory()
+    return _history_instance
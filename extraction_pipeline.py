@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extraction Pipeline for Coretax Extractor
+Two-stage PDF processing: an I/O reader thread feeding a CPU worker pool
+
+Stage 1 (pdf_io.PdfPrefetcher) loads file bytes ahead of time on a thread.
+Stage 2 runs PyMuPDF text extraction and field parsing in worker processes.
+Both stages are bounded, so a slow stage holds back the other instead of
+filling memory, and results come back in input order.
+
+Each worker handles one file at a time under a watchdog. A file that runs
+past its time or memory budget, or crashes its worker, has the worker killed
+and replaced, and is quarantined with the reason instead of stalling the batch.
+
+Workers take the files predicted to be most expensive first (see
+job_scheduler), so a large PDF does not start last and hold up the batch;
+results are still returned in input order.
+
+With a text cache, files whose raw text was cached by an earlier run are
+parsed from that text instead of being opened with PyMuPDF, and the text of
+newly extracted files is added to the cache.
+"""
+
+import os
+import sys
+import time
+import queue
+import logging
+import itertools
+import multiprocessing
+from collections import deque
+from contextlib import nullcontext
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pdf_extractor
+from extraction_history import ExtractionHistory, hash_bytes
+from job_scheduler import longest_first, predict_costs
+from pdf_io import DEFAULT_PREFETCH_DEPTH, PdfPrefetcher, source_name, split_archive_path
+from text_cache import TextCache, TextCacheSession
+
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+MIN_PARALLEL_FILES = 8  # below this, starting more than one worker process costs more than it saves
+IN_FLIGHT_PER_WORKER = 2
+DEFAULT_FILE_TIMEOUT = 60.0  # seconds per file
+DEFAULT_FILE_MEMORY_MB = 1024  # worker RSS per file
+WATCHDOG_INTERVAL = 0.2  # seconds between budget checks
+SCHEDULE_WINDOW = 256  # files reordered together; bounds how far results run ahead of input order
+
+
+def process_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Resident set size of a process (default: this one) in MB, or None if it cannot be read."""
+    pid = pid or os.getpid()
+
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+            if not handle:
+                return None
+            try:
+                counters = ProcessMemoryCounters()
+                counters.cb = ctypes.sizeof(counters)
+                if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                    return counters.WorkingSetSize / (1024 * 1024)
+            finally:
+                kernel32.CloseHandle(handle)
+        except Exception:
+            return None
+        return None
+
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ParsedPdf:
+    """Outcome of extracting one PDF."""
+
+    def __init__(self, path: Path, content_hash: Optional[str] = None,
+                 fields: Optional[pdf_extractor.Record] = None, error: Optional[str] = None,
+                 template: Optional[str] = None, source: Optional[str] = None,
+                 document_type: Optional[str] = None):
+        self.path = path
+        self.content_hash = content_hash
+        self.fields = fields
+        self.error = error
+        self.template = template
+        self.document_type = document_type
+        self.quarantined = False
+        self._source = source
+
+    @property
+    def source(self) -> str:
+        """Name to report for the file ("archive.zip!/member.pdf" for archive members)."""
+        return self._source or source_name(self.path)
+
+    def set_document(self, document: Optional[Tuple[str, Optional[str], Optional[pdf_extractor.Record]]]):
+        """Store the (document type, template, fields) result of pdf_extractor.extract_document."""
+        if document is not None:
+            self.document_type, self.template, self.fields = document
+
+    def quarantine(self, reason: str):
+        """Mark the file as pathological; it is reported separately from ordinary failures."""
+        self.quarantined = True
+        self.error = reason
+
+
+def _extract(pdf_path: str, data, cached_text: Optional[List[str]]
+             ) -> Tuple[Optional[pdf_extractor.DocumentResult], Optional[List[str]]]:
+    """Parse cached page texts, or extract from the PDF. Returns the document and any new text to cache."""
+    if cached_text is not None:
+        return pdf_extractor.parse_document_text(cached_text), None
+    return pdf_extractor.extract_document_with_text(pdf_path, data)
+
+
+def _worker_main(conn):
+    """Worker process loop: extract each (path, bytes, cached text) job sent over the pipe."""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        try:
+            conn.send(("ok", _extract(*job)))
+        except Exception as e:
+            conn.send(("error", str(e) or type(e).__name__))
+
+
+class _Job:
+    """A file waiting for, or running on, a worker."""
+
+    def __init__(self, result: ParsedPdf, data: Optional[bytes], cached_text: Optional[List[str]] = None):
+        self.result = result
+        self.data = data
+        self.size = len(data) if data is not None else 0
+        self.cached_text = cached_text
+        self.new_text: Optional[List[str]] = None
+        self.seconds: Optional[float] = None  # time on the worker
+        self.done = data is None and cached_text is None  # read errors never reach a worker
+
+
+class _Worker:
+    """A killable extraction process that handles one job at a time."""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job: Optional[_Job] = None
+        self.started_at = 0.0
+
+    def assign(self, job: _Job):
+        """Send a job to the worker and start its clock."""
+        self.job = job
+        self.started_at = time.monotonic()
+        self.conn.send((str(job.result.path), job.data, job.cached_text))
+        job.data = job.cached_text = None
+
+    def finish(self):
+        """Receive the result of the current job."""
+        status, value = self.conn.recv()
+        job, self.job = self.job, None
+        job.seconds = time.monotonic() - self.started_at
+        if status == "ok":
+            document, job.new_text = value
+            job.result.set_document(document)
+        else:
+            job.result.error = value
+        job.done = True
+
+    def kill(self):
+        """Terminate the process immediately."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        """Ask the process to exit, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ExtractionPipeline:
+    """
+    Extract bukti potong fields from many PDFs, overlapping reads with parsing.
+
+    Iterate to receive one ParsedPdf per input path, in input order. Files run
+    in watchdog-supervised worker processes; a batch of fewer than
+    MIN_PARALLEL_FILES files gets a single worker, since starting more would
+    take longer than extracting the files. Only without budgets does a small
+    or single-worker batch run in this process instead.
+
+    Pass a TextCache to reuse and store raw PDF text by content hash, and an
+    ExtractionHistory to schedule with, and record, the per-file costs
+    measured across runs. Paths may also be an iterator that produces files
+    while the pipeline runs (see job_queue); they are read on the prefetch
+    thread, dispatched in the order produced, and the pipeline ends when the
+    iterator does.
+    """
+
+    def __init__(self, paths: Iterable[Union[str, Path]], workers: Optional[int] = None,
+                 prefetch_depth: int = DEFAULT_PREFETCH_DEPTH,
+                 file_timeout: Optional[float] = DEFAULT_FILE_TIMEOUT,
+                 file_memory_mb: Optional[float] = DEFAULT_FILE_MEMORY_MB,
+                 text_cache: Optional[TextCache] = None, history: Optional[ExtractionHistory] = None,
+                 schedule: bool = True):
+        self.paths = paths if isinstance(paths, Iterator) else list(paths)
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.prefetch_depth = prefetch_depth
+        self.file_timeout = file_timeout or None
+        self.file_memory_mb = file_memory_mb or None
+        self.text_cache = text_cache
+        self.history = history
+        self.schedule = schedule
+
+    def __iter__(self) -> Iterator[ParsedPdf]:
+        supervised = self.file_timeout or self.file_memory_mb
+        streamed = isinstance(self.paths, Iterator)
+        if not streamed and not supervised and (len(self.paths) < MIN_PARALLEL_FILES or self.workers == 1):
+            return self._run_inline()
+        return self._run_supervised()
+
+    def _open_text_cache(self):
+        """Open a cache session for one run (a no-op context without a text cache)."""
+        if self.text_cache is None:
+            return nullcontext()
+        return TextCacheSession(self.text_cache)
+
+    @staticmethod
+    def _log_text_cache(text_cache: Optional[TextCacheSession]):
+        """Log how many files were parsed from cached text."""
+        if text_cache is not None:
+            logging.getLogger(__name__).info(
+                f"Text cache: {text_cache.hits} files parsed from cached text, {text_cache.misses} read from PDF"
+            )
+
+    def _run_inline(self) -> Iterator[ParsedPdf]:
+        """Parse each prefetched file in this process."""
+        with PdfPrefetcher(self.paths, self.prefetch_depth) as prefetcher, self._open_text_cache() as text_cache:
+            for payload in prefetcher:
+                with payload:
+                    if payload.error:
+                        result = ParsedPdf(payload.path, error=payload.error)
+                    else:
+                        result = ParsedPdf(payload.path, content_hash=hash_bytes(payload.data))
+                        cached_text = text_cache.get(result.content_hash) if text_cache else None
+                        try:
+                            document, new_text = _extract(str(payload.path), payload.data, cached_text)
+                            result.set_document(document)
+                            if text_cache and new_text is not None:
+                                text_cache.put(result.content_hash, new_text)
+                        except Exception as e:
+                            result.error = str(e) or type(e).__name__
+                yield result
+            self._log_text_cache(text_cache)
+
+    def _dispatch_order(self) -> List[int]:
+        """Input positions in the order files go to workers: longest predicted jobs first."""
+        if not self.schedule:
+            return list(range(len(self.paths)))
+        measured = self.history.get_file_costs() if self.history is not None else None
+        return longest_first(predict_costs(self.paths, measured), SCHEDULE_WINDOW)
+
+    def _run_supervised(self) -> Iterator[ParsedPdf]:
+        """Hand prefetched files to watchdog-supervised workers and yield results in input order."""
+        logger = logging.getLogger(__name__)
+        streamed = isinstance(self.paths, Iterator)
+        if streamed:
+            worker_count = self.workers
+        elif len(self.paths) < MIN_PARALLEL_FILES:
+            worker_count = 1
+        else:
+            worker_count = min(self.workers, len(self.paths))
+        max_in_flight = worker_count * IN_FLIGHT_PER_WORKER
+        context = multiprocessing.get_context()
+
+        if streamed:
+            dispatch_paths, positions = self.paths, itertools.count()
+        else:
+            order = self._dispatch_order()
+            dispatch_paths, positions = [self.paths[position] for position in order], iter(order)
+        jobs: Dict[int, _Job] = {}  # every job not yet yielded, by input position
+        waiting: Deque[_Job] = deque()  # jobs not yet sent to a worker
+        measured: List[Tuple[str, int, Optional[int], float]] = []
+        next_position = 0
+        workers = [_Worker(context) for _ in range(worker_count)]
+        logger.info(
+            f"Extracting with {worker_count} worker processes "
+            f"(per-file budget: {self.file_timeout or 'no'} s, {self.file_memory_mb or 'no'} MB)"
+        )
+
+        try:
+            with PdfPrefetcher(dispatch_paths, self.prefetch_depth) as prefetcher, \
+                    self._open_text_cache() as text_cache:
+                reading = True
+                while reading or jobs:
+                    # Backpressure: only read ahead while few enough jobs are unfinished
+                    while reading and len(waiting) + sum(worker.job is not None for worker in workers) < max_in_flight:
+                        # Poll, so the watchdog keeps running while a slow (network) read is in progress
+                        busy = any(worker.job is not None for worker in workers)
+                        try:
+                            payload = prefetcher.get(timeout=0 if busy else WATCHDOG_INTERVAL)
+                        except queue.Empty:
+                            break
+                        if payload is None:
+                            reading = False
+                            break
+                        with payload:
+                            if payload.error:
+                                job = _Job(ParsedPdf(payload.path, error=payload.error), None)
+                            else:
+                                result = ParsedPdf(payload.path, content_hash=hash_bytes(payload.data))
+                                cached_text = text_cache.get(result.content_hash) if text_cache else None
+                                if cached_text is not None:
+                                    # Only the text goes to the worker; PyMuPDF is skipped
+                                    job = _Job(result, None, cached_text)
+                                else:
+                                    job = _Job(result, bytes(payload.data))
+                                waiting.append(job)
+                        jobs[next(positions)] = job
+
+                    for index, worker in enumerate(workers):
+                        if worker.job is None and waiting:
+                            try:
+                                worker.assign(waiting[0])
+                                waiting.popleft()
+                            except (OSError, ValueError):
+                                # Worker died while idle; retry the job on a fresh one
+                                worker.job = None
+                                worker.kill()
+                                workers[index] = _Worker(context)
+
+                    self._supervise(workers, context)
+
+                    while next_position in jobs and jobs[next_position].done:
+                        job = jobs.pop(next_position)
+                        next_position += 1
+                        if text_cache and job.new_text is not None:
+                            text_cache.put(job.result.content_hash, job.new_text)
+                        if job.seconds is not None and job.size and len(split_archive_path(job.result.path)) == 1:
+                            page_count = len(job.new_text) if job.new_text is not None else None
+                            measured.append((str(job.result.path), job.size, page_count, job.seconds))
+                        yield job.result
+                self._log_text_cache(text_cache)
+            if self.history is not None:
+                self.history.save_file_costs(measured)
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    def _supervise(self, workers: List[_Worker], context):
+        """Collect finished jobs and enforce the watchdog budgets on running ones."""
+        logger = logging.getLogger(__name__)
+        busy = [worker for worker in workers if worker.job is not None]
+        if not busy:
+            return
+
+        ready = wait([worker.conn for worker in busy], timeout=WATCHDOG_INTERVAL)
+        now = time.monotonic()
+
+        for worker in busy:
+            reason = None
+            if worker.conn in ready:
+                try:
+                    worker.finish()
+                    continue
+                except (EOFError, OSError):
+                    worker.process.join(timeout=1)
+                    reason = f"Worker crashed (exit code {worker.process.exitcode})"
+            elif self.file_timeout and now - worker.started_at > self.file_timeout:
+                reason = f"Timed out after {self.file_timeout:g} s"
+            elif self.file_memory_mb:
+                rss = process_rss_mb(worker.process.pid)
+                if rss is not None and rss > self.file_memory_mb:
+                    reason = f"Exceeded memory budget ({rss:.0f} MB > {self.file_memory_mb:g} MB)"
+
+            if reason:
+                job, worker.job = worker.job, None
+                job.result.quarantine(reason)
+                job.seconds = now - worker.started_at
+                job.done = True
+                logger.warning(f"Quarantined {job.result.source}: {reason}")
+                worker.kill()
+                workers[workers.index(worker)] = _Worker(context)
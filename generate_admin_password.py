@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 """
-Generate SHA-256 hash for admin password
+Generate salted PBKDF2 hash for admin password
 """
 
-import hashlib
+from credentials import hash_password
 from db_manager import get_db
 
 def generate_password_hash(password: str) -> str:
-    """Generate SHA-256 hash of password."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Generate salted PBKDF2 hash of password using the configured KDF cost."""
+    return hash_password(password, get_db().get_kdf_iterations())
 
 def update_admin_password(new_password: str):
     """Update admin password in database."""
@@ -17,9 +17,7 @@ def update_admin_password(new_password: str):
         success, message = db.update_admin_password(new_password)
         
         if success:
-            password_hash = generate_password_hash(new_password)
             print("✓ Password admin berhasil diupdate!")
-            print(f"  Hash: {password_hash}")
         else:
             print(f"✗ Error: {message}")
         
@@ -36,7 +34,7 @@ if __name__ == "__main__":
     print("Pilihan 1: Generate hash saja")
     password = input("Masukkan password: ")
     hash_value = generate_password_hash(password)
-    print(f"\nSHA-256 Hash: {hash_value}")
+    print(f"\nPBKDF2 Hash: {hash_value}")
     print()
     
     # Option 2: Update companies.json
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Distributed Extraction for Coretax Extractor
+A shared SQLite job queue that lets several PCs extract one batch
+
+The coordinator (the app) registers every input file of a batch as a job in
+a queue database on a share that all machines can reach. Workers on any
+machine claim jobs in small chunks under a lease as their (long-lived)
+worker pool has room, renew the lease with heartbeats while they extract,
+and write the results back in batches. A job whose
+lease runs out (its worker crashed or lost the share) is claimed again by
+another worker. The coordinator extracts alongside the workers and yields
+the results in input order, so the usual filtering, duplicate checks and
+Excel output apply unchanged.
+
+Input paths must open under the same name on every machine, e.g. UNC paths
+(\\\\server\\share\\bupot\\a.pdf).
+
+Usage:
+    python job_queue.py work --queue \\\\server\\share\\coretax_queue.db
+    python job_queue.py work --queue /tmp/queue.db --idle-exit 10
+    python job_queue.py status --queue \\\\server\\share\\coretax_queue.db
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import logging
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from datetime import date
+from pathlib import Path
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from bupot_record import BupotRecord
+from db_manager import apply_migrations
+from extraction_history import ExtractionHistory
+from extraction_pipeline import DEFAULT_WORKERS, SCHEDULE_WINDOW, ExtractionPipeline, ParsedPdf
+from job_scheduler import longest_first, predict_costs
+from text_cache import TextCache
+
+
+LEASE_SECONDS = 120  # a claimed job goes back to the queue this long after its worker's last heartbeat
+HEARTBEAT_INTERVAL = 15
+CLAIM_PER_WORKER = 8  # jobs claimed at a time per worker process
+MAX_ATTEMPTS = 3  # leases a job may lose before it is given up on
+POLL_INTERVAL = 0.5  # coordinator, seconds between checks for new results
+WORKER_POLL_INTERVAL = 2.0  # worker, seconds between claims while the queue is empty
+COMPLETE_BATCH_SIZE = 32  # results written back per transaction
+COMPLETE_INTERVAL = 2.0  # longest a finished result waits before it is written back
+
+JOB_PENDING = 'pending'
+JOB_LEASED = 'leased'
+JOB_DONE = 'done'
+JOB_MERGED = 'merged'  # result taken by the coordinator
+
+DATE_FIELDS = ('Tanggal',)
+
+# (batch id, input position, path) of a claimed job
+ClaimedJob = Tuple[str, int, str]
+# (batch id, input position, result) of a finished job
+FinishedJob = Tuple[str, int, ParsedPdf]
+
+
+def make_worker_id() -> str:
+    """Identify a worker by machine and process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _encode_fields(record: Optional[BupotRecord]) -> Optional[str]:
+    """Serialize a record as JSON (never pickle: the queue file is writable by every machine)."""
+    if record is None:
+        return None
+    return json.dumps({
+        key: value.isoformat() if isinstance(value, date) else value
+        for key, value in record.items()
+    })
+
+
+def _decode_fields(text: Optional[str]) -> Optional[BupotRecord]:
+    """Rebuild a record written by _encode_fields."""
+    if text is None:
+        return None
+    values = json.loads(text)
+    for field in DATE_FIELDS:
+        if values.get(field):
+            values[field] = date.fromisoformat(values[field])
+    return BupotRecord(values)
+
+
+class JobQueue:
+    """Batches of extraction jobs in a SQLite database shared between machines."""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection that waits for other machines' writes.
+
+        The default rollback journal is kept: WAL needs shared memory, which
+        network shares do not provide.
+        """
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_database(self):
+        """Bring the queue schema up to date (a single pragma read when current)."""
+        conn = self._connect()
+        try:
+            apply_migrations(conn, [self._migrate_queue_tables, self._migrate_batch_status_index])
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate_queue_tables(cursor):
+        """Migration 1: batch and job tables."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                coordinator TEXT,
+                total_jobs INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                batch_id TEXT NOT NULL REFERENCES batches (batch_id),
+                position INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                queued_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL,
+                heartbeat_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                content_hash TEXT,
+                document_type TEXT,
+                template TEXT,
+                fields TEXT,
+                error TEXT,
+                quarantined INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (batch_id, position)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, queued_at, priority)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_worker ON jobs (worker_id, status)")
+
+    @staticmethod
+    def _migrate_batch_status_index(cursor):
+        """Migration 2: index for collecting the finished jobs of a batch."""
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch_status ON jobs (batch_id, status)")
+
+    def create_batch(self, paths: List[Union[str, Path]], priorities: Optional[List[int]] = None,
+                     coordinator: str = "") -> str:
+        """
+        Register a batch of files as pending jobs.
+
+        Args:
+            paths: Input files, in output order
+            priorities: Claim rank of each file (lowest first); input order by default
+            coordinator: Worker id of the coordinator, for status display
+
+        Returns:
+            The new batch id
+        """
+        batch_id = uuid.uuid4().hex
+        priorities = priorities or list(range(len(paths)))
+        queued_at = time.time()
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO batches (batch_id, coordinator, total_jobs) VALUES (?, ?, ?)",
+                    (batch_id, coordinator, len(paths))
+                )
+                conn.executemany(
+                    "INSERT INTO jobs (batch_id, position, path, priority, queued_at) VALUES (?, ?, ?, ?, ?)",
+                    [(batch_id, position, str(path), priorities[position], queued_at)
+                     for position, path in enumerate(paths)]
+                )
+        finally:
+            conn.close()
+        return batch_id
+
+    def claim(self, worker_id: str, limit: int, batch_id: Optional[str] = None) -> List[ClaimedJob]:
+        """
+        Lease up to `limit` pending jobs (or jobs whose lease ran out), oldest batch first.
+
+        Jobs that have already lost MAX_ATTEMPTS leases are completed as
+        quarantined instead of being handed out again.
+        """
+        now = time.time()
+        batch_filter = " AND batch_id = ?" if batch_id else ""
+        batch_params = (batch_id,) if batch_id else ()
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"UPDATE jobs SET status = ?, quarantined = 1, error = ? "
+                f"WHERE status = ? AND lease_expires < ? AND attempts >= ?{batch_filter}",
+                (JOB_DONE, f"Worker lost {MAX_ATTEMPTS} times while extracting this file",
+                 JOB_LEASED, now, MAX_ATTEMPTS, *batch_params)
+            )
+            claimed = conn.execute(
+                f"SELECT batch_id, position, path FROM jobs "
+                f"WHERE (status = ? OR (status = ? AND lease_expires < ?)){batch_filter} "
+                f"ORDER BY queued_at, priority LIMIT ?",
+                (JOB_PENDING, JOB_LEASED, now, *batch_params, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_expires = ?, heartbeat_at = ?, "
+                "attempts = attempts + 1 WHERE batch_id = ? AND position = ?",
+                [(JOB_LEASED, worker_id, now + LEASE_SECONDS, now, job_batch, position)
+                 for job_batch, position, _ in claimed]
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return claimed
+
+    def heartbeat(self, worker_id: str) -> int:
+        """Renew the leases of a worker's jobs. Returns the number of jobs it still holds."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(
+                    "UPDATE jobs SET lease_expires = ?, heartbeat_at = ? WHERE worker_id = ? AND status = ?",
+                    (now + LEASE_SECONDS, now, worker_id, JOB_LEASED)
+                ).rowcount
+        finally:
+            conn.close()
+
+    def complete(self, worker_id: str, results: List[FinishedJob]):
+        """
+        Store the results of claimed jobs as (batch id, position, result).
+
+        A result is dropped if the worker lost the lease in the meantime; the
+        job then belongs to whichever worker claimed it next.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE jobs SET status = ?, content_hash = ?, document_type = ?, template = ?, "
+                    "fields = ?, error = ?, quarantined = ? "
+                    "WHERE batch_id = ? AND position = ? AND worker_id = ? AND status = ?",
+                    [(JOB_DONE, parsed.content_hash, parsed.document_type, parsed.template,
+                      _encode_fields(parsed.fields), parsed.error, int(parsed.quarantined),
+                      batch_id, position, worker_id, JOB_LEASED)
+                     for batch_id, position, parsed in results]
+                )
+        finally:
+            conn.close()
+
+    def collect(self, batch_id: str) -> Dict[int, ParsedPdf]:
+        """
+        Take the results of a batch finished since the last call, by input position.
+
+        Each result is returned once: collected jobs are marked merged and
+        their stored fields dropped.
+        """
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM jobs WHERE batch_id = ? AND status = ? LIMIT 1",
+                            (batch_id, JOB_DONE)).fetchone() is None:
+                return {}
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT position, path, content_hash, document_type, template, fields, error, quarantined "
+                "FROM jobs WHERE batch_id = ? AND status = ?",
+                (batch_id, JOB_DONE)
+            ).fetchall()
+            conn.execute("UPDATE jobs SET status = ?, fields = NULL WHERE batch_id = ? AND status = ?",
+                         (JOB_MERGED, batch_id, JOB_DONE))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        results = {}
+        for position, path, content_hash, document_type, template, fields, error, quarantined in rows:
+            parsed = ParsedPdf(Path(path), content_hash=content_hash, fields=_decode_fields(fields),
+                               template=template, document_type=document_type)
+            if quarantined:
+                parsed.quarantine(error)
+            else:
+                parsed.error = error
+            results[position] = parsed
+        return results
+
+    def finish_batch(self, batch_id: str):
+        """Remove a merged (or abandoned) batch and its jobs."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM jobs WHERE batch_id = ?", (batch_id,))
+                conn.execute("DELETE FROM batches WHERE batch_id = ?", (batch_id,))
+        finally:
+            conn.close()
+
+    def get_status(self) -> List[Dict]:
+        """Job counts and active workers of every open batch."""
+        now = time.time()
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            batches = [dict(row) for row in conn.execute("SELECT * FROM batches ORDER BY created_at")]
+            for batch in batches:
+                counts = dict(conn.execute(
+                    "SELECT status, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY status",
+                    (batch['batch_id'],)
+                ).fetchall())
+                batch.update({status: counts.get(status, 0) for status in (JOB_PENDING, JOB_LEASED)})
+                batch[JOB_DONE] = counts.get(JOB_DONE, 0) + counts.get(JOB_MERGED, 0)
+                batch['workers'] = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT worker_id FROM jobs WHERE batch_id = ? AND status = ? AND lease_expires >= ?",
+                    (batch['batch_id'], JOB_LEASED, now)
+                )]
+            return batches
+        finally:
+            conn.close()
+
+
+class _Heartbeat:
+    """Renew a worker's leases on a background thread while extraction runs."""
+
+    def __init__(self, queue: JobQueue, worker_id: str):
+        self._queue = queue
+        self._worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="queue-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self._queue.heartbeat(self._worker_id)
+            except sqlite3.Error as e:
+                # A missed beat only shortens the lease; keep trying
+                logging.getLogger(__name__).warning(f"Queue heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class _ResultWriter:
+    """Write finished results back to the queue in batches (flush() may be called from any thread)."""
+
+    def __init__(self, queue: JobQueue, worker_id: str):
+        self._queue = queue
+        self._worker_id = worker_id
+        self._lock = threading.Lock()
+        self._pending: List[FinishedJob] = []
+        self._oldest = 0.0
+        self.written = 0
+        self.flushed = threading.Event()  # set after every write
+
+    def add(self, batch_id: str, position: int, parsed: ParsedPdf):
+        """Queue a result, writing the batch once it is full or its oldest result has waited long enough."""
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((batch_id, position, parsed))
+            due = (len(self._pending) >= COMPLETE_BATCH_SIZE
+                   or time.monotonic() - self._oldest >= COMPLETE_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the queued results in one transaction; on a database error they are kept for the next try."""
+        with self._lock:
+            if not self._pending:
+                return
+            try:
+                self._queue.complete(self._worker_id, self._pending)
+            except sqlite3.Error as e:
+                logging.getLogger(__name__).warning(f"Cannot write {len(self._pending)} results to the queue: {e}")
+                return
+            self.written += len(self._pending)
+            self._pending = []
+            self.flushed.set()
+        logging.getLogger(__name__).info(f"Wrote back {self.written} results")
+
+
+class _ClaimFeed:
+    """
+    Paths of jobs claimed from the queue, for a long-running ExtractionPipeline.
+
+    The pipeline iterates the feed on its prefetch thread, so jobs are
+    claimed (a chunk at a time) only as the pipeline has room for them.
+    While nothing can be claimed the feed writes back finished results and
+    polls again, until `stop` is set or the queue has been empty for
+    `idle_exit` seconds.
+    """
+
+    def __init__(self, queue: JobQueue, worker_id: str, limit: int, results: _ResultWriter,
+                 batch_id: Optional[str] = None, idle_exit: Optional[float] = None,
+                 poll_interval: float = WORKER_POLL_INTERVAL, stop: Optional[threading.Event] = None):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.limit = limit
+        self.results = results
+        self.batch_id = batch_id
+        self.idle_exit = idle_exit
+        self.poll_interval = poll_interval
+        self.stop = stop or threading.Event()
+        # (batch id, position) of each path handed to the pipeline, in order; its results come back in the same order
+        self.claimed: Deque[Tuple[str, int]] = deque()
+
+    def __iter__(self) -> Iterator[str]:
+        idle_since = time.monotonic()
+        while not self.stop.is_set():
+            try:
+                jobs = self.queue.claim(self.worker_id, self.limit, self.batch_id)
+            except sqlite3.Error as e:
+                logging.getLogger(__name__).warning(f"Cannot claim jobs: {e}")
+                jobs = []
+            if jobs:
+                for batch_id, position, path in jobs:
+                    self.claimed.append((batch_id, position))
+                    yield path
+                idle_since = time.monotonic()
+                continue
+
+            self.results.flush()
+            if self.idle_exit is not None and time.monotonic() - idle_since >= self.idle_exit:
+                return
+            self.stop.wait(self.poll_interval)
+
+
+def _extract_from_queue(feed: _ClaimFeed, **pipeline_options) -> int:
+    """Run one ExtractionPipeline over everything the feed claims and write the results back. Returns the file count."""
+    pipeline = iter(ExtractionPipeline(iter(feed), **pipeline_options))
+    extracted = 0
+    try:
+        for parsed in pipeline:
+            batch_id, position = feed.claimed.popleft()
+            feed.results.add(batch_id, position, parsed)
+            extracted += 1
+            if not feed.claimed:
+                # Nothing else is in flight here, so nothing would fill the batch soon
+                feed.results.flush()
+    finally:
+        # Stop claiming first: closing the pipeline waits for its prefetch thread, which runs the feed
+        feed.stop.set()
+        pipeline.close()
+        feed.results.flush()
+    return extracted
+
+
+def run_worker(queue: JobQueue, workers: Optional[int] = None, idle_exit: Optional[float] = None,
+               text_cache: Optional[TextCache] = None, stop: Optional[threading.Event] = None) -> int:
+    """
+    Claim and extract jobs from any batch until stopped.
+
+    One worker pool runs for the whole session; jobs are claimed as it has
+    room for them.
+
+    Args:
+        queue: Shared job queue
+        workers: Extraction worker processes on this machine (default: automatic)
+        idle_exit: Return after the queue has been empty for this many seconds
+        text_cache: Local raw text cache to reuse
+        stop: Event that stops claiming; files already claimed are finished
+
+    Returns:
+        Number of files extracted
+    """
+    logger = logging.getLogger(__name__)
+    worker_id = make_worker_id()
+    limit = CLAIM_PER_WORKER * max(1, workers or DEFAULT_WORKERS)
+    feed = _ClaimFeed(queue, worker_id, limit, _ResultWriter(queue, worker_id), idle_exit=idle_exit, stop=stop)
+
+    logger.info(f"Worker {worker_id} polling {queue.db_path}")
+    with _Heartbeat(queue, worker_id):
+        extracted = _extract_from_queue(feed, workers=workers, text_cache=text_cache)
+    logger.info(f"Worker {worker_id} stopping after {extracted} files")
+    return extracted
+
+
+class DistributedPipeline:
+    """
+    Extract a batch through the shared job queue, with remote workers helping.
+
+    Iterate to receive one ParsedPdf per input path, in input order, like
+    ExtractionPipeline. Jobs are claimed longest-predicted-first. This
+    process extracts too, on a background thread with its own worker pool,
+    so the batch completes even with no worker running. The batch is
+    removed from the queue once iteration ends.
+    """
+
+    def __init__(self, paths: List[Union[str, Path]], queue: JobQueue,
+                 history: Optional[ExtractionHistory] = None, **pipeline_options):
+        self.paths = list(paths)
+        self.queue = queue
+        self.history = history
+        self.pipeline_options = pipeline_options
+
+    def __iter__(self) -> Iterator[ParsedPdf]:
+        logger = logging.getLogger(__name__)
+        worker_id = make_worker_id()
+        measured = self.history.get_file_costs() if self.history is not None else None
+        order = longest_first(predict_costs(self.paths, measured), SCHEDULE_WINDOW)
+        priorities = [0] * len(order)
+        for rank, position in enumerate(order):
+            priorities[position] = rank
+
+        batch_id = self.queue.create_batch(self.paths, priorities, coordinator=worker_id)
+        limit = CLAIM_PER_WORKER * max(1, self.pipeline_options.get('workers') or DEFAULT_WORKERS)
+        logger.info(f"Queued {len(self.paths)} files as batch {batch_id[:8]} in {self.queue.db_path}")
+
+        results = _ResultWriter(self.queue, worker_id)
+        feed = _ClaimFeed(self.queue, worker_id, limit, results, batch_id=batch_id, poll_interval=POLL_INTERVAL)
+        local_errors: List[Exception] = []
+        local = threading.Thread(target=self._extract_locally, args=(feed, local_errors),
+                                 name="queue-local-extraction", daemon=True)
+        try:
+            with _Heartbeat(self.queue, worker_id):
+                local.start()
+                finished: Dict[int, ParsedPdf] = {}
+                next_position = 0
+                while next_position < len(self.paths):
+                    finished.update(self.queue.collect(batch_id))
+                    if next_position not in finished:
+                        if local_errors:
+                            raise local_errors[0]
+                        # Woken early when this process writes back its own results
+                        results.flushed.wait(POLL_INTERVAL)
+                        results.flushed.clear()
+                        continue
+                    while next_position in finished:
+                        yield finished.pop(next_position)
+                        next_position += 1
+        finally:
+            feed.stop.set()
+            if local.ident is not None:
+                local.join()
+            self.queue.finish_batch(batch_id)
+
+    def _extract_locally(self, feed: _ClaimFeed, errors: List[Exception]):
+        """Extract jobs of the batch in this process (background thread)."""
+        try:
+            _extract_from_queue(feed, history=self.history, **self.pipeline_options)
+        except Exception as e:
+            logging.getLogger(__name__).exception("Local extraction for the job queue failed")
+            errors.append(e)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Coretax Extractor distributed extraction")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    work = subparsers.add_parser("work", help="Extract jobs from the shared queue")
+    work.add_argument("--queue", required=True, help="Queue database on the share")
+    work.add_argument("--workers", type=int, help="Extraction processes on this machine (default: automatic)")
+    work.add_argument("--idle-exit", type=float, help="Exit after the queue has been empty for this many seconds")
+    work.add_argument("--text-cache", help="Local raw text cache database to reuse")
+
+    status = subparsers.add_parser("status", help="Show open batches")
+    status.add_argument("--queue", required=True, help="Queue database on the share")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    queue = JobQueue(args.queue)
+
+    if args.command == "status":
+        batches = queue.get_status()
+        if not batches:
+            print("No open batches")
+        for batch in batches:
+            print(f"{batch['batch_id'][:8]}  {batch['created_at']}  coordinator {batch['coordinator']}")
+            print(f"    {batch[JOB_DONE]}/{batch['total_jobs']} done, {batch[JOB_LEASED]} leased, "
+                  f"{batch[JOB_PENDING]} pending; workers: {', '.join(batch['workers']) or 'none'}")
+        return 0
+
+    text_cache = TextCache(args.text_cache) if args.text_cache else None
+    try:
+        run_worker(queue, workers=args.workers, idle_exit=args.idle_exit, text_cache=text_cache)
+    except KeyboardInterrupt:
+        # Leases of unfinished jobs run out and other workers take them over
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Job Scheduling for Coretax Extractor
+Longest-job-first dispatch order for a batch of PDFs
+
+A batch finishes sooner when its most expensive files start first: a large
+multi-page PDF left for the end keeps one worker busy while the others sit
+idle. The cost of each file is predicted before it is read, as the
+extraction time measured in an earlier run for the same file (same path and
+size). Otherwise, once earlier runs recorded page counts, it is the file's
+page count times the average seconds per page: extraction time follows the
+text on each page, which a scanned page of the same size does not have.
+Files whose page count cannot be read fall back to their size times the
+average seconds per byte. Only the dispatch order changes; results still come
+back in input order, so duplicate detection and the output stay
+deterministic.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from pdf_io import split_archive_path
+
+
+# Measured costs by path: {path: (size in bytes, page count, seconds)}, see ExtractionHistory.get_file_costs
+FileCosts = Dict[str, Tuple[int, Optional[int], float]]
+
+
+def file_size(path: Union[str, Path]) -> Optional[int]:
+    """Size of a file on disk; None for archive members and files that cannot be read."""
+    if len(split_archive_path(path)) > 1:
+        return None
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def page_count(path: Union[str, Path]) -> Optional[int]:
+    """
+    Number of pages of a PDF on disk; None for archive members and files that cannot be opened.
+
+    Opening a document reads only its cross-reference table and page tree,
+    not the page contents.
+    """
+    if len(split_archive_path(path)) > 1:
+        return None
+    try:
+        with fitz.open(str(path)) as document:
+            return document.page_count
+    except Exception:
+        return None
+
+
+def predict_costs(paths: Sequence[Union[str, Path]], measured: Optional[FileCosts] = None) -> List[Optional[float]]:
+    """
+    Predict the extraction cost of each file.
+
+    Returns seconds when earlier measurements exist and bytes otherwise (so
+    costs in one batch are always comparable), or None for files whose size
+    is unknown.
+    """
+    measured = measured or {}
+    measured_bytes = sum(size for size, _, _ in measured.values())
+    seconds_per_byte = sum(seconds for _, _, seconds in measured.values()) / measured_bytes if measured_bytes else None
+    paged = [(pages, seconds) for _, pages, seconds in measured.values() if pages]
+    measured_pages = sum(pages for pages, _ in paged)
+    seconds_per_page = sum(seconds for _, seconds in paged) / measured_pages if measured_pages else None
+
+    costs = []
+    for path in paths:
+        size = file_size(path)
+        previous = measured.get(str(path))
+        if size is None:
+            costs.append(None)
+        elif previous and previous[0] == size:
+            costs.append(previous[2])
+        elif seconds_per_byte is not None:
+            # Only files without a measurement are opened for their page count
+            pages = page_count(path) if seconds_per_page is not None else None
+            costs.append(pages * seconds_per_page if pages else size * seconds_per_byte)
+        else:
+            costs.append(float(size))
+    return costs
+
+
+def longest_first(costs: Sequence[Optional[float]], window: Optional[int] = None) -> List[int]:
+    """
+    Input positions in dispatch order, highest predicted cost first.
+
+    Files are reordered within windows of `window` consecutive files (the
+    whole batch by default). Results are returned in input order, so the
+    window bounds how many finished results wait for an earlier file and
+    keeps progress moving. Ties keep input order, and files without a
+    prediction (archive members) go last in their window in input order,
+    so archives are still read member by member.
+    """
+    window = window or max(1, len(costs))
+    order = []
+    for start in range(0, len(costs), window):
+        positions = range(start, min(start + window, len(costs)))
+        order.extend(sorted(positions, key=lambda i: (costs[i] is None, -(costs[i] or 0.0), i)))
+    return order
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NPWP Canonicalization for Coretax Extractor
+Maps the different written forms of an NPWP to one comparison key
+
+The same taxpayer turns up as a legacy 15-digit NPWP ("01.901.066.9-038.000"),
+its Coretax 16-digit form with a leading zero ("0019010669038000"), a number
+that lost its leading zeros in a spreadsheet ("19010669038000"), a 16-digit
+NIK, or a 22-digit NITKU (the 16-digit NPWP followed by a 6-digit branch
+code). canonical_npwp() turns all of them into the 16-digit form.
+"""
+
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+NPWP_LENGTH = 16
+NITKU_LENGTH = 22  # 16-digit NPWP + 6-digit place-of-business code
+
+
+@lru_cache(maxsize=4096)
+def canonical_npwp(value: Optional[str]) -> str:
+    """
+    Canonical 16-digit key for an NPWP, NIK or NITKU ('' when it has no digits).
+
+    Punctuation is dropped, shorter numbers are zero-padded to 16 digits and a
+    NITKU is cut back to its NPWP. Other lengths are returned as bare digits,
+    so they only ever match themselves.
+    """
+    digits = ''.join(c for c in str(value or '') if c.isdigit())
+    if not digits:
+        return ''
+    if len(digits) == NITKU_LENGTH:
+        return digits[:NPWP_LENGTH]
+    if len(digits) < NPWP_LENGTH:
+        return digits.zfill(NPWP_LENGTH)
+    return digits
+
+
+class NpwpIndex:
+    """
+    Companies by canonical NPWP, built once and probed once per record.
+
+    When two companies share a canonical NPWP the first one (in the order
+    given) is kept, so lookups stay deterministic.
+    """
+
+    def __init__(self, companies: Dict[str, str]):
+        self._names: Dict[str, str] = {}
+        for name, company_npwp in companies.items():
+            key = canonical_npwp(company_npwp)
+            if key:
+                self._names.setdefault(key, name)
+
+    def company_for(self, value: Optional[str]) -> Optional[str]:
+        """Name of the company an NPWP/NIK/NITKU belongs to, or None if it is not registered."""
+        return self._names.get(canonical_npwp(value))
+
+    def __len__(self) -> int:
+        return len(self._names)
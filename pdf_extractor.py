@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF Extraction Engine for Coretax Extractor
+Text extraction and bukti potong field parsing, independent of the UI
+"""
+
+import re
+import logging
+import itertools
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from bupot_record import BupotRecord
+from pdf_io import PDF_ENCRYPTED, PDF_TEXT, classify_document, iter_page_text, open_pdf_document
+
+
+class UnreadablePdfError(Exception):
+    """A PDF with no text to parse: encrypted, or scanned with no OCR engine installed."""
+
+
+# Extracted bukti potong: text fields as str, DPP/Pajak_Penghasilan as int, Tanggal as date
+Record = BupotRecord
+
+MONTH_NAMES = ['', 'Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+               'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+
+MONTH_NUMBERS = {name.upper(): number for number, name in enumerate(MONTH_NAMES) if name}
+
+# Text normalization: keyword re-joins and digit separator fix
+KEYWORD_JOINS = {
+    r'KEMENTERIAN\s*KEUANGAN': 'KEMENTERIAN KEUANGAN',
+    r'BUKTI\s*PEMOTONGAN\s*DAN': 'BUKTI PEMOTONGAN DAN',
+    r'PEMUNGUTAN\s*PPH': 'PEMUNGUTAN PPH',
+    r'MASA\s*PAJAK': 'MASA PAJAK',
+    r'TIDAK\s*FINAL': 'TIDAK FINAL',
+    r'RSM\s*INDONESIA': 'RSM INDONESIA',
+    r'BUKIT\s*ASAM': 'BUKIT ASAM',
+}
+
+# Fix decimal/thousand separators in numbers: '1 . 250' -> '1.250'
+DIGIT_SEPARATOR_PATTERN = re.compile(r'(\d)\s+([.,])\s*(\d)')
+
+
+def _keyword_variants() -> Dict[str, str]:
+    """
+    Map every mis-spaced spelling of each keyword to its canonical form.
+
+    After whitespace is collapsed and the text upper-cased, '\\s*' between two
+    keyword words can only be '' or ' ', so e.g. 'MASAPAJAK' is the one
+    spelling of 'MASA PAJAK' that needs fixing.
+    """
+    variants = {}
+    for canonical in KEYWORD_JOINS.values():
+        words = canonical.split()
+        for gaps in itertools.product(('', ' '), repeat=len(words) - 1):
+            variant = words[0] + ''.join(gap + word for gap, word in zip(gaps, words[1:]))
+            if variant != canonical:
+                variants[variant] = canonical
+    return variants
+
+
+KEYWORD_VARIANTS = _keyword_variants()
+# Literal alternation: rarely matches on real text, so the callback seldom runs
+KEYWORD_VARIANT_PATTERN = re.compile(
+    '|'.join(re.escape(variant) for variant in sorted(KEYWORD_VARIANTS, key=len, reverse=True))
+)
+# Mixed-case text keeps the original case-insensitive rules, combined into one scan
+KEYWORD_PATTERN = re.compile(
+    '|'.join(f'(?P<join{i}>{pattern})' for i, pattern in enumerate(KEYWORD_JOINS)),
+    re.IGNORECASE
+)
+JOIN_REPLACEMENTS = {f'join{i}': replacement for i, replacement in enumerate(KEYWORD_JOINS.values())}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Field patterns never scan more than a fixed window past their label, so a missing
+# closing anchor in truncated or garbled text cannot turn a search into a scan to
+# the end of the document (quadratic across repeated labels). Windows are several
+# times wider than anything seen on real bupots:
+#   header (label -> nomor, nomor -> A. IDENTITAS)  500 chars
+#   names (A.2, C.3)                                300 chars
+#   labels and short values (B.5/B.7, B.8, B.9)     200 chars
+#   amount table (B.3 ... B.8)                     1000 chars
+
+# 1. Nomor Bukti Potong
+# Karena ini output sistem dengan format konsisten, gunakan pendekatan berbasis konteks
+# Nomor Bukti Potong selalu ada setelah header "NOMOR" dan "MASA PAJAK", sebelum "A. IDENTITAS"
+BUPOT_PATTERNS = [re.compile(pattern, re.DOTALL) for pattern in (
+    # Pattern 1: Antara "MASA PAJAK" dan "A. IDENTITAS" (paling robust)
+    # Format: MASA PAJAK ... [NOMOR] [MM-YYYY] ... A. IDENTITAS
+    # The atomic group keeps the first nomor candidate, so a missing "A. IDENTITAS"
+    # fails after one window instead of retrying every candidate against it
+    r'MASA\s+PAJAK(?>.{0,500}?([A-Z0-9]{8,10})\s+(\d{2}-\d{4})).{0,500}?A\.\s+IDENTITAS',
+
+    # Pattern 2: Setelah "PEMUNGUTAN" (high confidence)
+    r'PEMUNGUTAN\s+([A-Z0-9]{8,10})\s+\d{2}-\d{4}',
+
+    # Pattern 3: Antara "NOMOR" dan "MASA PAJAK" dengan konteks
+    r'NOMOR\s+MASA\s+PAJAK.{0,500}?([A-Z0-9]{8,10})\s+\d{2}-\d{4}',
+
+    # Pattern 4: Di area header setelah "BPPU"
+    r'BPPU.{0,500}?([A-Z0-9]{8,10})\s+\d{2}-\d{4}',
+)]
+
+# 2. Masa Pajak
+MASA_PATTERNS = [re.compile(pattern) for pattern in (
+    r'(\d{2}-\d{4})\s*TIDAK\s*FINAL',
+    r'(\d{2}-\d{4})\s*NORMAL',
+    r'MASA\s*PAJAK.{0,500}?(\d{2}-\d{4})',
+    r'(\d{2}-\d{4})',
+)]
+MASA_FORMAT_PATTERN = re.compile(r'\d{2}-\d{4}')
+
+# 3. NPWP numbers
+A1_PATTERN = re.compile(r'A\.1\s*NPWP\s*/\s*NIK\s*:\s*(\d{15,16})')
+C1_PATTERN = re.compile(r'C\.1\s*NPWP\s*/\s*NIK\s*:\s*(\d{15,16})')
+
+# 4. A2 - Nama yang dipungut
+A2_PATTERN = re.compile(r'A\.2\s*NAMA\s*:\s*(.{0,300}?)(?=A\.3)', re.DOTALL)
+
+# 5 & 6. DPP (B.5) and Pajak Penghasilan (B.7), inline and table formats
+B5_INLINE_PATTERN = re.compile(r'B\.5\s*[^:]{0,200}:\s*(\d{1,3}(?:\.\d{3})*)', re.IGNORECASE)
+B7_INLINE_PATTERN = re.compile(r'B\.7\s*[^:]{0,200}:\s*(\d{1,3}(?:\.\d{3})*)', re.IGNORECASE)
+AMOUNT_TABLE_PATTERN = re.compile(r'B\.3\s+B\.4\s+B\.5\s+B\.6\s+B\.7(.{0,1000}?)B\.8', re.DOTALL | re.IGNORECASE)
+TABLE_NUMBER_PATTERN = re.compile(r'\d{1,3}(?:\.\d{3})+')
+
+# 7. C3 - Nama pemungut
+C3_PATTERNS = [re.compile(pattern, re.DOTALL | re.IGNORECASE) for pattern in (
+    r'C\.3\s*NAMA\s*PEMOTONG\s*DAN/ATAU\s*PEMUNGUT\s*PPh\s*:\s*(.{0,300}?)(?=C\.4)',
+    r'C\.3\s*NAMA\s*:\s*(.{0,300}?)(?=C\.4)',
+)]
+
+# 8. C4 - Tanggal
+DATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'C\.4\s*TANGGAL\s*:\s*(\d{1,2})\s+(JANUARI|FEBRUARI|MARET|APRIL|MEI|JUNI|JULI|AGUSTUS|SEPTEMBER|OKTOBER|NOVEMBER|DESEMBER)\s+(\d{4})',
+    r'TANGGAL\s*:\s*(\d{1,2})\s+(JANUARI|FEBRUARI|MARET|APRIL|MEI|JUNI|JULI|AGUSTUS|SEPTEMBER|OKTOBER|NOVEMBER|DESEMBER)\s+(\d{4})',
+    r':\s*(\d{1,2})\s+(MEI|APRIL|JANUARI|FEBRUARI|MARET|JUNI|JULI|AGUSTUS|SEPTEMBER|OKTOBER|NOVEMBER|DESEMBER)\s+(\d{4})',
+)]
+
+# 9. B8 - Jenis Dokumen
+B8_PATTERNS = [re.compile(pattern, re.DOTALL) for pattern in (
+    r'B\.8.{0,200}?JENIS\s*DOKUMEN\s*:\s*([^\n]{1,200}?)(?=\s*TANGGAL|B\.9|$)',
+    r'JENIS\s*DOKUMEN\s*:\s*([^\n]{1,200}?)(?=\s*TANGGAL|B\.9|$)',
+)]
+
+# 10. B9 - Nomor Dokumen
+# Support multiple formats:
+# Format 1 (inline): B.9 NOMOR DOKUMEN : 250331/25
+# Format 2 (multiline): B.9\nNomor Dokumen\n:\n250331/25
+B9_PATTERNS = [re.compile(pattern, re.DOTALL | re.IGNORECASE) for pattern in (
+    # Format 1: Inline with space support (stops at B.10)
+    r'B\.9\s*NOMOR\s*DOKUMEN\s*:\s*(.{1,200}?)(?=\s*B\.10)',
+    # Format 2: Multiline format
+    r'B\.9\s*\n?\s*Nomor\s*Dokumen\s*\n?\s*:\s*\n?\s*(.{1,200}?)(?=\s*B\.10)',
+    # Fallback: Just NOMOR DOKUMEN (stops at B.10)
+    r'NOMOR\s*DOKUMEN\s*:\s*(.{1,200}?)(?=\s*B\.10)',
+)]
+
+
+# Standard Coretax BPPU layout: anchor tokens checked before its fast parser runs
+STANDARD_BPPU_ANCHORS = (
+    'BPPU',
+    'MASA PAJAK',
+    'A. IDENTITAS',
+    'A.1 NPWP / NIK :',
+    'A.2 NAMA :',
+    'B.3 B.4 B.5 B.6 B.7',
+    'JENIS DOKUMEN :',
+    'B.9 NOMOR DOKUMEN :',
+    'C.1 NPWP / NIK :',
+    'C.3 NAMA PEMOTONG DAN/ATAU PEMUNGUT PPH :',
+    'C.4 TANGGAL :',
+)
+
+# BP21 / 1721-A1: amounts are labelled rather than in the BPPU B.5/B.7 slots
+BP21_AMOUNT_PATTERNS = [
+    ('DPP', re.compile(r'(?:JUMLAH\s+)?PENGHASILAN\s+BRUTO[^:\d]{0,100}:?\s*(\d{1,3}(?:\.\d{3})+)')),
+    ('Pajak_Penghasilan', re.compile(
+        r'PPH\s+(?:PASAL\s+21\s+)?(?:YANG\s+)?(?:TELAH\s+)?(?:DIPOTONG|TERUTANG)[^:\d]{0,100}:?\s*(\d{1,3}(?:\.\d{3})+)'
+    )),
+]
+
+
+def extract_text_from_pdf(pdf_path: Path, data=None) -> str:
+    """
+    Extract raw text directly from PDF using PyMuPDF.
+
+    Args:
+        pdf_path: Path of the PDF (used for logging, and for opening when no data is given)
+        data: Optional in-memory file contents from pdf_io, parsed instead of reading the path
+    """
+    logger = logging.getLogger(__name__)
+
+    try:
+        logger.info(f"Extracting text from: {pdf_path.name}")
+
+        with open_pdf_document(pdf_path, data) as pdf_document:
+            page_count = pdf_document.page_count
+            full_text = "\n".join(iter_page_text(pdf_document)) + "\n"
+
+        logger.info(f"Extracted {len(full_text)} characters from {page_count} pages")
+        return full_text.strip()
+
+    except Exception as e:
+        logger.error(f"Failed to extract text from {pdf_path.name}: {str(e)}")
+        return ""
+
+
+def normalize_text(text: str, upper: bool = False) -> str:
+    """
+    Normalize extracted PDF text in a fixed number of passes.
+
+    Whitespace is collapsed with split/join, the text is optionally upper-cased,
+    then one regex scan applies every keyword re-join and a second applies the
+    digit separator fix.
+    """
+    if not text:
+        return ""
+
+    cleaned = ' '.join(text.split())
+    if upper:
+        cleaned = KEYWORD_VARIANT_PATTERN.sub(lambda match: KEYWORD_VARIANTS[match.group()], cleaned.upper())
+    else:
+        cleaned = KEYWORD_PATTERN.sub(lambda match: JOIN_REPLACEMENTS[match.lastgroup], cleaned)
+    return DIGIT_SEPARATOR_PATTERN.sub(r'\1\2\3', cleaned)
+
+
+def clean_and_normalize_pdf_text(text: str) -> str:
+    """Clean and normalize text extracted directly from PDF."""
+    return normalize_text(text)
+
+
+def _collapse_whitespace(value: str) -> str:
+    """Trim a captured value and collapse internal whitespace."""
+    return WHITESPACE_PATTERN.sub(' ', value.strip())
+
+
+def empty_record() -> Record:
+    """Record with every extracted field present and empty."""
+    return BupotRecord({
+        'Nomor Bukti Potong': '',
+        'Masa Pajak': '',
+        'NPWP_NIK_Yang_Dipungut': '',
+        'Nama_Yang_Dipungut': '',
+        'DPP': None,
+        'Pajak_Penghasilan': None,
+        'NPWP_NIK_Pemungut': '',
+        'Nama_Pemungut': '',
+        'Tanggal': None,
+        'Jenis_Dokumen': '',
+        'Nomor_Dokumen': '',
+    })
+
+
+def _format_masa_pajak(masa: str) -> str:
+    """Convert MM-YYYY to "Bulan YYYY" format, keeping the original if it cannot be converted."""
+    if MASA_FORMAT_PATTERN.match(masa):
+        month_num, year = masa.split('-')
+        try:
+            return f"{MONTH_NAMES[int(month_num)]} {year}"
+        except (ValueError, IndexError):
+            pass
+    return masa
+
+
+def _parse_amount(value: str) -> int:
+    """Convert an amount with '.' thousand separators, such as '12.500.000', to an integer."""
+    return int(value.replace('.', ''))
+
+
+def _parse_date(day: str, month: str, year: str) -> Optional[date]:
+    """Build a date from a matched 'DD BULAN YYYY'; None if it is not a real date."""
+    try:
+        return date(int(year), MONTH_NUMBERS[month], int(day))
+    except ValueError:
+        return None
+
+
+def _parse_generic(clean_text: str) -> Record:
+    """Parse any layout by trying every known pattern for each field in order."""
+    data = empty_record()
+
+    # 1. Extract Nomor Bukti Potong
+    for pattern in BUPOT_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            data['Nomor Bukti Potong'] = match.group(1)
+            break
+
+    # 2. Extract Masa Pajak
+    for pattern in MASA_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            data['Masa Pajak'] = _format_masa_pajak(match.group(1))
+            break
+
+    # 3. Extract NPWP numbers
+    a1_match = A1_PATTERN.search(clean_text)
+    if a1_match:
+        data['NPWP_NIK_Yang_Dipungut'] = a1_match.group(1)
+
+    c1_match = C1_PATTERN.search(clean_text)
+    if c1_match:
+        data['NPWP_NIK_Pemungut'] = c1_match.group(1)
+
+    # 4. Extract A2 - Nama yang dipungut
+    a2_match = A2_PATTERN.search(clean_text)
+    if a2_match:
+        data['Nama_Yang_Dipungut'] = _collapse_whitespace(a2_match.group(1))
+
+    # 5 & 6. Extract DPP (B.5) and Pajak Penghasilan (B.7)
+    # Try inline format first (with colon)
+    b5_inline = B5_INLINE_PATTERN.search(clean_text)
+    if b5_inline:
+        data['DPP'] = _parse_amount(b5_inline.group(1))
+
+    b7_inline = B7_INLINE_PATTERN.search(clean_text)
+    if b7_inline:
+        data['Pajak_Penghasilan'] = _parse_amount(b7_inline.group(1))
+
+    # If not found, try table format
+    # Table format: B.3 B.4 B.5 B.6 B.7 header, then data row with amounts
+    if data['DPP'] is None or data['Pajak_Penghasilan'] is None:
+        table_match = AMOUNT_TABLE_PATTERN.search(clean_text)
+        if table_match:
+            # Find all numbers with thousand separators in table
+            table_numbers = TABLE_NUMBER_PATTERN.findall(table_match.group(1))
+
+            if len(table_numbers) >= 2:
+                # First large number is DPP, last number is Tax
+                if data['DPP'] is None:
+                    data['DPP'] = _parse_amount(table_numbers[0])
+
+                if data['Pajak_Penghasilan'] is None:
+                    data['Pajak_Penghasilan'] = _parse_amount(table_numbers[-1])
+
+    # 7. Extract C3 - Nama pemungut
+    for pattern in C3_PATTERNS:
+        c3_match = pattern.search(clean_text)
+        if c3_match:
+            data['Nama_Pemungut'] = _collapse_whitespace(c3_match.group(1))
+            break
+
+    # 8. Extract C4 - Tanggal
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            data['Tanggal'] = _parse_date(*match.groups())
+            break
+
+    # 9. Extract B8 - Jenis Dokumen
+    for pattern in B8_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            data['Jenis_Dokumen'] = _collapse_whitespace(match.group(1))
+            break
+
+    # 10. Extract B9 - Nomor Dokumen
+    for pattern in B9_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            data['Nomor_Dokumen'] = _collapse_whitespace(match.group(1))
+            break
+
+    return data
+
+
+def _search_anchored(pattern: re.Pattern, clean_text: str, literal: str, max_lead: int = 0) -> Optional[re.Match]:
+    """
+    Same result as pattern.search(clean_text), trying only the start positions near `literal`.
+
+    Every match of the pattern must contain `literal` within its first
+    `max_lead` characters (0: the match starts with it). Occurrences of the
+    literal are found with str.find, so a pattern with a case-insensitive
+    or digit prefix is not tried at every position of the text. Start
+    positions are tried in ascending order, so the leftmost match is
+    returned, as search() would.
+    """
+    tried = -1
+    position = clean_text.find(literal)
+    while position != -1:
+        for start in range(max(position - max_lead, tried + 1), position + 1):
+            match = pattern.match(clean_text, start)
+            if match:
+                return match
+        tried = position
+        position = clean_text.find(literal, position + 1)
+    return None
+
+
+def _parse_standard_bppu(clean_text: str) -> Optional[Record]:
+    """
+    Parse the standard Coretax BPPU layout with the first pattern of each generic chain.
+
+    Each field uses the pattern the generic chain tries first, with the same
+    bounded windows, searched from its leading label only. The result is
+    therefore the generic chain's result. Returns None if any of these
+    patterns misses, since the generic chain would then go on to its
+    fallbacks.
+    """
+    data = empty_record()
+
+    match = _search_anchored(BUPOT_PATTERNS[0], clean_text, 'MASA')
+    if not match:
+        return None
+    data['Nomor Bukti Potong'] = match.group(1)
+
+    # "06-2025 TIDAK FINAL": the label follows the 7-character period and an optional space
+    match = _search_anchored(MASA_PATTERNS[0], clean_text, 'TIDAK', max_lead=8)
+    if not match:
+        return None
+    data['Masa Pajak'] = _format_masa_pajak(match.group(1))
+
+    a1_match = _search_anchored(A1_PATTERN, clean_text, 'A.1')
+    c1_match = _search_anchored(C1_PATTERN, clean_text, 'C.1')
+    a2_match = _search_anchored(A2_PATTERN, clean_text, 'A.2')
+    if not (a1_match and c1_match and a2_match):
+        return None
+    data['NPWP_NIK_Yang_Dipungut'] = a1_match.group(1)
+    data['NPWP_NIK_Pemungut'] = c1_match.group(1)
+    data['Nama_Yang_Dipungut'] = _collapse_whitespace(a2_match.group(1))
+
+    # First amount in the B.3-B.7 row is DPP, last is Pajak Penghasilan. The generic
+    # chain prefers inline "B.5 ... : amount" values; one that disagrees with the
+    # table means this is not the standard layout
+    table_match = _search_anchored(AMOUNT_TABLE_PATTERN, clean_text, 'B.3')
+    table_numbers = TABLE_NUMBER_PATTERN.findall(table_match.group(1)) if table_match else []
+    if len(table_numbers) < 2:
+        return None
+    data['DPP'] = _parse_amount(table_numbers[0])
+    data['Pajak_Penghasilan'] = _parse_amount(table_numbers[-1])
+    for field, pattern, literal in (
+        ('DPP', B5_INLINE_PATTERN, 'B.5'),
+        ('Pajak_Penghasilan', B7_INLINE_PATTERN, 'B.7'),
+    ):
+        match = _search_anchored(pattern, clean_text, literal)
+        if match and _parse_amount(match.group(1)) != data[field]:
+            return None
+
+    for field, pattern, literal in (
+        ('Nama_Pemungut', C3_PATTERNS[0], 'C.3'),
+        ('Jenis_Dokumen', B8_PATTERNS[0], 'B.8'),
+        ('Nomor_Dokumen', B9_PATTERNS[0], 'B.9'),
+    ):
+        match = _search_anchored(pattern, clean_text, literal)
+        if not match:
+            return None
+        data[field] = _collapse_whitespace(match.group(1))
+
+    match = _search_anchored(DATE_PATTERNS[0], clean_text, 'C.4')
+    if not match:
+        return None
+    data['Tanggal'] = _parse_date(*match.groups())
+
+    return data
+
+
+# Known layouts: template name -> (anchor tokens that must all be present, parser)
+LAYOUT_TEMPLATES = {
+    'coretax_bppu': (STANDARD_BPPU_ANCHORS, _parse_standard_bppu),
+}
+GENERIC_TEMPLATE = 'generic'
+
+
+def identify_layout(clean_text: str) -> Optional[str]:
+    """Fingerprint normalized text against the known layouts by their anchor tokens."""
+    for name, (anchors, _) in LAYOUT_TEMPLATES.items():
+        if all(anchor in clean_text for anchor in anchors):
+            return name
+    return None
+
+
+def _parse_bppu(clean_text: str) -> Tuple[str, Record]:
+    """
+    Parse a BPPU (bukti potong unifikasi) from normalized text.
+
+    Known layouts go to their dedicated parser; unknown layouts, and known
+    ones the fast parser cannot complete, use the generic pattern chain.
+    """
+    template = identify_layout(clean_text)
+    if template:
+        data = LAYOUT_TEMPLATES[template][1](clean_text)
+        if data is not None:
+            return template, data
+
+    return GENERIC_TEMPLATE, _parse_generic(clean_text)
+
+
+def _parse_bp21(clean_text: str) -> Tuple[str, Record]:
+    """Parse a BP21 / 1721-A1: BPPU-style identity sections with labelled gross income and PPh 21."""
+    data = _parse_generic(clean_text)
+    for field, pattern in BP21_AMOUNT_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            data[field] = _parse_amount(match.group(1))
+    return 'bp21', data
+
+
+def parse_bukti_potong(text: str) -> Tuple[str, Record]:
+    """
+    Extract structured fields from BPPU text.
+
+    Returns:
+        Tuple of (template name that produced the record, fields)
+    """
+    return _parse_bppu(normalize_text(text, upper=True))
+
+
+def extract_bukti_potong_fields_from_pdf(text: str, filename: str) -> Record:
+    """Extract structured fields from PDF text."""
+    return parse_bukti_potong(text)[1]
+
+
+@dataclass(frozen=True)
+class DocumentType:
+    """
+    A kind of Coretax document that can turn up among the input PDFs.
+
+    `anchors` holds alternative token groups: normalized page 1 text must
+    contain every token of at least one group. `parser` turns the normalized
+    full text into (template name, record); types without a parser are
+    recognized and routed away without reading past page 1.
+    """
+    name: str
+    label: str
+    sheet_name: str
+    anchors: Tuple[Tuple[str, ...], ...]
+    parser: Optional[Callable[[str], Tuple[str, Record]]] = None
+
+    def matches(self, clean_page: str) -> bool:
+        """Check normalized page 1 text against the anchor groups."""
+        return any(all(token in clean_page for token in group) for group in self.anchors)
+
+
+# Checked in registration order; the first type whose anchors match wins
+DOCUMENT_TYPES: Dict[str, DocumentType] = {}
+UNKNOWN_DOCUMENT = 'unknown'
+# (document type, template name, fields) from extract_document
+DocumentResult = Tuple[str, Optional[str], Optional[Record]]
+DEFAULT_DOCUMENT_TYPE = 'bppu'  # for records from sources that are not classified, such as structured exports
+
+
+def register_document_type(document_type: DocumentType):
+    """Add a document type (or replace one with the same name) in the classification order."""
+    DOCUMENT_TYPES[document_type.name] = document_type
+
+
+for _document_type in (
+    DocumentType('bppu', 'BPPU', 'Coretax_Extraction', (
+        ('BPPU',), ('UNIFIKASI',), ('BUKTI PEMOTONGAN DAN/ATAU PEMUNGUTAN', 'A. IDENTITAS'),
+    ), _parse_bppu),
+    DocumentType('bp21', 'BP21/A1', 'BP21_A1', (
+        ('BP21',), ('BPA1',), ('1721-A1',), ('1721 A1',), ('PASAL 21', 'BUKTI PEMOTONGAN'),
+    ), _parse_bp21),
+    DocumentType('faktur', 'Faktur Pajak', 'Faktur_Pajak', (
+        ('KODE DAN NOMOR SERI FAKTUR PAJAK',), ('FAKTUR PAJAK', 'PENGUSAHA KENA PAJAK', 'PEMBELI'),
+    )),
+    DocumentType('ssp', 'SSP/BPN', 'SSP', (
+        ('SURAT SETORAN PAJAK',), ('BUKTI PENERIMAAN NEGARA',), ('NTPN',),
+    )),
+):
+    register_document_type(_document_type)
+
+
+def identify_document_type(clean_page: str) -> Optional[DocumentType]:
+    """Classify a document from its normalized page 1 text; None if no registered type matches."""
+    for document_type in DOCUMENT_TYPES.values():
+        if document_type.matches(clean_page):
+            return document_type
+    return None
+
+
+def iter_document_text(pdf_document, pdf_path: Path) -> Iterator[str]:
+    """
+    Yield the text of an open PDF page by page.
+
+    The PDF is classified from page 1 first: image-only PDFs go to the OCR
+    stage when an engine is installed (yielding all their text at once).
+    Raises UnreadablePdfError for encrypted PDFs and for image-only PDFs
+    without OCR, so they fail fast without a full page loop.
+    """
+    logger = logging.getLogger(__name__)
+
+    pdf_type = classify_document(pdf_document)
+    if pdf_type == PDF_TEXT:
+        yield from iter_page_text(pdf_document)
+        return
+
+    if pdf_type == PDF_ENCRYPTED:
+        raise UnreadablePdfError("Encrypted PDF (password required)")
+
+    import pdf_ocr
+    ocr_engine = pdf_ocr.get_ocr_engine()
+    if ocr_engine is None:
+        raise UnreadablePdfError("Image-only PDF (scanned, no text layer; OCR not installed)")
+
+    logger.info(f"Running OCR on image-only PDF: {pdf_path.name}")
+    yield ocr_engine(pdf_document)
+
+
+def _classify_pages(pages: Iterator[str]) -> Tuple[Optional[DocumentType], List[str]]:
+    """
+    Classify a document from page 1, reading the other pages only if its type is parsed.
+
+    Returns the document type (None if unrecognized) and the page texts read,
+    which is an empty list when the document has no text at all.
+    """
+    page_texts = [next(pages, '')]
+    if not page_texts[0].strip():
+        # Nothing on page 1: classify on the rest of the document
+        page_texts.extend(pages)
+    first_text = "\n".join(page_texts)
+    if not first_text.strip():
+        return None, []
+
+    document_type = identify_document_type(normalize_text(first_text, upper=True))
+    if document_type is not None and document_type.parser is not None:
+        page_texts.extend(pages)
+    return document_type, page_texts
+
+
+def _dispatch(document_type: Optional[DocumentType], page_texts: List[str]) -> Optional[DocumentResult]:
+    """Run the parser of a classified document over its page texts."""
+    if not page_texts:
+        return None
+    if document_type is None:
+        return UNKNOWN_DOCUMENT, None, None
+    if document_type.parser is None:
+        return document_type.name, None, None
+    return (document_type.name, *document_type.parser(normalize_text("\n".join(page_texts), upper=True)))
+
+
+def extract_document_with_text(pdf_path: str, data=None) -> Tuple[Optional[DocumentResult], Optional[List[str]]]:
+    """
+    Classify one PDF by document type and extract its fields, keeping its raw text.
+
+    Runs in extraction worker processes, so it takes a plain path string and
+    bytes. The type is decided from page 1; unknown types, and types without
+    a parser, return without reading the remaining pages.
+
+    Returns:
+        The extract_document result, and the raw text of every page when all
+        pages were read (None otherwise), for the text cache
+
+    Raises:
+        UnreadablePdfError: for encrypted and image-only PDFs that cannot be read
+    """
+    logger = logging.getLogger(__name__)
+    pdf_path = Path(pdf_path)
+
+    try:
+        with open_pdf_document(pdf_path, data) as pdf_document:
+            document_type, page_texts = _classify_pages(iter_document_text(pdf_document, pdf_path))
+    except UnreadablePdfError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to extract text from {pdf_path.name}: {str(e)}")
+        return None, None
+
+    complete = document_type is not None and document_type.parser is not None
+    return _dispatch(document_type, page_texts), page_texts if complete else None
+
+
+def extract_document(pdf_path: str, data=None) -> Optional[DocumentResult]:
+    """
+    Classify one PDF by document type and extract its fields.
+
+    Returns:
+        (document type, template name, fields), with template and fields None
+        when the type is not extracted (UNKNOWN_DOCUMENT if unrecognized), or
+        None when the PDF has no extractable text
+    """
+    return extract_document_with_text(pdf_path, data)[0]
+
+
+def parse_document_text(page_texts: List[str]) -> Optional[DocumentResult]:
+    """Classify and parse the raw page texts of an earlier extraction without opening the PDF."""
+    return _dispatch(*_classify_pages(iter(page_texts)))
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF Input Layer for Coretax Extractor
+Bulk sequential reads of PDF files with read-ahead on a background I/O thread,
+the PyMuPDF document lifecycle used by every extraction mode, and a page 1
+check that spots encrypted and scanned (image-only) PDFs before extraction
+
+Files on network shares are read in one sequential request so that PyMuPDF
+parses from memory instead of issuing small random reads over SMB. Local
+files are memory-mapped.
+
+PDFs inside ZIP archives (including ZIPs nested in ZIPs) are read straight
+into memory without unpacking to disk. They are addressed as
+"archive.zip!/member.pdf", with one "!/" per archive level.
+"""
+
+import io
+import os
+import re
+import sys
+import mmap
+import queue
+import logging
+import zipfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+import fitz  # PyMuPDF
+
+
+DEFAULT_PREFETCH_DEPTH = 4
+DRIVE_REMOTE = 4  # GetDriveTypeW result for mapped network drives
+ARCHIVE_SEPARATOR = "!/"
+ARCHIVE_SPLIT_PATTERN = re.compile(r'(?<=\.zip)![\\/]', re.IGNORECASE)  # Path() may turn "!/" into "!\\"
+
+# Document classes from classify_document()
+PDF_TEXT = "text"
+PDF_IMAGE_ONLY = "image_only"
+PDF_ENCRYPTED = "encrypted"
+IMAGE_ONLY_COVERAGE = 0.5  # share of page 1 covered by images for a text-less PDF to count as a scan
+
+T = TypeVar("T")
+
+
+def is_remote_path(path: Union[str, Path]) -> bool:
+    """Check whether a path lives on a network share (UNC path or mapped network drive)."""
+    path_str = str(path)
+    if path_str.startswith(("\\\\", "//")):
+        return True
+
+    if sys.platform == "win32":
+        drive = os.path.splitdrive(os.path.abspath(path_str))[0]
+        if drive:
+            try:
+                import ctypes
+                return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+            except Exception:
+                return False
+
+    return False
+
+
+def is_zip_name(name: Union[str, Path]) -> bool:
+    """Check whether a file or member name is a ZIP archive."""
+    return str(name).lower().endswith(".zip")
+
+
+def split_archive_path(path: Union[str, Path]) -> List[str]:
+    """
+    Split an archive member path into the archive file and its member names.
+
+    "D:/bupot/q2.zip!/juni.zip!/a.pdf" -> ["D:/bupot/q2.zip", "juni.zip", "a.pdf"].
+    A plain file path gives a one-item list.
+    """
+    parts = ARCHIVE_SPLIT_PATTERN.split(str(path))
+    return parts[:1] + [member.replace("\\", "/") for member in parts[1:]]
+
+
+def source_name(path: Union[str, Path]) -> str:
+    """Name to report for a file: its file name, or "archive.zip!/member.pdf" for archive members."""
+    parts = split_archive_path(path)
+    return ARCHIVE_SEPARATOR.join([Path(parts[0]).name] + parts[1:])
+
+
+def expand_archives(paths: Iterable[Union[str, Path]]) -> List[str]:
+    """
+    Replace each ZIP archive in a list of input files by the PDFs inside it.
+
+    Nested ZIPs are expanded too, in archive order. PDF contents are read
+    later by read_pdf_bytes, but a nested ZIP has to be decompressed in
+    full to list it, and is decompressed again when its members are read:
+    keeping it from listing until its turn would hold every nested archive
+    of the batch in memory. An archive that cannot be opened is kept as-is
+    so it shows up as a failure.
+    """
+    logger = logging.getLogger(__name__)
+    expanded = []
+    for path in paths:
+        if not is_zip_name(path):
+            expanded.append(str(path))
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = list(_archive_pdf_members(archive, str(path)))
+        except (OSError, zipfile.BadZipFile) as e:
+            logger.warning(f"Cannot read ZIP archive {Path(path).name}: {e}")
+            expanded.append(str(path))
+            continue
+        logger.info(f"{Path(path).name}: {len(members)} PDF files")
+        expanded.extend(members)
+    return expanded
+
+
+def _archive_pdf_members(archive: zipfile.ZipFile, prefix: str) -> Iterator[str]:
+    """Yield the member paths of every PDF in an open archive, descending into nested ZIPs."""
+    logger = logging.getLogger(__name__)
+    for info in archive.infolist():
+        # Skip folders and the resource-fork copies macOS adds to archives
+        if info.is_dir() or info.filename.startswith("__MACOSX/"):
+            continue
+        member = f"{prefix}{ARCHIVE_SEPARATOR}{info.filename}"
+        if info.filename.lower().endswith(".pdf"):
+            yield member
+        elif is_zip_name(info.filename):
+            try:
+                with zipfile.ZipFile(io.BytesIO(archive.read(info))) as nested:
+                    yield from _archive_pdf_members(nested, member)
+            except (OSError, RuntimeError, zipfile.BadZipFile) as e:
+                logger.warning(f"Cannot read nested ZIP archive {source_name(member)}: {e}")
+                yield member
+
+
+class ArchiveReader:
+    """
+    Read archive members, keeping the archives of the current member open.
+
+    Members are expected in archive order (as listed by expand_archives), so
+    only the chain of archives around the current member is cached: moving to
+    another archive closes the previous one and frees any nested ZIP held in
+    memory.
+    """
+
+    def __init__(self):
+        self._archives: Dict[Tuple[str, ...], zipfile.ZipFile] = {}
+
+    def read(self, parts: List[str]) -> bytes:
+        """Read a member given split_archive_path() parts."""
+        return self._archive(tuple(parts[:-1])).read(parts[-1])
+
+    def _archive(self, chain: Tuple[str, ...]) -> zipfile.ZipFile:
+        """Open (or reuse) the archive at the end of a chain of nested archives."""
+        archive = self._archives.get(chain)
+        if archive is not None:
+            return archive
+
+        for key in [key for key in self._archives if key != chain[:len(key)]]:
+            self._archives.pop(key).close()
+
+        if len(chain) == 1:
+            archive = zipfile.ZipFile(chain[0])
+        else:
+            archive = zipfile.ZipFile(io.BytesIO(self._archive(chain[:-1]).read(chain[-1])))
+        self._archives[chain] = archive
+        return archive
+
+    def close(self):
+        """Close every open archive."""
+        for archive in self._archives.values():
+            archive.close()
+        self._archives.clear()
+
+
+class PdfPayload:
+    """
+    In-memory contents of one PDF file.
+
+    `data` is a buffer (bytes or a memoryview over a memory map) that can be
+    passed to fitz.open(stream=...) and hashed without touching the file again.
+    Call close() once parsing is finished to release the mapping.
+    """
+
+    def __init__(self, path: Path, data=None, error: Optional[str] = None):
+        self.path = path
+        self.data = data
+        self.error = error
+        self._mapping: Optional[mmap.mmap] = None
+
+    @property
+    def size(self) -> int:
+        """Size of the loaded file in bytes."""
+        return len(self.data) if self.data is not None else 0
+
+    def close(self):
+        """Release the buffer and any memory mapping behind it."""
+        if isinstance(self.data, memoryview):
+            self.data.release()
+        self.data = None
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_pdf_bytes(path: Union[str, Path], archives: Optional[ArchiveReader] = None) -> PdfPayload:
+    """
+    Load a PDF file into memory.
+
+    Network files are read with a single sequential read; local files are
+    memory-mapped. Archive members are decompressed into memory, reusing the
+    open archives of `archives` when given. Read errors are reported on the
+    payload instead of raised.
+    """
+    parts = split_archive_path(path)
+    path = Path(path)
+
+    if is_zip_name(parts[-1]):
+        # Listed by expand_archives only when the archive could not be opened
+        return PdfPayload(path, error="Cannot read ZIP archive")
+    if len(parts) > 1:
+        reader = archives or ArchiveReader()
+        try:
+            return PdfPayload(path, reader.read(parts))
+        except (OSError, KeyError, RuntimeError, zipfile.BadZipFile) as e:
+            return PdfPayload(path, error=f"Cannot read file from archive: {e}")
+        finally:
+            if archives is None:
+                reader.close()
+
+    try:
+        with open(path, "rb") as f:
+            if not is_remote_path(path):
+                try:
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # Empty files and some filesystems cannot be mapped
+                    mapping = None
+                if mapping is not None:
+                    payload = PdfPayload(path, memoryview(mapping))
+                    payload._mapping = mapping
+                    return payload
+            return PdfPayload(path, f.read())
+    except OSError as e:
+        return PdfPayload(path, error=f"Cannot read file: {e}")
+
+
+class PdfPrefetcher:
+    """
+    Read PDFs ahead of the parser on a background thread.
+
+    Yields payloads in input order. At most `depth` files are held in memory
+    ahead of the consumer, so the next reads overlap with parsing the current
+    file. Paths may be an iterator; it is consumed on the reader thread. Use
+    as a context manager so the thread is stopped on early exit.
+    """
+
+    def __init__(self, paths: Iterable[Union[str, Path]], depth: int = DEFAULT_PREFETCH_DEPTH):
+        self.paths = paths
+        self.depth = max(1, depth)
+        self._queue: "queue.Queue[Optional[PdfPayload]]" = queue.Queue(maxsize=self.depth)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._archives = ArchiveReader()
+
+    def _reader(self):
+        """Load each file and hand it to the consumer, blocking when the queue is full."""
+        try:
+            for path in self.paths:
+                payload = read_pdf_bytes(path, self._archives)
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put(payload, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                else:
+                    payload.close()
+                    return
+        finally:
+            self._archives.close()
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def get(self, timeout: Optional[float] = None) -> Optional[PdfPayload]:
+        """
+        Take the next payload, or None once every file has been read.
+
+        Raises queue.Empty if no payload arrives within `timeout` seconds, so a
+        caller can do other work while a slow read is in progress.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._reader, name="pdf-prefetch", daemon=True)
+            self._thread.start()
+        return self._queue.get(timeout=timeout)
+
+    def __iter__(self) -> Iterator[PdfPayload]:
+        while True:
+            payload = self.get()
+            if payload is None:
+                return
+            yield payload
+
+    def close(self):
+        """Stop the reader thread and release any files it loaded ahead."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if payload is not None:
+                payload.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+@contextmanager
+def open_pdf_document(pdf_path: Union[str, Path], data=None) -> Iterator[fitz.Document]:
+    """
+    Open a PDF with PyMuPDF and always close it, even if parsing fails.
+
+    Args:
+        pdf_path: Path of the PDF, opened directly when no data is given
+        data: Optional in-memory file contents (bytes or memoryview)
+    """
+    if data is not None:
+        document = fitz.open(stream=data, filetype="pdf")
+    else:
+        document = fitz.open(str(pdf_path))
+    try:
+        yield document
+    finally:
+        document.close()
+
+
+def map_pages(document: fitz.Document, read: Callable[[fitz.Page], T]) -> Iterator[T]:
+    """
+    Yield read(page) for each page in order.
+
+    Each page is loaded, read and released before its result is yielded, so
+    only one page object is alive at a time and none is held while the
+    caller works with a result.
+    """
+    for page_num in range(document.page_count):
+        yield read(document.load_page(page_num))
+
+
+def iter_page_text(document: fitz.Document) -> Iterator[str]:
+    """Yield the text of each page, holding one page object at a time."""
+    return map_pages(document, fitz.Page.get_text)
+
+
+def classify_document(document: fitz.Document) -> str:
+    """
+    Classify a PDF from its first page without extracting the whole document.
+
+    Returns PDF_ENCRYPTED when a password is needed to read it, PDF_IMAGE_ONLY
+    when page 1 has no fonts and no text but is mostly covered by images (a
+    scan), and PDF_TEXT otherwise. Page 1 font resources are checked first, so
+    ordinary PDFs are classified without parsing any page content.
+    """
+    if document.needs_pass:
+        return PDF_ENCRYPTED
+    if document.page_count == 0 or document.get_page_fonts(0):
+        return PDF_TEXT
+
+    page = document.load_page(0)
+    try:
+        page_area = abs(page.rect)
+        image_area = sum(abs(fitz.Rect(image["bbox"]) & page.rect) for image in page.get_image_info())
+        if page_area and image_area / page_area >= IMAGE_ONLY_COVERAGE and not page.get_text().strip():
+            return PDF_IMAGE_ONLY
+        return PDF_TEXT
+    finally:
+        del page
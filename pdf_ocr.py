@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Optional OCR Stage for Coretax Extractor
+Reads the text of scanned (image-only) PDFs when an OCR engine is available
+
+The default engine uses Tesseract through pytesseract, with the Indonesian and
+English language data. It is only used when pytesseract, Pillow and the
+Tesseract program are all installed; otherwise image-only PDFs are reported
+as failures. Another engine can be plugged in with register_ocr_engine().
+"""
+
+import logging
+from typing import Callable, List, Optional
+
+import fitz  # PyMuPDF
+
+from pdf_io import map_pages
+
+
+OCR_LANGUAGES = ("ind", "eng")
+OCR_DPI = 300
+
+# An OCR engine takes an open document and returns its text, pages separated by newlines
+OcrEngine = Callable[[fitz.Document], str]
+
+_engine: Optional[OcrEngine] = None
+_engine_resolved = False
+
+
+def register_ocr_engine(engine: Optional[OcrEngine]):
+    """Use this engine for image-only PDFs instead of Tesseract (None disables OCR)."""
+    global _engine, _engine_resolved
+    _engine = engine
+    _engine_resolved = True
+
+
+def get_ocr_engine() -> Optional[OcrEngine]:
+    """Get the OCR engine, detecting Tesseract on first use. Returns None if none is available."""
+    global _engine, _engine_resolved
+    if not _engine_resolved:
+        _engine = _detect_tesseract()
+        _engine_resolved = True
+    return _engine
+
+
+def _detect_tesseract() -> Optional[OcrEngine]:
+    """Build the Tesseract engine if pytesseract, Pillow and the Tesseract program are present."""
+    logger = logging.getLogger(__name__)
+    try:
+        import pytesseract
+        from PIL import Image  # noqa: F401  (required by pytesseract for in-memory images)
+        installed = set(pytesseract.get_languages(config=""))
+    except Exception as e:
+        logger.info(f"OCR not available: {str(e) or type(e).__name__}")
+        return None
+
+    languages = [language for language in OCR_LANGUAGES if language in installed]
+    if not languages:
+        logger.warning(f"OCR not available: Tesseract has none of the languages {', '.join(OCR_LANGUAGES)}")
+        return None
+
+    logger.info(f"OCR enabled with Tesseract ({'+'.join(languages)})")
+    return lambda document: _tesseract_text(document, languages)
+
+
+def _tesseract_text(document: fitz.Document, languages: List[str]) -> str:
+    """Render each page and run Tesseract on it."""
+    import pytesseract
+    from PIL import Image
+
+    def read(page: fitz.Page) -> str:
+        pixmap = page.get_pixmap(dpi=OCR_DPI, alpha=False)
+        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        del pixmap
+        return pytesseract.image_to_string(image, lang="+".join(languages))
+
+    return "\n".join(map_pages(document, read))
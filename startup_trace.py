@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup Tracing for Coretax Extractor
+Opt-in timestamps for each launch phase, written to a JSON file
+
+Enable by setting CORETAX_STARTUP_TRACE to the output file path:
+
+    set CORETAX_STARTUP_TRACE=startup_trace.json
+    CoretaxExtractor.exe
+
+Phases are reported in milliseconds since process launch. A launcher (such
+as benchmark.py) can pass its own launch timestamp in CORETAX_LAUNCH_TIME so
+that PyInstaller unpacking and interpreter start-up are included.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from typing import List, Optional, Tuple
+
+
+TRACE_ENV = "CORETAX_STARTUP_TRACE"
+LAUNCH_TIME_ENV = "CORETAX_LAUNCH_TIME"
+EXIT_ENV = "CORETAX_STARTUP_EXIT"
+
+
+def _process_start_time() -> Tuple[float, str]:
+    """
+    Get the wall-clock time the process was launched.
+
+    Returns:
+        Tuple of (epoch seconds, source of the value)
+    """
+    launch_time = os.environ.get(LAUNCH_TIME_ENV)
+    if launch_time:
+        try:
+            return float(launch_time), "launcher"
+        except ValueError:
+            pass
+
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            creation, exit_time, kernel, user = (wintypes.FILETIME() for _ in range(4))
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.kernel32.GetProcessTimes(
+                handle, ctypes.byref(creation), ctypes.byref(exit_time),
+                ctypes.byref(kernel), ctypes.byref(user)
+            ):
+                ticks = (creation.dwHighDateTime << 32) | creation.dwLowDateTime
+                # FILETIME counts 100ns intervals since 1601-01-01
+                return ticks / 10_000_000 - 11_644_473_600, "process"
+        except Exception:
+            pass
+    else:
+        try:
+            with open("/proc/self/stat") as f:
+                start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/stat") as f:
+                boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+            return boot_time + start_ticks / os.sysconf("SC_CLK_TCK"), "process"
+        except Exception:
+            pass
+
+    return time.time(), "tracer"
+
+
+class StartupTracer:
+    """Record named start-up phases relative to process launch."""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.launch_time, self.launch_source = _process_start_time()
+        self.exit_when_ready = os.environ.get(EXIT_ENV) == "1"
+        self._phases: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str):
+        """Timestamp a phase."""
+        elapsed_ms = (time.time() - self.launch_time) * 1000
+        with self._lock:
+            self._phases.append((phase, round(elapsed_ms, 1)))
+
+    def write(self):
+        """Write all phases recorded so far to the output file."""
+        with self._lock:
+            report = {
+                "launch_time": self.launch_time,
+                "launch_source": self.launch_source,
+                "frozen": bool(getattr(sys, "frozen", False)),
+                "phases": [{"phase": phase, "ms": ms} for phase, ms in self._phases],
+            }
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+_tracer: Optional[StartupTracer] = None
+if os.environ.get(TRACE_ENV):
+    _tracer = StartupTracer(os.environ[TRACE_ENV])
+    _tracer.mark("interpreter_ready")
+
+
+def mark(phase: str):
+    """Timestamp a phase if tracing is enabled."""
+    if _tracer:
+        _tracer.mark(phase)
+
+
+def write():
+    """Write the trace file if tracing is enabled."""
+    if _tracer:
+        try:
+            _tracer.write()
+        except OSError as e:
+            print(f"Error writing startup trace: {e}")
+
+
+def exit_when_ready() -> bool:
+    """Check whether a benchmark asked the app to close once it is usable."""
+    return bool(_tracer and _tracer.exit_when_ready)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Structured Export Import for Coretax Extractor
+Reads bukti potong records from Coretax XML, Excel and CSV exports
+
+Exports already hold the data the PDF parser reconstructs from text, so each
+row or XML record is mapped straight onto the extracted record schema and then
+goes through the same NPWP filter, checks and output as a parsed PDF.
+
+Columns and XML tags are matched by name, ignoring case, spaces and
+punctuation, against the aliases in FIELD_ALIASES, so both the Indonesian
+column titles of the Coretax Excel export and the English tags of the XML
+format are recognized.
+
+Excel workbooks are read straight from the sheet XML rather than through
+openpyxl, whose per-cell objects make a 10k-row export take seconds; cell
+types are resolved from the record field each column maps to.
+"""
+
+import csv
+import logging
+import re
+import zipfile
+import posixpath
+import functools
+import xml.etree.ElementTree as ElementTree
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pdf_extractor
+from extraction_history import hash_file, masa_pajak_period, parse_amount, parse_indonesian_date
+from extraction_pipeline import ParsedPdf
+
+
+EXPORT_EXTENSIONS = ('.xml', '.xlsx', '.xlsm', '.csv')
+EXPORT_TEMPLATES = {'.xml': 'export_xml', '.xlsx': 'export_excel', '.xlsm': 'export_excel', '.csv': 'export_csv'}
+
+MIN_MATCHED_FIELDS = 3  # mapped columns needed to accept a header row or XML record
+HEADER_SEARCH_ROWS = 10  # title rows allowed above the header in Excel and CSV exports
+
+# Record field -> column titles / XML tags, compared after _normalize_name()
+FIELD_ALIASES = {
+    'Nomor Bukti Potong': (
+        'Nomor Bukti Potong', 'Nomor Bukti Pemotongan', 'Nomor Bukti Pemotongan/Pemungutan',
+        'Nomor Bupot', 'No Bukti Potong', 'No Bupot', 'Nomor BPPU', 'Nomor BPU',
+        'TaxCertificateNumber', 'WithholdingSlipNumber', 'CertificateNumber',
+    ),
+    'Masa Pajak': ('Masa Pajak', 'Periode Pajak', 'TaxPeriod'),
+    'NPWP_NIK_Yang_Dipungut': (
+        'NPWP/NIK Yang Dipungut', 'NPWP Yang Dipungut', 'NPWP Yang Dipotong', 'NPWP Dipungut',
+        'NPWP Penerima Penghasilan', 'NPWP Penerima', 'NPWP/NIK Penerima Penghasilan',
+        'CounterpartTin', 'RecipientTin',
+    ),
+    'Nama_Yang_Dipungut': (
+        'Nama Yang Dipungut', 'Nama Yang Dipotong', 'Nama Dipungut',
+        'Nama Penerima Penghasilan', 'Nama Penerima', 'CounterpartName', 'RecipientName',
+    ),
+    'DPP': (
+        'DPP', 'DPP (Rp)', 'Dasar Pengenaan Pajak', 'Penghasilan Bruto', 'Jumlah Penghasilan Bruto',
+        'TaxBase', 'GrossIncome',
+    ),
+    'Pajak_Penghasilan': (
+        'Pajak Penghasilan', 'Pajak Penghasilan (Rp)', 'PPh', 'PPh (Rp)', 'PPh Dipotong',
+        'PPh Dipungut', 'Jumlah PPh', 'TaxAmount', 'IncomeTax', 'WithholdingTax',
+    ),
+    'NPWP_NIK_Pemungut': (
+        'NPWP/NIK Pemungut', 'NPWP Pemungut', 'NPWP Pemotong', 'NPWP Pemotong/Pemungut',
+        'NPWP/NIK Pemotong', 'WithholderTin',
+    ),
+    'Nama_Pemungut': (
+        'Nama Pemungut', 'Nama Pemotong', 'Nama Pemotong/Pemungut', 'WithholderName',
+    ),
+    'Tanggal': (
+        'Tanggal', 'Tanggal Bukti Potong', 'Tanggal Pemotongan', 'Tanggal Bupot', 'Tanggal Pemungutan',
+        'WithholdingDate',
+    ),
+    'Jenis_Dokumen': ('Jenis Dokumen', 'Dokumen', 'Dokumen Dasar', 'DocumentType', 'Document'),
+    'Nomor_Dokumen': ('Nomor Dokumen', 'No Dokumen', 'DocumentNumber'),
+}
+# Some exports split the tax period into a month and a year column
+PERIOD_MONTH_ALIASES = ('Bulan Pajak', 'Masa', 'Masa Pajak Bulan', 'TaxPeriodMonth')
+PERIOD_YEAR_ALIASES = ('Tahun Pajak', 'Tahun', 'TaxPeriodYear')
+PERIOD_MONTH = '_period_month'
+PERIOD_YEAR = '_period_year'
+
+AMOUNT_FIELDS = ('DPP', 'Pajak_Penghasilan')
+NPWP_FIELDS = ('NPWP_NIK_Yang_Dipungut', 'NPWP_NIK_Pemungut')
+NPWP_LENGTH = 16  # Excel stores NPWPs typed as numbers without their leading zeros
+DECIMAL_PART_PATTERN = re.compile(r'[.,]\d{1,2}$')  # "12.500.000,00": thousand groups always have 3 digits
+NUMERIC_DATE_PATTERN = re.compile(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})')
+NON_DIGIT_PATTERN = re.compile(r'\D')
+EXCEL_EPOCH = date(1899, 12, 30)  # day 0 of Excel serial dates (1900 date system)
+# SpreadsheetML tags in both the transitional and the strict OOXML namespace
+SPREADSHEET_NAMESPACES = ('http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+                          'http://purl.oclc.org/ooxml/spreadsheetml/main')
+
+
+def _spreadsheet_tags(name: str) -> frozenset:
+    """Qualified forms of a SpreadsheetML tag."""
+    return frozenset(f'{{{namespace}}}{name}' for namespace in SPREADSHEET_NAMESPACES)
+
+
+ROW_TAGS, VALUE_TAGS, INLINE_STRING_TAGS = _spreadsheet_tags('row'), _spreadsheet_tags('v'), _spreadsheet_tags('is')
+SHARED_STRING_TAGS, TEXT_TAGS, PHONETIC_TAGS = _spreadsheet_tags('si'), _spreadsheet_tags('t'), _spreadsheet_tags('rPh')
+SHEET_TAGS = _spreadsheet_tags('sheet')
+
+
+class ExportFormatError(ValueError):
+    """A structured export whose columns or records could not be recognized."""
+
+
+def _normalize_name(name) -> str:
+    """Compare column titles and tags ignoring case, spaces and punctuation."""
+    return ''.join(c for c in str(name).lower() if c.isalnum())
+
+
+@functools.lru_cache(maxsize=1024)
+def _field_for_name(name: str) -> Optional[str]:
+    """Record field for a column title or XML tag (cached: the same tags repeat on every record)."""
+    return ALIAS_INDEX.get(_normalize_name(name.rsplit('}', 1)[-1]))
+
+
+def _alias_index() -> Dict[str, str]:
+    """Map every normalized alias to its record field."""
+    index = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            index[_normalize_name(alias)] = field
+    for alias in PERIOD_MONTH_ALIASES:
+        index[_normalize_name(alias)] = PERIOD_MONTH
+    for alias in PERIOD_YEAR_ALIASES:
+        index[_normalize_name(alias)] = PERIOD_YEAR
+    return index
+
+
+ALIAS_INDEX = _alias_index()
+
+
+def is_structured_export(path: Union[str, Path]) -> bool:
+    """Check whether a selected file is a structured export rather than a PDF or ZIP."""
+    return Path(path).suffix.lower() in EXPORT_EXTENSIONS
+
+
+def _text(value) -> str:
+    """Cell or element value as trimmed text."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _amount(value) -> Optional[int]:
+    """Amount cell as an integer: numbers as-is, text with '.' or ',' thousand separators."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(round(value))
+    return parse_amount(DECIMAL_PART_PATTERN.sub('', _text(value)).replace(' ', ''))
+
+
+def _npwp(value) -> str:
+    """NPWP/NIK as digits; numeric cells get back the leading zeros Excel dropped."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(int(value)).zfill(NPWP_LENGTH)
+    return NON_DIGIT_PATTERN.sub('', _text(value))
+
+
+def _excel_serial_date(value: float) -> Optional[date]:
+    """Convert an Excel serial day number to a date."""
+    try:
+        return EXCEL_EPOCH + timedelta(days=int(value))
+    except (OverflowError, ValueError):
+        return None
+
+
+def _date(value) -> Optional[date]:
+    """Date cell: Excel dates or serial numbers, ISO, DD/MM/YYYY or 'DD Bulan YYYY' text."""
+    if isinstance(value, (datetime, date)):
+        return parse_indonesian_date(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _excel_serial_date(value)
+    text = _text(value)
+    if not text:
+        return None
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    match = NUMERIC_DATE_PATTERN.fullmatch(text)
+    if match:
+        day, month, year = (int(part) for part in match.groups())
+        try:
+            return date(year, month, day)
+        except ValueError:
+            return None
+    return parse_indonesian_date(text)
+
+
+def _masa_pajak(value, month=None, year=None) -> str:
+    """
+    Masa Pajak in the PDF parser's 'Bulan YYYY' form.
+
+    Accepts a whole period ('06-2025', 'Juni 2025', a date) in the Masa Pajak
+    or month column, or a month number or name next to a Tahun Pajak column.
+    """
+    for candidate in (value, month):
+        if isinstance(candidate, (int, float)) and candidate > 12:
+            candidate = _excel_serial_date(candidate)  # a date-formatted period cell
+        if isinstance(candidate, (datetime, date)):
+            return f"{pdf_extractor.MONTH_NAMES[candidate.month]} {candidate.year}"
+        period = masa_pajak_period(_text(candidate))
+        if period:
+            year_text, month_text = period.split('-')
+            if 1 <= int(month_text) <= 12:
+                return f"{pdf_extractor.MONTH_NAMES[int(month_text)]} {year_text}"
+
+    month_text = _text(month) or _text(value)
+    if month_text and _text(year):
+        month_number = int(month_text) if month_text.isdigit() else pdf_extractor.MONTH_NUMBERS.get(month_text.upper())
+        if month_number and 1 <= month_number <= 12:
+            return f"{pdf_extractor.MONTH_NAMES[month_number]} {_text(year)}"
+    return _text(value)
+
+
+def _build_record(values: Dict[str, object]) -> pdf_extractor.Record:
+    """Convert raw values keyed by record field into a typed record."""
+    record = pdf_extractor.empty_record()
+    for field, value in values.items():
+        if field in AMOUNT_FIELDS:
+            record[field] = _amount(value)
+        elif field in NPWP_FIELDS:
+            record[field] = _npwp(value)
+        elif field == 'Tanggal':
+            record[field] = _date(value)
+        elif field in record:
+            record[field] = _text(value)
+    record['Masa Pajak'] = _masa_pajak(values.get('Masa Pajak'), values.get(PERIOD_MONTH), values.get(PERIOD_YEAR))
+    return record
+
+
+def _map_header(row: Sequence) -> Dict[int, str]:
+    """Map column positions of a header row to record fields."""
+    columns = {}
+    for position, title in enumerate(row):
+        field = _field_for_name(str(title)) if title is not None else None
+        if field and field not in columns.values():
+            columns[position] = field
+    return columns
+
+
+def _iter_table(rows: Iterator[Sequence], source: str) -> Iterator[Tuple[int, pdf_extractor.Record]]:
+    """Find the header among the first rows, then yield (row number, record) for each data row."""
+    columns: Dict[int, str] = {}
+    for row_number, row in enumerate(rows, 1):
+        if not columns:
+            if row_number > HEADER_SEARCH_ROWS:
+                break
+            header = _map_header(row)
+            if len(header) >= MIN_MATCHED_FIELDS:
+                columns = header
+            continue
+
+        values = {field: row[position] for position, field in columns.items() if position < len(row)}
+        if all(_text(value) == '' for value in values.values()):
+            continue
+        yield row_number, _build_record(values)
+
+    if not columns:
+        raise ExportFormatError(f"No bukti potong columns found in the first {HEADER_SEARCH_ROWS} rows of {source}")
+
+
+@functools.lru_cache(maxsize=1024)
+def _column_index(letters: str) -> int:
+    """Zero-based column of the letters of a cell reference ('AB' of 'AB12')."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _string_text(element) -> str:
+    """Text of a shared or inline string; rich text runs are joined, phonetic hints (rPh) dropped."""
+    if element.tag in TEXT_TAGS:
+        return element.text or ''
+    return ''.join(_string_text(child) for child in element if child.tag not in PHONETIC_TAGS)
+
+
+def _shared_strings(workbook: zipfile.ZipFile, names: List[str]) -> List[str]:
+    """The workbook's shared string table."""
+    strings = []
+    if 'xl/sharedStrings.xml' not in names:
+        return strings
+    with workbook.open('xl/sharedStrings.xml') as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag in SHARED_STRING_TAGS:
+                strings.append(_string_text(element))
+                element.clear()
+    return strings
+
+
+def _worksheet_paths(workbook: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """(sheet name, part path) of every worksheet, in workbook order."""
+    relationships = {}
+    with workbook.open('xl/_rels/workbook.xml.rels') as f:
+        for element in ElementTree.parse(f).getroot():
+            target = element.get('Target', '')
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            relationships[element.get('Id')] = path
+
+    sheets = []
+    with workbook.open('xl/workbook.xml') as f:
+        for element in ElementTree.parse(f).getroot().iter():
+            if element.tag in SHEET_TAGS:
+                relationship = next((value for key, value in element.attrib.items() if key.endswith('}id')), None)
+                if relationship in relationships:
+                    sheets.append((element.get('name', ''), relationships[relationship]))
+    return sheets
+
+
+def _iter_sheet_rows(workbook: zipfile.ZipFile, sheet_path: str, strings: List[str]) -> Iterator[List]:
+    """
+    Yield each row of a worksheet as a list of cell values.
+
+    Text cells become str, numeric cells int or float, booleans bool. Dates
+    stay Excel serial numbers; the record conversion knows which fields are dates.
+    """
+    with workbook.open(sheet_path) as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag not in ROW_TAGS:
+                continue
+            row: List = []
+            for cell in element:
+                reference = cell.get('r')
+                if reference:
+                    row.extend([None] * (_column_index(reference.rstrip('0123456789')) - len(row)))
+                value = None
+                for child in cell:
+                    if child.tag in VALUE_TAGS:
+                        value = child.text
+                    elif child.tag in INLINE_STRING_TAGS:
+                        value = _string_text(child)
+                cell_type = cell.get('t', 'n')
+                if value is not None:
+                    if cell_type == 's':
+                        value = strings[int(value)]
+                    elif cell_type == 'n':
+                        number = float(value)
+                        value = int(number) if number.is_integer() else number
+                    elif cell_type == 'b':
+                        value = value == '1'
+                row.append(value)
+            element.clear()
+            yield row
+
+
+def _read_excel(path: Path) -> Iterator[Tuple[int, pdf_extractor.Record]]:
+    """Records of the first worksheet that has a recognizable header row."""
+    with zipfile.ZipFile(path) as workbook:
+        names = workbook.namelist()
+        strings = _shared_strings(workbook, names)
+        for sheet_name, sheet_path in _worksheet_paths(workbook):
+            if sheet_path not in names:
+                continue
+            try:
+                yield from _iter_table(_iter_sheet_rows(workbook, sheet_path, strings), f"{path.name} [{sheet_name}]")
+                return
+            except ExportFormatError:
+                continue
+        raise ExportFormatError(f"No worksheet in {path.name} has bukti potong columns")
+
+
+def _read_csv(path: Path) -> Iterator[Tuple[int, pdf_extractor.Record]]:
+    """Records of a comma- or semicolon-separated export."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(8192)
+        f.seek(0)
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        yield from _iter_table(csv.reader(f, delimiter=delimiter), path.name)
+
+
+def _read_xml(path: Path) -> Iterator[Tuple[int, pdf_extractor.Record]]:
+    """
+    Records of an XML export.
+
+    Any element whose child elements map to enough record fields is a record,
+    whatever the names of the enclosing elements. Elements are cleared as they
+    are consumed, so large exports are streamed.
+    """
+    count = 0
+    for _, element in ElementTree.iterparse(path, events=('end',)):
+        if len(element) < MIN_MATCHED_FIELDS:
+            continue
+        values = {}
+        for child in element:
+            field = _field_for_name(child.tag)
+            if field and field not in values and len(child) == 0:
+                values[field] = child.text
+        if len(values) >= MIN_MATCHED_FIELDS:
+            count += 1
+            yield count, _build_record(values)
+            element.clear()
+
+    if not count:
+        raise ExportFormatError(f"No bukti potong records found in {path.name}")
+
+
+def load_export(path: Union[str, Path]) -> Tuple[str, List[Tuple[int, pdf_extractor.Record]]]:
+    """
+    Read every record of a structured export.
+
+    Returns:
+        Tuple of (template name, list of (row or record number, record))
+
+    Raises:
+        ExportFormatError: if no bukti potong columns or records are found
+        OSError, ElementTree.ParseError: if the file cannot be read
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.xml':
+        records = list(_read_xml(path))
+    elif suffix == '.csv':
+        records = list(_read_csv(path))
+    else:
+        records = list(_read_excel(path))
+    return EXPORT_TEMPLATES[suffix], records
+
+
+def import_exports(paths: List[Union[str, Path]]) -> List[ParsedPdf]:
+    """
+    Load structured exports as parse results for process_pdf_files.
+
+    Each record becomes one result named "export.xlsx#<row>"; an export that
+    cannot be read becomes one failed result.
+    """
+    logger = logging.getLogger(__name__)
+    results = []
+    for path in paths:
+        path = Path(path)
+        try:
+            template, records = load_export(path)
+            content_hash = hash_file(path)
+        except Exception as e:
+            logger.warning(f"Cannot import {path.name}: {e}")
+            results.append(ParsedPdf(path, error=f"Cannot import structured export: {e}"))
+            continue
+
+        logger.info(f"Imported {len(records)} records from {path.name}")
+        for row_number, record in records:
+            results.append(ParsedPdf(path, content_hash=content_hash, fields=record, template=template,
+                                     source=f"{path.name}#{row_number}"))
+    return results
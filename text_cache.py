@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Raw Text Cache for Coretax Extractor
+Keeps the page text of every extracted PDF, zlib-compressed, keyed by content hash
+
+Opening PDFs with PyMuPDF (or running OCR on scans) costs far more than the
+field regexes. With the raw text cached, re-running a batch after a parser
+change only re-parses text: files whose content hash is in the cache never
+reach PyMuPDF. Bump TEXT_LAYER_VERSION when the text extraction itself
+changes, so older entries are read again from the PDFs.
+"""
+
+import zlib
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from db_manager import apply_migrations
+
+
+TEXT_LAYER_VERSION = 1
+PAGE_SEPARATOR = "\f"
+COMPRESSION_LEVEL = 6
+WRITE_BATCH_SIZE = 200
+
+
+def pack_pages(page_texts: List[str]) -> bytes:
+    """Compress page texts into one blob."""
+    return zlib.compress(PAGE_SEPARATOR.join(page_texts).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def unpack_pages(blob: bytes) -> List[str]:
+    """Decompress a blob from pack_pages back into page texts."""
+    return zlib.decompress(blob).decode("utf-8").split(PAGE_SEPARATOR)
+
+
+class TextCache:
+    """SQLite store of compressed raw PDF text."""
+
+    def __init__(self, db_path: str = "coretax_text_cache.db"):
+        self.db_path = db_path
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with WAL journaling for concurrent readers."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_database(self):
+        """Bring the cache schema up to date (a single pragma read when current)."""
+        conn = self._connect()
+        try:
+            apply_migrations(conn, [self._migrate_text_table])
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate_text_table(cursor):
+        """Migration 1: raw text table."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS raw_text (
+                content_hash TEXT PRIMARY KEY,
+                text_version INTEGER NOT NULL,
+                page_count INTEGER NOT NULL,
+                text_size INTEGER NOT NULL,
+                text BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        """)
+
+    def get_stats(self) -> Dict:
+        """Entry count and stored versus raw text size in bytes."""
+        conn = self._connect()
+        try:
+            count, stored, raw = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0), COALESCE(SUM(text_size), 0) FROM raw_text"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {'entries': count, 'stored_bytes': stored, 'text_bytes': raw}
+
+    def clear(self) -> int:
+        """Delete every entry. Returns the number removed."""
+        conn = self._connect()
+        try:
+            with conn:
+                removed = conn.execute("DELETE FROM raw_text").rowcount
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        return removed
+
+
+class TextCacheSession:
+    """
+    Look up and store raw text over one connection during an extraction run.
+
+    New entries are written in batches; close() (or leaving the with block)
+    writes the rest.
+    """
+
+    def __init__(self, cache: TextCache):
+        self._conn = cache._connect()
+        self._pending: List[Tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content_hash: Optional[str]) -> Optional[List[str]]:
+        """Page texts cached for a content hash by the current text layer version, or None."""
+        if not content_hash:
+            return None
+        row = self._conn.execute(
+            "SELECT text FROM raw_text WHERE content_hash = ? AND text_version = ?",
+            (content_hash, TEXT_LAYER_VERSION)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return unpack_pages(row[0])
+
+    def put(self, content_hash: Optional[str], page_texts: List[str]):
+        """Queue the page texts of a file for storage."""
+        if not content_hash:
+            return
+        self._pending.append((
+            content_hash, TEXT_LAYER_VERSION, len(page_texts),
+            sum(len(text) for text in page_texts), pack_pages(page_texts),
+        ))
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write queued entries in one transaction."""
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO raw_text (content_hash, text_version, page_count, text_size, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                self._pending
+            )
+        self._pending.clear()
+
+    def close(self):
+        """Write queued entries and release the connection."""
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Singleton instance
+_text_cache_instance = None
+
+def get_text_cache() -> TextCache:
+    """Get raw text cache singleton instance."""
+    global _text_cache_instance
+    if _text_cache_instance is None:
+        _text_cache_instance = TextCache()
+    return _text_cache_instance
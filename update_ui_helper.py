@@ -14,13 +14,10 @@ import threading
 from pathlib import Path
 from typing import Optional, Tuple
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import urllib3
+import flet as ft
 
-# Disable warnings for unverified HTTPS requests
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# requests/urllib3 are imported on first use so the update button does not
+# slow down application start-up
 
 
 # ============================================================================
@@ -38,6 +35,14 @@ class UpdateChecker:
         
     def _create_session(self):
         """Create a requests session with retry logic."""
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        # Disable warnings for unverified HTTPS requests
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        
         session = requests.Session()
         retry_strategy = Retry(
             total=3,
@@ -74,6 +79,8 @@ class UpdateChecker:
     
     def _make_request(self, url: str, stream: bool = False):
         """Make HTTP request with automatic SSL fallback."""
+        import requests
+        
         try:
             # First try with SSL verification
             return self.session.get(url, stream=stream, timeout=15, verify=True)
@@ -89,6 +96,8 @@ class UpdateChecker:
         Returns:
             Tuple of (update_available, release_info)
         """
+        import requests
+        
         try:
             github_repo = self.config.get('github_repo')
             if not github_repo: